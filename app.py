@@ -2,29 +2,79 @@ import copy
 import hashlib
 import io
 import json
+import os
 import zipfile
 
 import ezdxf
+import gspread
 import matplotlib.patches as patches
+from matplotlib.path import Path as MplPath
 import matplotlib.pyplot as plt
 import pandas as pd
 import streamlit as st
 from streamlit_gsheets import GSheetsConnection
 
-from manual_layout import build_indexed_part_labels, initialize_layout_from_packer, move_part, rotate_part_90
-from manual_tuning_engine import compute_position_grid, compute_visual_guide_grid, legal_bounds, move_part_to
+from manual_layout import (
+    build_indexed_part_labels,
+    build_part_label_index,
+    compact_sheet,
+    initialize_layout_from_packer,
+    move_part,
+    relocate_part_label,
+    rotate_part_90,
+    sheet_part_labels,
+    validate_layout,
+)
+from manual_tuning_engine import (
+    align_parts,
+    build_canvas_sheet_sync,
+    compute_position_grid,
+    compute_visual_guide_grid,
+    distribute_parts,
+    encode_guide_grid,
+    legal_bounds,
+    move_part_to,
+    move_parts,
+    rotate_parts_90,
+    snap_part_to_legal,
+    transfer_part,
+)
 from manual_tuning_component import manual_tuning_canvas
 from nest_storage import build_nest_payload, build_sheet_boring_points, create_cix_zip, nest_file_to_payload, parse_nest_payload, payload_to_dxf
 from nesting_engine import run_offcut_nesting, run_selco_nesting, run_smart_nesting
 from panel_utils import normalize_panels
-from offcut_utils import calculate_sheet_offcuts, calculate_l_mix_offcuts, build_sheet_offcut_preview
-from offcut_stock import build_offcut_stock_rows, normalize_spreadsheet_reference, parse_vertices_json
+from offcut_utils import (
+    analyze_nest_offcuts,
+    build_sheet_offcut_preview,
+    calculate_c_mix_offcuts,
+    calculate_l_mix_offcuts,
+    calculate_polygon_max_offcuts,
+    calculate_sheet_offcuts,
+)
+from offcut_scoring import load_demand_histogram, panel_demand_fingerprint, score_inventory_rows, update_demand_history
+from offcut_index import AVAILABLE_STATUSES, StockIndex, offcut_label
+from offcut_ledger import StockLedger
+from offcut_outbox import OutboxWorker, StockOutbox, overlay_rows
+from offcut_store import STOCK_SCHEMA, OffcutStore, StockReconciler, fetch_stock_tables
+from offcut_stock import (
+    append_stock_rows,
+    build_nest_offcut_stock_rows,
+    extract_spreadsheet_id,
+    normalize_spreadsheet_reference,
+    parse_vertices_json,
+)
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="CNC Nester Pro", layout="wide")
 
 OFFCUT_STOCK_SHEET_URL = "https://docs.google.com/spreadsheets/d/1-qS6gWekGtEhjczboAyAShJHHamK0ZuVlR7CFbubxxo/edit?gid=0#gid=0"
 OFFCUT_STOCK_LOCATION = "I Design Workshop"
+OFFCUT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "offcut_stock.sqlite3")
+OFFCUT_STOCK_SYNC_INTERVAL_S = 60.0
+OFFCUT_DIALOG_PAGE_SIZE = 50
+OFFCUT_OUTBOX_INTERVAL_S = 5.0
+OFFCUT_STOCK_ACTIONS = {"Reserve": "RESERVED", "Release": "RELEASED", "Mark used": "CONSUMED", "Scrap": "SCRAPPED"}
+OFFCUT_DEMAND_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "offcut_demand_history.json")
 OFFCUT_THICKNESS_BY_PRESET = {
     "MDF": 18,
     "Ply": 19,
@@ -59,6 +109,10 @@ if 'manual_notice' not in st.session_state:
     st.session_state.manual_notice = None
 if 'manual_canvas_last_event_id' not in st.session_state:
     st.session_state.manual_canvas_last_event_id = None
+if 'manual_canvas_sync' not in st.session_state:
+    st.session_state.manual_canvas_sync = {}
+if 'manual_label_index' not in st.session_state:
+    st.session_state.manual_label_index = None
 if 'manual_snap_enabled' not in st.session_state:
     st.session_state.manual_snap_enabled = False
 if 'manual_snap_size' not in st.session_state:
@@ -99,6 +153,8 @@ if 'offcut_selected_items' not in st.session_state:
     st.session_state.offcut_selected_items = []
 if 'offcut_selector_open' not in st.session_state:
     st.session_state.offcut_selector_open = False
+if 'nest_offcut_analysis' not in st.session_state:
+    st.session_state.nest_offcut_analysis = None
 
 
 SHEET_PRESETS = {
@@ -120,6 +176,7 @@ def apply_pending_loaded_nest():
     st.session_state.machine_type = pending.get("machine_type", "Flat Bed")
     st.session_state.manual_layout = pending.get("manual_layout")
     st.session_state.cix_preview = pending.get("cix_preview")
+    st.session_state["loaded_layout_violations"] = pending.get("layout_violations", [])
     st.session_state.manual_layout_draft = None
     st.session_state.sheet_preset = infer_sheet_preset(pending["sheet_w"], pending["sheet_h"])
     st.session_state.last_sheet_preset_applied = st.session_state.sheet_preset
@@ -159,69 +216,185 @@ def load_gsheets_catalog():
     return conn.read()
 
 
-@st.cache_data(ttl=30)
-def load_offcut_stock_sheet_data(spreadsheet_url):
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    inventory_df = conn.read(spreadsheet=spreadsheet_url, worksheet="offcut_inventory", ttl=0)
-    shapes_df = conn.read(spreadsheet=spreadsheet_url, worksheet="offcut_shapes", ttl=0)
-    return inventory_df, shapes_df
+@st.cache_resource
+def get_gspread_client():
+    """gspread client authorised with the service account from the gsheets connection secrets."""
+    info = {
+        key: value
+        for key, value in st.secrets["connections"]["gsheets"].items()
+        if key not in ("spreadsheet", "worksheet")
+    }
+    return gspread.service_account_from_dict(info)
+
+
+def open_stock_spreadsheet(spreadsheet_ref):
+    """gspread ``Spreadsheet`` for a sheet URL or id; the only place stock code opens a spreadsheet."""
+    client = get_gspread_client()
+    if spreadsheet_ref.startswith("https://"):
+        return client.open_by_url(spreadsheet_ref)
+    return client.open_by_key(extract_spreadsheet_id(spreadsheet_ref) or spreadsheet_ref)
+
+
+def append_queued_stock_rows(spreadsheet_ref, rows_by_worksheet):
+    try:
+        return append_stock_rows(open_stock_spreadsheet(spreadsheet_ref), rows_by_worksheet)
+    except Exception as exc:
+        worksheets = ", ".join(worksheet for worksheet, rows in rows_by_worksheet.items() if rows)
+        raise RuntimeError(
+            f"{worksheets}: {exc}. Ensure gsheets connection uses Service Account auth, "
+            "the sheet is shared with that service account as Editor, and worksheet tabs exist."
+        ) from exc
 
 
-def _sanitize_sheet_df(df):
-    if df is None or df.empty:
-        return pd.DataFrame() if df is None else df
-    sanitized = df.copy()
-    sanitized = sanitized.where(pd.notnull(sanitized), "")
-    return sanitized
+@st.cache_resource
+def get_offcut_outbox():
+    """Durable queue of stock pushes plus the background worker that appends them to Sheets."""
+    outbox = StockOutbox(OFFCUT_STORE_PATH)
+    worker = OutboxWorker(outbox, append_queued_stock_rows, interval_s=OFFCUT_OUTBOX_INTERVAL_S)
+    worker.start()
+    return outbox, worker
 
 
-def _append_rows_to_sheet(conn, spreadsheet_id, worksheet_name, rows):
-    if not rows:
+def fetch_offcut_stock_tables(outbox):
+    """Stock tabs from Sheets with still-queued pushes laid over them, so a sync never drops them.
+
+    The queue is read before the fetch: a push sent while the fetch runs is
+    then either in the fetched tabs or still in ``pending``.
+    """
+    pending = outbox.pending_rows(normalize_spreadsheet_reference(OFFCUT_STOCK_SHEET_URL))
+    try:
+        tables = fetch_stock_tables(open_stock_spreadsheet(OFFCUT_STOCK_SHEET_URL))
+    except Exception as exc:
+        raise RuntimeError(f"{', '.join(STOCK_SCHEMA)}: {exc}") from exc
+    return overlay_rows(tables, pending, {table: key for table, (key, _) in STOCK_SCHEMA.items()})
+
+
+@st.cache_resource
+def get_offcut_stock_store():
+    """Local SQLite stock copy plus the background reconciler that keeps it in sync with Sheets."""
+    store = OffcutStore(OFFCUT_STORE_PATH)
+    outbox = get_offcut_outbox()[0]
+    reconciler = StockReconciler(
+        store,
+        lambda: fetch_offcut_stock_tables(outbox),
+        interval_s=OFFCUT_STOCK_SYNC_INTERVAL_S,
+        after_sync=lambda: refresh_offcut_stock(store),
+    )
+    if store.last_synced_at() is None:
+        reconciler.sync_now()
+    else:
+        refresh_offcut_stock(store)
+    reconciler.start()
+    return store, reconciler
+
+
+def rescore_offcut_stock(store, history=None):
+    """Store each offcut's usable score against the current demand history; returns rows changed."""
+    history = history or load_demand_histogram(OFFCUT_DEMAND_HISTORY_PATH)
+    if not history["total"]:
         return 0
+    scored = score_inventory_rows(store.query_inventory(), history, store.shape_rows())
+    return store.write_usable_scores({row["offcut_id"]: row["usable_score"] for row in scored})
+
+
+def refresh_offcut_stock(store):
+    """Re-derive what the local stock copy does not take from Sheets: statuses from events, scores from demand."""
+    StockLedger(store).refresh()
+    rescore_offcut_stock(store)
+
+
+@st.cache_resource(max_entries=2)
+def build_offcut_stock_index(store_version):
+    return StockIndex(get_offcut_stock_store()[0].query_inventory())
+
+
+def get_offcut_stock_index():
+    """Stock index for the current store contents; rebuilt only after the store changes."""
+    return build_offcut_stock_index(get_offcut_stock_store()[0].version)
+
+
+def load_offcut_stock_data():
+    store, _ = get_offcut_stock_store()
+    return pd.DataFrame(store.query_inventory()), pd.DataFrame(store.shape_rows())
+
+
+def queue_stock_rows(spreadsheet_ref, rows_by_worksheet):
+    """Write stock rows to the local copy now and queue them for Sheets; returns row counts per tab."""
+    get_offcut_stock_store()[0].upsert_rows(rows_by_worksheet)
+    outbox, worker = get_offcut_outbox()
+    outbox.enqueue(spreadsheet_ref, rows_by_worksheet)
+    worker.trigger()
+    return {worksheet: len(rows) for worksheet, rows in rows_by_worksheet.items()}
+
+
+def record_offcut_events(offcut_ids, event_type, job_id=""):
+    """Queue stock events for Sheets, then re-derive inventory status from the event log."""
+    ledger = StockLedger(get_offcut_stock_store()[0])
+    rows = ledger.new_events(offcut_ids, event_type, job_id=job_id)
+    queue_stock_rows(normalize_spreadsheet_reference(OFFCUT_STOCK_SHEET_URL), {"offcut_events": rows})
+    ledger.refresh()
+    return rows
+
+
+def stock_outbox_caption():
+    """One-line outbox status for the UI, or ``None`` when nothing is waiting."""
+    status = get_offcut_outbox()[1].status()
+    if not status["pending_entries"] and not status["parked_entries"]:
+        return None
+    caption = f"Stock sync: {status['pending_rows']} row(s) from {status['pending_entries']} push(es) waiting for Google Sheets."
+    if status["last_error"]:
+        caption += f" Last error: {status['last_error']}. Retrying at {status['next_attempt_at_utc']}."
+    if status["parked_entries"]:
+        caption += (
+            f" {status['parked_rows']} row(s) from {status['parked_entries']} push(es) stopped retrying"
+            f" after: {status['parked_error']}."
+        )
+    return caption
+
 
-    incoming_df = _sanitize_sheet_df(pd.DataFrame(rows))
+def record_nest_demand(panels, job_id=""):
+    """Add a job's panels to the demand history that drives offcut usable scores.
 
+    Keyed by job id and panel list, so nesting the same job again is not counted twice.
+    Stored stock scores are recomputed against the grown history.
+    """
     try:
-        existing = conn.read(spreadsheet=spreadsheet_id, worksheet=worksheet_name, ttl=0)
-        existing_df = existing if isinstance(existing, pd.DataFrame) else pd.DataFrame()
+        history = update_demand_history(OFFCUT_DEMAND_HISTORY_PATH, panels, f"{job_id.strip()}:{panel_demand_fingerprint(panels)}")
+    except OSError:
+        return
+    try:
+        rescore_offcut_stock(get_offcut_stock_store()[0], history)
     except Exception:
-        existing_df = pd.DataFrame()
+        pass
 
-    existing_df = _sanitize_sheet_df(existing_df)
-    merged_df = pd.concat([existing_df, incoming_df], ignore_index=True) if not existing_df.empty else incoming_df
-    merged_df = _sanitize_sheet_df(merged_df)
 
-    conn.update(spreadsheet=spreadsheet_id, worksheet=worksheet_name, data=merged_df)
-    return len(rows)
+def queue_offcuts_to_google_sheet(spreadsheet_value, layout, sheet, reusable_offcuts, *, material="", thickness_mm="", location="", sheet_origin_job=""):
+    return queue_nest_offcuts_to_google_sheet(
+        spreadsheet_value,
+        layout,
+        [(sheet, reusable_offcuts)],
+        material=material,
+        thickness_mm=thickness_mm,
+        location=location,
+        sheet_origin_job=sheet_origin_job,
+    )
 
 
-def save_offcuts_to_google_sheet(spreadsheet_value, layout, sheet, reusable_offcuts, *, material="", thickness_mm="", location="", sheet_origin_job=""):
+def queue_nest_offcuts_to_google_sheet(spreadsheet_value, layout, sheet_offcuts, *, material="", thickness_mm="", location="", sheet_origin_job=""):
     spreadsheet_ref = normalize_spreadsheet_reference(spreadsheet_value)
     if not spreadsheet_ref:
         raise ValueError("Enter a valid Google Sheets URL or spreadsheet ID.")
 
-    export_rows = build_offcut_stock_rows(
+    export_rows = build_nest_offcut_stock_rows(
         layout,
-        sheet,
-        reusable_offcuts,
+        sheet_offcuts,
         material=material,
         thickness_mm=thickness_mm,
         location=location,
         sheet_origin_job=sheet_origin_job,
+        demand_histogram=load_demand_histogram(OFFCUT_DEMAND_HISTORY_PATH),
     )
-
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    written = {}
-    for worksheet_name, rows in export_rows.items():
-        try:
-            written[worksheet_name] = _append_rows_to_sheet(conn, spreadsheet_ref, worksheet_name, rows)
-        except Exception as exc:
-            raise RuntimeError(
-                f"{worksheet_name}: {exc}. Ensure gsheets connection uses Service Account auth, "
-                "the sheet is shared with that service account as Editor, and worksheet tabs exist."
-            ) from exc
-
-    return written
+    return queue_stock_rows(spreadsheet_ref, export_rows)
 
 
 def create_dxf_zip(packer, sheet_w, sheet_h, margin, kerf):
@@ -520,21 +693,29 @@ def draw_layout_sheet(layout, selected_sheet_idx, tooling_map=None, template_pre
     st.pyplot(fig, use_container_width=True)
 
 
-def draw_interactive_layout(layout, selected_sheet_idx, selected_part_id, overlay_step=20.0, snap_enabled=False, snap_size=10.0, show_snap_grid=False, align_snap_enabled=True, align_snap_tolerance=4.0, kerf_prompt_enabled=True, kerf_prompt_threshold=12.0, measure_enabled=False, measure_clear_seq=0):
+def draw_interactive_layout(layout, selected_sheet_idx, selected_part_id, part_labels, overlay_step=20.0, snap_enabled=False, snap_size=10.0, show_snap_grid=False, align_snap_enabled=True, align_snap_tolerance=4.0, kerf_prompt_enabled=True, kerf_prompt_threshold=12.0, measure_enabled=False, measure_clear_seq=0):
     selected_sheet = layout["sheets"][selected_sheet_idx]
     part_ids = [p["id"] for p in selected_sheet["parts"]]
-    indexed_name_map = build_indexed_part_labels(layout, selected_sheet_idx)
 
     grid_rows = []
     if selected_part_id in part_ids:
         grid_rows = compute_visual_guide_grid(layout, selected_sheet_idx, selected_part_id, overlay_step)
+    guide_grid = encode_guide_grid(grid_rows)
+
+    canvas_key = f"manual_canvas_{selected_sheet_idx}"
+    sheet_sync, snapshot = build_canvas_sheet_sync(
+        layout,
+        selected_sheet_idx,
+        part_labels=part_labels,
+        previous=st.session_state.manual_canvas_sync.get(canvas_key),
+    )
+    # Only the active sheet's canvas is mounted; a switch remounts it, so snapshots for other sheets are stale.
+    st.session_state.manual_canvas_sync = {canvas_key: snapshot}
 
     event = manual_tuning_canvas(
-        layout=layout,
-        selected_sheet_idx=selected_sheet_idx,
+        sheet_sync=sheet_sync,
         selected_part_id=selected_part_id,
-        grid_rows=grid_rows,
-        part_labels=indexed_name_map,
+        guide_grid=guide_grid,
         snap_enabled=snap_enabled,
         snap_size=snap_size,
         show_snap_grid=show_snap_grid,
@@ -544,13 +725,19 @@ def draw_interactive_layout(layout, selected_sheet_idx, selected_part_id, overla
         kerf_prompt_threshold=kerf_prompt_threshold,
         measure_enabled=measure_enabled,
         measure_clear_seq=measure_clear_seq,
-        key=f"manual_canvas_{selected_sheet_idx}",
+        key=canvas_key,
     )
 
     selected = None
     move_event = None
     if isinstance(event, dict):
-        if event.get("type") == "select":
+        if event.get("type") == "resync":
+            # Frontend missed a delta; drop the snapshot so the next render sends the full sheet.
+            if event.get("event_id") != st.session_state.get("manual_canvas_last_resync_id"):
+                st.session_state.manual_canvas_last_resync_id = event.get("event_id")
+                st.session_state.manual_canvas_sync.pop(canvas_key, None)
+                st.rerun()
+        elif event.get("type") == "select":
             selected = event.get("part_id")
         elif event.get("type") == "move":
             move_event = {
@@ -559,6 +746,14 @@ def draw_interactive_layout(layout, selected_sheet_idx, selected_part_id, overla
                 "y": float(event.get("y", 0.0)),
                 "event_id": event.get("event_id"),
             }
+        elif event.get("type") == "snap_to_legal":
+            move_event = {
+                "type": "snap_to_legal",
+                "part_id": event.get("part_id"),
+                "x": float(event.get("x", 0.0)),
+                "y": float(event.get("y", 0.0)),
+                "event_id": event.get("event_id"),
+            }
         elif event.get("type") == "suggest_snap":
             move_event = {
                 "type": "suggest_snap",
@@ -582,9 +777,7 @@ def draw_interactive_layout(layout, selected_sheet_idx, selected_part_id, overla
     if selected not in part_ids:
         selected = None
 
-    legal_count = sum(1 for r in grid_rows if r.get("is_legal"))
-    blocked_count = len(grid_rows) - legal_count
-    return selected, move_event, legal_count, blocked_count
+    return selected, move_event, guide_grid["legal_count"], guide_grid["blocked_count"]
 
 
 
@@ -656,9 +849,19 @@ def draw_cix_preview(cix_preview):
 
 
 
+def get_manual_label_index(layout):
+    # Built once per draft; cleared whenever the draft is replaced wholesale and
+    # updated in place by edits that move parts between sheets.
+    if st.session_state.get("manual_label_index") is None:
+        st.session_state.manual_label_index = build_part_label_index(layout)
+    return st.session_state.manual_label_index
+
+
 def _handle_manual_tuning_dismiss():
     st.session_state.show_manual_tuning = False
     st.session_state.manual_layout_draft = None
+    st.session_state.manual_canvas_sync = {}
+    st.session_state.manual_label_index = None
     if "manual_part_select" in st.session_state:
         del st.session_state["manual_part_select"]
 
@@ -720,7 +923,7 @@ def manual_tuning_dialog():
     selected_sheet_idx, selected_sheet = editable_sheets[selected_sheet_option]
 
     part_ids = [p["id"] for p in selected_sheet["parts"]]
-    indexed_name_map = build_indexed_part_labels(layout, selected_sheet_idx)
+    indexed_name_map = sheet_part_labels(get_manual_label_index(layout), layout, selected_sheet_idx)
     part_label_map = {
         p["id"]: f"{indexed_name_map.get(p['id'], p['rid'])} ({int(p['w'])}x{int(p['h'])})"
         for p in selected_sheet["parts"]
@@ -769,6 +972,7 @@ def manual_tuning_dialog():
         layout,
         selected_sheet_idx,
         st.session_state.manual_selected_part_id,
+        indexed_name_map,
         overlay_step=max(10.0, float(st.session_state.get("manual_nudge", 20.0))),
         snap_enabled=bool(st.session_state.get("manual_snap_enabled", False)),
         snap_size=float(st.session_state.get("manual_snap_size", 10.0)),
@@ -794,6 +998,17 @@ def manual_tuning_dialog():
                 st.session_state.manual_pending_suggestion = move_event
             elif move_event.get("type") == "measure_update":
                 st.session_state.manual_measure_readout = move_event
+            elif move_event.get("type") == "snap_to_legal":
+                st.session_state.manual_pending_suggestion = None
+                st.session_state.manual_layout_draft, ok, msg = snap_part_to_legal(
+                    layout,
+                    selected_sheet_idx,
+                    move_event["part_id"],
+                    move_event["x"],
+                    move_event["y"],
+                )
+                st.session_state.manual_notice = ("success" if ok else "error", msg)
+                st.rerun()
             else:
                 st.session_state.manual_pending_suggestion = None
                 st.session_state.manual_layout_draft, ok, msg = move_part_to(
@@ -891,6 +1106,74 @@ def manual_tuning_dialog():
         st.session_state.manual_notice = ("success" if ok else "error", msg)
         st.rerun()
 
+    with st.expander("Group edit", expanded=False):
+        group_ids = st.multiselect(
+            "Group parts",
+            part_ids,
+            format_func=lambda pid: part_label_map.get(pid, pid),
+            key=f"manual_group_select_{selected_sheet_idx}",
+        )
+        group_action = None
+        g1, g2, g3, g4, g5 = st.columns(5)
+        if g1.button("⬆️ Up", key="group_up"):
+            group_action = lambda: move_parts(layout, selected_sheet_idx, group_ids, 0, nudge)
+        if g2.button("⬅️ Left", key="group_left"):
+            group_action = lambda: move_parts(layout, selected_sheet_idx, group_ids, -nudge, 0)
+        if g3.button("➡️ Right", key="group_right"):
+            group_action = lambda: move_parts(layout, selected_sheet_idx, group_ids, nudge, 0)
+        if g4.button("⬇️ Down", key="group_down"):
+            group_action = lambda: move_parts(layout, selected_sheet_idx, group_ids, 0, -nudge)
+        if g5.button("🔄 Rotate 90°", key="group_rotate"):
+            group_action = lambda: rotate_parts_90(layout, selected_sheet_idx, group_ids)
+
+        a1, a2, a3, a4, a5, a6 = st.columns(6)
+        for col, edge in zip((a1, a2, a3, a4), ("left", "right", "top", "bottom")):
+            if col.button(f"Align {edge}", key=f"group_align_{edge}"):
+                group_action = lambda edge=edge: align_parts(layout, selected_sheet_idx, group_ids, edge)
+        if a5.button("Distribute ↔", key="group_distribute_x"):
+            group_action = lambda: distribute_parts(layout, selected_sheet_idx, group_ids, axis="x")
+        if a6.button("Distribute ↕", key="group_distribute_y"):
+            group_action = lambda: distribute_parts(layout, selected_sheet_idx, group_ids, axis="y")
+
+        if group_action is not None:
+            st.session_state.manual_layout_draft, ok, msg = group_action()
+            st.session_state.manual_notice = ("success" if ok else "error", msg)
+            st.rerun()
+
+    k1, k2 = st.columns([2, 1])
+    compact_corner = k1.selectbox(
+        "Compact toward",
+        ["bottom-left", "bottom-right", "top-left", "top-right"],
+        key="manual_compact_corner",
+    )
+    if k2.button("🧲 Compact sheet"):
+        st.session_state.manual_layout_draft, ok, msg = compact_sheet(layout, selected_sheet_idx, compact_corner)
+        st.session_state.manual_notice = ("success" if ok else "error", msg)
+        st.rerun()
+
+    transfer_targets = {"Best fit (any sheet)": None}
+    for idx, sheet in enumerate(layout["sheets"]):
+        if idx != selected_sheet_idx:
+            transfer_targets[f"Sheet {sheet['sheet_index'] + 1}"] = idx
+    t1, t2 = st.columns([2, 1])
+    transfer_label = t1.selectbox("Transfer selected part to", list(transfer_targets), key="manual_transfer_target")
+    if t2.button("📦 Transfer part"):
+        target_idx = transfer_targets[transfer_label]
+        st.session_state.manual_layout_draft, ok, msg = transfer_part(
+            layout, selected_sheet_idx, selected_part_id, target_idx
+        )
+        if ok:
+            new_sheet_idx = next(
+                idx
+                for idx, sheet in enumerate(st.session_state.manual_layout_draft["sheets"])
+                if any(p["id"] == selected_part_id for p in sheet.get("parts", []))
+            )
+            relocate_part_label(get_manual_label_index(layout), selected_part_id, new_sheet_idx)
+            if not st.session_state.manual_layout_draft["sheets"][selected_sheet_idx]["parts"]:
+                st.session_state.pop("manual_sheet_select", None)
+        st.session_state.manual_notice = ("success" if ok else "error", msg)
+        st.rerun()
+
     st.markdown("##### Mouse placement")
     st.caption(
         "Click a panel to select it, then drag it on the canvas. Use mouse wheel to zoom. "
@@ -909,11 +1192,13 @@ def manual_tuning_dialog():
         st.rerun()
     if d2.button("Reset Draft"):
         st.session_state.manual_layout_draft = copy.deepcopy(st.session_state.manual_layout)
+        st.session_state.manual_label_index = None
         st.session_state.manual_notice = ("success", "Draft reset to current nest layout")
         st.rerun()
     if d3.button("Cancel"):
         st.session_state.show_manual_tuning = False
         st.session_state.manual_layout_draft = None
+        st.session_state.manual_label_index = None
         if "manual_part_select" in st.session_state:
             del st.session_state["manual_part_select"]
         st.rerun()
@@ -924,7 +1209,7 @@ def offcut_selection_dialog():
     st.caption("Choose one or more in-stock offcuts from your library. The nest will use each selected offcut as an available sheet.")
 
     try:
-        inventory_df, shapes_df = load_offcut_stock_sheet_data(OFFCUT_STOCK_SHEET_URL)
+        stock_index = get_offcut_stock_index()
     except Exception as exc:
         st.error(f"Could not load offcut stock sheet: {exc}")
         if st.button("Close", key="close_offcut_dialog_error"):
@@ -932,74 +1217,68 @@ def offcut_selection_dialog():
             st.rerun()
         return
 
-    if inventory_df is None or inventory_df.empty:
-        st.info("No offcut stock records are available yet.")
-        if st.button("Close", key="close_offcut_dialog_empty"):
-            st.session_state.offcut_selector_open = False
-            st.rerun()
-        return
-
-    available_df = inventory_df.copy()
-    if "status" in available_df.columns:
-        available_df = available_df[available_df["status"].fillna("").astype(str).str.upper().isin(["", "IN_STOCK"])]
-    available_df = available_df.reset_index(drop=True)
-
-    if available_df.empty:
+    if not stock_index.query(page_size=1)["total"]:
         st.info("No in-stock offcuts are available to select.")
         if st.button("Close", key="close_offcut_dialog_no_stock"):
             st.session_state.offcut_selector_open = False
             st.rerun()
         return
 
-    current_ids = [str(v) for v in st.session_state.get("offcut_selected_ids", [])]
-    label_map = {}
-    options = []
-    default_labels = []
-
-    for row in available_df.to_dict("records"):
-        offcut_id = str(row.get("offcut_id", "")).strip()
-        label = (
-            f"{offcut_id} · {row.get('material', 'Unknown')} · "
-            f"{row.get('bbox_w_mm', '')} x {row.get('bbox_h_mm', '')} mm · "
-            f"{row.get('shape_type', 'RECT')}"
-        )
-        label_map[label] = row
-        options.append(label)
-        if offcut_id in current_ids:
-            default_labels.append(label)
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+    material_filter = filter_col1.selectbox("Material", ["Any"] + stock_index.materials(), key="offcut_dialog_material")
+    min_fit_w = filter_col2.number_input("Fits width (mm)", min_value=0.0, value=0.0, step=50.0, key="offcut_dialog_min_w")
+    min_fit_h = filter_col3.number_input("Fits height (mm)", min_value=0.0, value=0.0, step=50.0, key="offcut_dialog_min_h")
+    page_number = filter_col4.number_input("Page", min_value=1, value=1, step=1, key="offcut_dialog_page")
+    result = stock_index.query(
+        min_w=min_fit_w,
+        min_h=min_fit_h,
+        material=None if material_filter == "Any" else material_filter,
+        page=int(page_number) - 1,
+        page_size=OFFCUT_DIALOG_PAGE_SIZE,
+    )
+    page_rows = result["rows"]
+
+    if "offcut_dialog_multiselect" not in st.session_state:
+        current_ids = [str(v) for v in st.session_state.get("offcut_selected_ids", [])]
+        st.session_state.offcut_dialog_multiselect = [
+            offcut_label(row) for row in stock_index.get(current_ids, AVAILABLE_STATUSES)
+        ]
+    picked_ids = [label.split(" · ", 1)[0] for label in st.session_state.offcut_dialog_multiselect]
+    label_map = {offcut_label(row): row for row in stock_index.get(picked_ids, AVAILABLE_STATUSES) + page_rows}
+    # Picks reserved, used or scrapped since they were made drop out of the selection.
+    st.session_state.offcut_dialog_multiselect = [
+        label for label in st.session_state.offcut_dialog_multiselect if label in label_map
+    ]
 
     selected_labels = st.multiselect(
         "Available offcuts",
-        options,
-        default=default_labels,
+        list(label_map),
         key="offcut_dialog_multiselect",
     )
     selected_rows = [label_map[label] for label in selected_labels]
 
     display_cols = [
-        c for c in [
-            "offcut_id", "material", "thickness_mm", "shape_type", "bbox_w_mm", "bbox_h_mm",
-            "area_mm2", "location", "sheet_origin_job", "captured_at_utc"
-        ] if c in available_df.columns
+        "offcut_id", "material", "thickness_mm", "shape_type", "bbox_w_mm", "bbox_h_mm",
+        "area_mm2", "location", "sheet_origin_job", "captured_at_utc"
     ]
-    st.dataframe(available_df[display_cols] if display_cols else available_df, hide_index=True, width="stretch")
+    st.caption(f"{result['total']} matching offcut(s), smallest first · page {result['page'] + 1} of {result['pages']}")
+    if page_rows:
+        page_df = pd.DataFrame(page_rows)
+        st.dataframe(page_df[[c for c in display_cols if c in page_df.columns]], hide_index=True, width="stretch")
 
     if selected_rows:
         selected_df = pd.DataFrame(selected_rows)
         st.caption(f"Selected offcuts: {len(selected_rows)}")
-        st.dataframe(selected_df[display_cols] if display_cols else selected_df, hide_index=True, width="stretch")
+        st.dataframe(selected_df[[c for c in display_cols if c in selected_df.columns]], hide_index=True, width="stretch")
 
         preview_offcut_id = st.selectbox(
             "Preview selected offcut",
             [str(row.get("offcut_id", "")) for row in selected_rows],
             key="offcut_dialog_preview_id",
         )
-        shape_row = pd.DataFrame()
-        if isinstance(shapes_df, pd.DataFrame) and not shapes_df.empty and "offcut_id" in shapes_df.columns:
-            shape_row = shapes_df[shapes_df["offcut_id"].astype(str) == preview_offcut_id].head(1)
-
-        if not shape_row.empty:
-            points = parse_vertices_json(shape_row.iloc[0].get("vertices_json"))
+        shape_rows = get_offcut_stock_store()[0].shape_rows([preview_offcut_id])
+        if shape_rows:
+            points = parse_vertices_json(shape_rows[0].get("vertices_json"))
             if points:
                 min_px = min(p[0] for p in points)
                 min_py = min(p[1] for p in points)
@@ -1027,11 +1306,13 @@ def offcut_selection_dialog():
         else:
             st.session_state.offcut_selected_ids = [str(row.get("offcut_id", "")) for row in selected_rows]
             st.session_state.offcut_selected_items = selected_rows
+            st.session_state.pop("offcut_dialog_multiselect", None)
             st.session_state.sheet_w = max(float(row.get("bbox_w_mm", 0.0) or 0.0) for row in selected_rows)
             st.session_state.sheet_h = max(float(row.get("bbox_h_mm", 0.0) or 0.0) for row in selected_rows)
             st.session_state.offcut_selector_open = False
             st.rerun()
     if action_col2.button("Close", key="close_offcut_dialog"):
+        st.session_state.pop("offcut_dialog_multiselect", None)
         st.session_state.offcut_selector_open = False
         st.rerun()
 
@@ -1077,6 +1358,12 @@ with input_tab:
     loaded_nest_name = st.session_state.pop("loaded_nest_name", None)
     if loaded_nest_name:
         st.success(f"Loaded nest: {loaded_nest_name}")
+    loaded_violations = st.session_state.pop("loaded_layout_violations", None)
+    if loaded_violations:
+        st.warning(f"Loaded layout has {len(loaded_violations)} placement issue(s). Fix them in Manual Nesting Tuning before export.")
+        with st.expander("Layout issues", expanded=False):
+            for violation in loaded_violations:
+                st.write(f"- {violation['message']}")
 
     if uploaded_nest is None:
         st.session_state.pop("last_loaded_nest_signature", None)
@@ -1239,9 +1526,17 @@ with input_tab:
                 st.warning("Select one or more offcuts before running nesting in Offcut mode.")
                 packer = None
             elif offcut_mode:
+                # Re-read the selection from stock so offcuts reserved or used since selection are dropped.
+                available_offcuts = get_offcut_stock_index().get(st.session_state.offcut_selected_ids, AVAILABLE_STATUSES)
+                if len(available_offcuts) < len(st.session_state.offcut_selected_ids):
+                    st.warning(
+                        f"{len(st.session_state.offcut_selected_ids) - len(available_offcuts)} selected offcut(s) "
+                        "are no longer in stock and were skipped."
+                    )
+                st.session_state.offcut_selected_items = available_offcuts
                 packer = run_offcut_nesting(
                     st.session_state['panels'],
-                    st.session_state.get("offcut_selected_items", []),
+                    available_offcuts,
                     MARGIN,
                     KERF,
                     machine_type=MACHINE_TYPE,
@@ -1262,6 +1557,7 @@ with input_tab:
                     st.error(f"⚠️ CRITICAL WARNING: {missing} panels could not fit on the sheets! Check your Sheet Size or Panel Dimensions.")
                 else:
                     st.success(f"Success! All {total_packed} panels nested on {len(packer)} Sheets.")
+                record_nest_demand(st.session_state['panels'], st.session_state.offcut_origin_job)
 
                 if offcut_mode:
                     st.session_state.last_packer = None
@@ -1320,8 +1616,13 @@ with result_tab:
         if variable_sheets:
             st.caption("CIX export is disabled for Offcut mode.")
         elif st.session_state.manual_layout and st.session_state.manual_layout.get("sheets"):
-            cix_zip = create_cix_zip(st.session_state.manual_layout, st.session_state.cix_preview)
-            st.download_button("💾 CIX Programs", cix_zip, "nest_cix.zip", "application/zip", type="secondary", use_container_width=True)
+            cix_violations = validate_layout(st.session_state.manual_layout)
+            if cix_violations:
+                st.button("💾 CIX Programs", disabled=True, use_container_width=True, key="cix_blocked")
+                st.caption(f"CIX export blocked: {cix_violations[0]['message']} ({len(cix_violations)} issue(s) in total)")
+            else:
+                cix_zip = create_cix_zip(st.session_state.manual_layout, st.session_state.cix_preview)
+                st.download_button("💾 CIX Programs", cix_zip, "nest_cix.zip", "application/zip", type="secondary", use_container_width=True)
 
     if st.session_state.manual_layout and st.session_state.manual_layout.get("sheets"):
         preview_sheets = [
@@ -1366,6 +1667,8 @@ with result_tab:
                             break
                     st.session_state.manual_selected_part_id = first_non_empty_parts[0]["id"] if first_non_empty_parts else None
                     st.session_state.manual_part_select = st.session_state.manual_selected_part_id
+                    st.session_state.manual_canvas_sync = {}
+                    st.session_state.manual_label_index = None
                     st.session_state.show_manual_tuning = True
                     st.rerun()
             with action_col2:
@@ -1405,6 +1708,65 @@ with heat_tab:
             min_offcut_h = st.number_input("Min offcut height (mm)", min_value=0.0, value=120.0, step=10.0, key="min_offcut_h")
             min_offcut_area = st.number_input("Min offcut area (mm²)", min_value=0.0, value=25000.0, step=1000.0, key="min_offcut_area")
 
+            with st.expander("Whole-nest offcut summary", expanded=False):
+                nest_signature = hashlib.md5(
+                    json.dumps(
+                        [st.session_state.manual_layout, min_offcut_w, min_offcut_h, min_offcut_area],
+                        sort_keys=True,
+                        default=str,
+                    ).encode("utf-8")
+                ).hexdigest()
+                if st.button("Analyse all sheets", key="analyse_nest_offcuts"):
+                    with st.spinner("Analysing every sheet..."):
+                        st.session_state.nest_offcut_analysis = {
+                            "signature": nest_signature,
+                            "result": analyze_nest_offcuts(
+                                st.session_state.manual_layout,
+                                min_width=min_offcut_w,
+                                min_height=min_offcut_h,
+                                min_area=min_offcut_area,
+                            ),
+                        }
+
+                nest_analysis = st.session_state.nest_offcut_analysis
+                if nest_analysis and nest_analysis["signature"] == nest_signature:
+                    nest_result = nest_analysis["result"]
+                    nest_totals = nest_result["totals"]
+                    n1, n2, n3, n4 = st.columns(4)
+                    n1.metric("Sheets", nest_totals["sheet_count"])
+                    n2.metric("Utilization", f"{nest_totals['utilization_pct']}%")
+                    n3.metric("Waste area", f"{(nest_totals['waste_area'] / 1_000_000):.2f} m²")
+                    n4.metric("Reclaimable (rect)", f"{(nest_totals.get('rectangles_area', 0.0) / 1_000_000):.2f} m²")
+                    st.dataframe(pd.DataFrame(nest_result["summary"]), hide_index=True, width="stretch")
+
+                    nest_strategy = st.selectbox("Shape type to push", ["Rectangles", "L-shape mix", "C-shape mix", "Polygon-max"], key="nest_offcut_strategy")
+                    if st.button("Push whole nest to stock", key="push_nest_offcuts_sheet"):
+                        sheets_by_index = {sheet["sheet_index"]: sheet for sheet in st.session_state.manual_layout["sheets"]}
+                        nest_sheet_offcuts = [
+                            (sheets_by_index[sheet_result["sheet_index"]], sheet_result["strategies"][nest_strategy])
+                            for sheet_result in nest_result["sheets"]
+                            if sheet_result["strategies"][nest_strategy]
+                        ]
+                        try:
+                            write_counts = queue_nest_offcuts_to_google_sheet(
+                                OFFCUT_STOCK_SHEET_URL,
+                                st.session_state.manual_layout,
+                                nest_sheet_offcuts,
+                                material=infer_offcut_material(st.session_state.get("panels", [])),
+                                thickness_mm=infer_offcut_thickness(st.session_state.get("sheet_preset", "Custom")),
+                                location=OFFCUT_STOCK_LOCATION,
+                                sheet_origin_job=st.session_state.offcut_origin_job,
+                            )
+                            st.success(
+                                f"Added offcuts from {len(nest_sheet_offcuts)} sheet(s) to stock: "
+                                f"inventory={write_counts.get('offcut_inventory', 0)}. "
+                                "They sync to Google Sheets in the background."
+                            )
+                        except Exception as exc:
+                            st.error(f"Could not add offcuts to stock: {exc}")
+                elif nest_analysis:
+                    st.caption("Layout or thresholds changed since the last analysis; run it again.")
+
             offcuts = calculate_sheet_offcuts(
                 st.session_state.manual_layout,
                 selected_sheet,
@@ -1430,6 +1792,20 @@ with heat_tab:
                     min_height=min_offcut_h,
                     min_area=min_offcut_area,
                 )
+                c_mix_candidates = calculate_c_mix_offcuts(
+                    st.session_state.manual_layout,
+                    selected_sheet,
+                    min_width=min_offcut_w,
+                    min_height=min_offcut_h,
+                    min_area=min_offcut_area,
+                )
+                polygon_candidates = calculate_polygon_max_offcuts(
+                    st.session_state.manual_layout,
+                    selected_sheet,
+                    min_width=min_offcut_w,
+                    min_height=min_offcut_h,
+                    min_area=min_offcut_area,
+                )
 
                 rect_tab, l_tab, c_tab, poly_tab = st.tabs([
                     "Rectangles",
@@ -1447,19 +1823,17 @@ with heat_tab:
                     st.dataframe(pd.DataFrame(l_mix_candidates), hide_index=True, width="stretch")
 
                 with c_tab:
-                    st.caption("C-shape allocator not implemented yet; using rectangle preview for now.")
-                    c_preview_df = pd.DataFrame(rect_candidates).copy()
-                    c_preview_df["target_shape"] = "C-first (preview)"
-                    st.dataframe(c_preview_df, hide_index=True, width="stretch")
+                    st.caption("C-shapes first; leftover reusable regions remain as rectangles.")
+                    st.dataframe(pd.DataFrame(c_mix_candidates), hide_index=True, width="stretch")
 
                 with poly_tab:
-                    st.caption("Polygon allocator not implemented yet; showing largest current rectangle candidate.")
-                    poly_preview_df = pd.DataFrame(rect_candidates).head(1).copy()
-                    if poly_preview_df.empty:
-                        st.caption("No candidate shape available for polygon-max preview.")
+                    st.caption("Each free-space region as one polygon; parts enclosed by free space are cut out as holes.")
+                    if polygon_candidates:
+                        poly_df = pd.DataFrame(polygon_candidates)
+                        poly_df["hole_count"] = poly_df["holes"].apply(len)
+                        st.dataframe(poly_df.drop(columns=["vertices", "holes"]), hide_index=True, width="stretch")
                     else:
-                        poly_preview_df["target_shape"] = "Polygon-max (preview)"
-                        st.dataframe(poly_preview_df, hide_index=True, width="stretch")
+                        st.caption("No free-space polygon matches current filter thresholds.")
 
                 st.selectbox(
                     "Select offcut shape type",
@@ -1474,11 +1848,11 @@ with heat_tab:
                     selected_push_candidates = l_mix_candidates
                     st.caption("Push strategy: L-shape mix")
                 elif st.session_state.offcut_strategy == "C-shape mix":
-                    selected_push_candidates = rect_candidates
-                    st.caption("Push strategy: C-shape mix (currently rectangle fallback)")
+                    selected_push_candidates = c_mix_candidates
+                    st.caption("Push strategy: C-shape mix")
                 else:
-                    selected_push_candidates = rect_candidates[:1]
-                    st.caption("Push strategy: Polygon-max (currently largest rectangle fallback)")
+                    selected_push_candidates = polygon_candidates
+                    st.caption("Push strategy: Polygon-max")
 
                 with st.expander("Save reusable offcuts to Google Sheets stock", expanded=False):
                     inferred_material = infer_offcut_material(st.session_state.get("panels", []))
@@ -1493,7 +1867,7 @@ with heat_tab:
 
                     if st.button("Push offcuts to stock", key="push_offcuts_sheet"):
                         try:
-                            write_counts = save_offcuts_to_google_sheet(
+                            write_counts = queue_offcuts_to_google_sheet(
                                 OFFCUT_STOCK_SHEET_URL,
                                 st.session_state.manual_layout,
                                 selected_sheet,
@@ -1504,14 +1878,21 @@ with heat_tab:
                                 sheet_origin_job=st.session_state.offcut_origin_job,
                             )
                             st.success(
-                                "Saved offcuts to Google Sheets: "
+                                "Added offcuts to stock: "
                                 f"inventory={write_counts.get('offcut_inventory', 0)}, "
                                 f"shapes={write_counts.get('offcut_shapes', 0)}, "
                                 f"events={write_counts.get('offcut_events', 0)}, "
-                                f"previews={write_counts.get('offcut_previews', 0)}"
+                                f"previews={write_counts.get('offcut_previews', 0)}. "
+                                "They sync to Google Sheets in the background."
                             )
                         except Exception as exc:
-                            st.error(f"Could not push offcuts to Google Sheets: {exc}")
+                            st.error(f"Could not add offcuts to stock: {exc}")
+                    try:
+                        outbox_caption = stock_outbox_caption()
+                    except Exception:
+                        outbox_caption = None
+                    if outbox_caption:
+                        st.caption(outbox_caption)
             else:
                 st.caption("No reusable offcuts match current filter thresholds.")
 
@@ -1537,7 +1918,13 @@ with heat_tab:
 
             if selected_push_candidates:
                 for candidate in selected_push_candidates:
-                    if str(candidate.get("shape_type", "RECT")).upper() == "L" and candidate.get("vertices"):
+                    if str(candidate.get("shape_type", "RECT")).upper() == "POLYGON" and candidate.get("vertices"):
+                        outline = MplPath.make_compound_path(*[
+                            MplPath(loop + loop[:1], closed=True)
+                            for loop in [candidate["vertices"]] + candidate.get("holes", [])
+                        ])
+                        ax.add_patch(patches.PathPatch(outline, facecolor='#7fd18b', edgecolor='#2f855a', alpha=0.68, linewidth=1.2))
+                    elif str(candidate.get("shape_type", "RECT")).upper() in ("L", "C") and candidate.get("vertices"):
                         vertices = candidate.get("vertices", [])
                         poly = patches.Polygon(vertices, closed=True, facecolor='#7fd18b', edgecolor='#2f855a', alpha=0.68, linewidth=1.2)
                         ax.add_patch(poly)
@@ -1566,14 +1953,31 @@ with heat_tab:
 
 with stock_tab:
     st.subheader("Offcut Stock")
-    st.caption("Live stock view from Google Sheets offcut tabs.")
+    st.caption("Local stock copy, kept in sync with the Google Sheets offcut tabs in the background.")
     st.caption("Grain overlay: " + ("On" if st.session_state.get("show_grain_overlay", False) else "Off"))
 
     if st.button("Refresh offcut stock", key="refresh_offcut_stock"):
-        load_offcut_stock_sheet_data.clear()
+        with st.spinner("Syncing offcut stock from Google Sheets..."):
+            get_offcut_stock_store()[1].sync_now()
 
     try:
-        inventory_df, shapes_df = load_offcut_stock_sheet_data(OFFCUT_STOCK_SHEET_URL)
+        sync_status = get_offcut_stock_store()[1].status()
+        if sync_status["last_error"]:
+            st.warning(f"Last Sheets sync failed ({sync_status['last_error']}); showing the local copy.")
+        st.caption(f"Last synced: {sync_status['last_success_at_utc'] or 'never'}")
+        outbox_caption = stock_outbox_caption()
+        if outbox_caption:
+            st.caption(outbox_caption)
+        outbox, outbox_worker = get_offcut_outbox()
+        parked_pushes = outbox.parked()
+        if parked_pushes:
+            st.warning(f"{len(parked_pushes)} stock push(es) could not be written to Google Sheets and are no longer retried.")
+            st.dataframe(pd.DataFrame(parked_pushes), hide_index=True, width="stretch")
+            if st.button("Retry parked stock pushes", key="offcut_outbox_requeue"):
+                outbox.requeue_parked()
+                outbox_worker.trigger()
+                st.rerun()
+        inventory_df, shapes_df = load_offcut_stock_data()
     except Exception as exc:
         st.error(f"Could not load offcut stock sheet: {exc}")
         inventory_df, shapes_df = pd.DataFrame(), pd.DataFrame()
@@ -1581,10 +1985,13 @@ with stock_tab:
     if inventory_df is None or inventory_df.empty:
         st.info("No offcut stock records found yet.")
     else:
+        demand_history = load_demand_histogram(OFFCUT_DEMAND_HISTORY_PATH)
+        if demand_history["total"]:
+            st.caption(f"Usable score: % of {demand_history['total']} past panels that would fit each offcut.")
         display_cols = [
             c for c in [
                 "offcut_id", "status", "material", "thickness_mm", "shape_type", "area_mm2",
-                "bbox_w_mm", "bbox_h_mm", "location", "sheet_origin_job", "captured_at_utc"
+                "bbox_w_mm", "bbox_h_mm", "usable_score", "location", "sheet_origin_job", "captured_at_utc"
             ] if c in inventory_df.columns
         ]
         st.dataframe(inventory_df[display_cols] if display_cols else inventory_df, hide_index=True, width="stretch")
@@ -1602,6 +2009,16 @@ with stock_tab:
                 info_col3.metric("BBox W (mm)", f"{row.get('bbox_w_mm', '')}")
                 info_col4.metric("BBox H (mm)", f"{row.get('bbox_h_mm', '')}")
 
+                action_col1, action_col2 = st.columns([3, 1])
+                stock_action = action_col1.selectbox("Stock action", list(OFFCUT_STOCK_ACTIONS), key="stock_offcut_action")
+                if action_col2.button("Apply", key="apply_stock_offcut_action"):
+                    try:
+                        record_offcut_events([selected_offcut_id], OFFCUT_STOCK_ACTIONS[stock_action])
+                    except ValueError as exc:
+                        st.error(str(exc))
+                    else:
+                        st.rerun()
+
                 shape_row = pd.DataFrame()
                 if isinstance(shapes_df, pd.DataFrame) and not shapes_df.empty and "offcut_id" in shapes_df.columns:
                     shape_row = shapes_df[shapes_df["offcut_id"].astype(str) == selected_offcut_id].head(1)
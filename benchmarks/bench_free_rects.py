@@ -0,0 +1,81 @@
+"""Time the offcut free-space engine on dense 200-part sheets.
+
+Run from the repo root:
+
+    python benchmarks/bench_free_rects.py [--parts 200] [--sheets 5] [--seed 7]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manual_layout import _kerf_conflicts  # noqa: E402
+from offcut_utils import (  # noqa: E402
+    _compute_free_rects,
+    _usable_sheet_and_parts,
+    build_sheet_offcut_preview,
+    calculate_sheet_offcuts,
+)
+
+SHEET_W = 2440.0
+SHEET_H = 1220.0
+MARGIN = 10.0
+KERF = 6.0
+
+
+def scattered_sheet(part_count, rng):
+    """Random non-conflicting parts; worst case for free-rect fragmentation."""
+    parts = []
+    attempts = 0
+    while len(parts) < part_count and attempts < part_count * 200:
+        attempts += 1
+        w = rng.choice([rng.uniform(30.0, 220.0), rng.choice([60.0, 100.0, 150.0])])
+        h = rng.choice([rng.uniform(30.0, 160.0), rng.choice([50.0, 80.0])])
+        candidate = {
+            "id": f"P{len(parts) + 1}",
+            "rid": "Part",
+            "x": float(round(rng.uniform(MARGIN, SHEET_W - MARGIN - w))),
+            "y": float(round(rng.uniform(MARGIN, SHEET_H - MARGIN - h))),
+            "w": w,
+            "h": h,
+        }
+        if next(_kerf_conflicts(parts + [candidate], KERF), None) is None:
+            parts.append(candidate)
+    return {"sheet_index": 0, "parts": parts}
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--parts", type=int, default=200)
+    parser.add_argument("--sheets", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    layout = {"sheet_w": SHEET_W, "sheet_h": SHEET_H, "margin": MARGIN, "kerf": KERF}
+
+    print(f"{'sheet':>5} {'parts':>6} {'free':>6} {'free_rects ms':>14} {'offcuts ms':>11} {'preview ms':>11}")
+    for n in range(args.sheets):
+        sheet = scattered_sheet(args.parts, rng)
+        usable, parts = _usable_sheet_and_parts(layout, sheet)
+        free_rects, t_free = timed(_compute_free_rects, usable, parts)
+        _, t_offcuts = timed(calculate_sheet_offcuts, layout, sheet)
+        _, t_preview = timed(build_sheet_offcut_preview, layout, sheet)
+        print(
+            f"{n + 1:>5} {len(parts):>6} {len(free_rects):>6} "
+            f"{t_free * 1000:>14.1f} {t_offcuts * 1000:>11.1f} {t_preview * 1000:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import math
 from copy import deepcopy
 
 
@@ -26,6 +27,82 @@ def _in_bounds(rect, sheet_w, sheet_h, margin):
     )
 
 
+def _kerf_conflicts(rects, clearance):
+    """Yield index pairs of rects closer than ``clearance`` using sweep and prune on x."""
+    order = sorted(range(len(rects)), key=lambda i: rects[i]["x"])
+    active = []
+    for i in order:
+        rect = rects[i]
+        active = [j for j in active if rects[j]["x"] + rects[j]["w"] + clearance > rect["x"]]
+        for j in active:
+            if _too_close(rects[j], rect, clearance):
+                yield j, i
+        active.append(i)
+
+
+def _overlaps(a, b, tol=0.0):
+    return not (
+        a["x"] + a["w"] <= b["x"] + tol
+        or b["x"] + b["w"] <= a["x"] + tol
+        or a["y"] + a["h"] <= b["y"] + tol
+        or b["y"] + b["h"] <= a["y"] + tol
+    )
+
+
+def validate_layout(layout):
+    """Check every sheet of a layout and return a list of structured violations.
+
+    Each violation is ``{"type", "sheet_index", "part_ids", "message"}`` where
+    type is one of "out_of_sheet", "margin", "overlap" or "kerf". Pairs are
+    found with one sweep-and-prune pass per sheet.
+    """
+    violations = []
+    margin = float(layout.get("margin", 0.0))
+    kerf = float(layout.get("kerf", 0.0))
+    # Packer output lands parts exactly one kerf apart; ignore float rounding noise.
+    tol = 1e-6
+    for sheet_index, sheet in enumerate(layout.get("sheets", [])):
+        parts = [
+            {**p, "x": float(p["x"]), "y": float(p["y"]), "w": float(p["w"]), "h": float(p["h"])}
+            for p in sheet.get("parts", [])
+        ]
+        sheet_w, sheet_h = _sheet_dims(layout, sheet)
+        label = f"Sheet {sheet.get('sheet_index', sheet_index) + 1}"
+
+        for p in parts:
+            rid = p.get("rid", p["id"])
+            if not _in_bounds(p, sheet_w + tol, sheet_h + tol, -tol):
+                violations.append(
+                    {
+                        "type": "out_of_sheet",
+                        "sheet_index": sheet_index,
+                        "part_ids": [p["id"]],
+                        "message": f"{label}: {rid} extends beyond the sheet.",
+                    }
+                )
+            elif not _in_bounds(p, sheet_w, sheet_h, margin - tol):
+                violations.append(
+                    {
+                        "type": "margin",
+                        "sheet_index": sheet_index,
+                        "part_ids": [p["id"]],
+                        "message": f"{label}: {rid} is inside the {margin:g} mm margin.",
+                    }
+                )
+
+        for i, j in sorted(_kerf_conflicts(parts, kerf - tol)):
+            a, b = parts[i], parts[j]
+            pair = f"{a.get('rid', a['id'])} and {b.get('rid', b['id'])}"
+            if _overlaps(a, b, tol):
+                kind, message = "overlap", f"{label}: {pair} overlap."
+            else:
+                kind, message = "kerf", f"{label}: {pair} are closer than the {kerf:g} mm kerf."
+            violations.append(
+                {"type": kind, "sheet_index": sheet_index, "part_ids": [a["id"], b["id"]], "message": message}
+            )
+    return violations
+
+
 def can_place(rect, parts, part_id, sheet_w, sheet_h, margin, kerf):
     if not _in_bounds(rect, sheet_w, sheet_h, margin):
         return False, "Out of sheet bounds (margin respected)."
@@ -66,27 +143,70 @@ def initialize_layout_from_packer(packer, margin, kerf, sheet_w, sheet_h):
     }
 
 
-def build_indexed_part_labels(layout, sheet_index):
-    all_parts = [p for sheet in layout.get("sheets", []) for p in sheet.get("parts", [])]
-    rid_totals = {}
-    for part in all_parts:
-        rid = str(part.get("rid", "Part"))
-        rid_totals[rid] = rid_totals.get(rid, 0) + 1
-
-    rid_seen = {}
-    label_map = {}
-    target_sheet = layout.get("sheets", [])[sheet_index]
-    target_part_ids = {p["id"] for p in target_sheet.get("parts", [])}
-    for part in all_parts:
-        rid = str(part.get("rid", "Part"))
-        rid_seen[rid] = rid_seen.get(rid, 0) + 1
-        if part.get("id") in target_part_ids:
-            if rid_totals[rid] > 1:
-                label_map[part["id"]] = f"{rid} {rid_seen[rid]}"
-            else:
-                label_map[part["id"]] = rid
+def _label_rid_members(labels, rid, members):
+    if len(members) > 1:
+        for n, pid in enumerate(members, start=1):
+            labels[pid] = f"{rid} {n}"
+    elif members:
+        labels[members[0]] = rid
 
-    return label_map
+
+def build_part_label_index(layout):
+    """Index indexed part labels ("Bed Side 2") for the whole nest in one pass.
+
+    Duplicate rids are numbered in nest order (sheet order, then part order).
+    """
+    rid_members = {}
+    part_rid = {}
+    sheet_of = {}
+    for sheet_index, sheet in enumerate(layout.get("sheets", [])):
+        for part in sheet.get("parts", []):
+            rid = str(part.get("rid", "Part"))
+            rid_members.setdefault(rid, []).append(part["id"])
+            part_rid[part["id"]] = rid
+            sheet_of[part["id"]] = sheet_index
+
+    labels = {}
+    for rid, members in rid_members.items():
+        _label_rid_members(labels, rid, members)
+
+    return {"labels": labels, "rid_members": rid_members, "part_rid": part_rid, "sheet_of": sheet_of}
+
+
+def sheet_part_labels(label_index, layout, sheet_index):
+    labels = label_index["labels"]
+    return {
+        p["id"]: labels.get(p["id"], str(p.get("rid", "Part")))
+        for p in layout["sheets"][sheet_index].get("parts", [])
+    }
+
+
+def relocate_part_label(label_index, part_id, to_sheet_index):
+    """Update ``label_index`` in place after ``part_id`` was appended to another sheet.
+
+    Only parts sharing the moved part's rid are renumbered.
+    """
+    rid = label_index["part_rid"].get(part_id)
+    if rid is None:
+        return label_index
+
+    sheet_of = label_index["sheet_of"]
+    members = [pid for pid in label_index["rid_members"][rid] if pid != part_id]
+    insert_at = len(members)
+    for pos, pid in enumerate(members):
+        if sheet_of[pid] > to_sheet_index:
+            insert_at = pos
+            break
+    members.insert(insert_at, part_id)
+
+    sheet_of[part_id] = to_sheet_index
+    label_index["rid_members"][rid] = members
+    _label_rid_members(label_index["labels"], rid, members)
+    return label_index
+
+
+def build_indexed_part_labels(layout, sheet_index):
+    return sheet_part_labels(build_part_label_index(layout), layout, sheet_index)
 
 
 def move_part(layout, sheet_index, part_id, dx, dy):
@@ -135,3 +255,144 @@ def rotate_part_90(layout, sheet_index, part_id):
             p["rotated"] = not p.get("rotated", False)
             return new_layout, True, "Rotated"
     return layout, False, "Part not found"
+
+
+class _MaxSegmentTree:
+    """Range chmax / range max over compressed coordinate slots."""
+
+    def __init__(self, size, floor):
+        self.size = max(1, size)
+        self.floor = floor
+        self.best = [floor] * (4 * self.size)
+        self.lazy = [floor] * (4 * self.size)
+
+    def _push(self, node):
+        tag = self.lazy[node]
+        if tag > self.floor:
+            for child in (2 * node, 2 * node + 1):
+                if tag > self.best[child]:
+                    self.best[child] = tag
+                if tag > self.lazy[child]:
+                    self.lazy[child] = tag
+            self.lazy[node] = self.floor
+
+    def query(self, lo, hi, node=1, left=0, right=None):
+        if right is None:
+            right = self.size - 1
+        if hi < left or right < lo:
+            return self.floor
+        if lo <= left and right <= hi:
+            return self.best[node]
+        self._push(node)
+        mid = (left + right) // 2
+        return max(
+            self.query(lo, hi, 2 * node, left, mid),
+            self.query(lo, hi, 2 * node + 1, mid + 1, right),
+        )
+
+    def raise_to(self, lo, hi, value, node=1, left=0, right=None):
+        if right is None:
+            right = self.size - 1
+        if hi < left or right < lo:
+            return
+        if lo <= left and right <= hi:
+            if value > self.best[node]:
+                self.best[node] = value
+            if value > self.lazy[node]:
+                self.lazy[node] = value
+            return
+        self._push(node)
+        mid = (left + right) // 2
+        self.raise_to(lo, hi, value, 2 * node, left, mid)
+        self.raise_to(lo, hi, value, 2 * node + 1, mid + 1, right)
+        self.best[node] = max(self.best[2 * node], self.best[2 * node + 1])
+
+
+def _gravity_pass(rects, axis, margin, kerf, limit, toward_max=False):
+    """Slide every rect along ``axis`` ("x" or "y") as far as kerf and margin allow.
+
+    Rects are swept in order of their leading edge and each one lands against the
+    nearest kerf-inflated skyline over its cross-axis span, so the pass never
+    needs pairwise placement probes. Returns True if anything moved.
+    """
+    pos, size = (axis, "w" if axis == "x" else "h")
+    cross, cross_size = ("y", "h") if axis == "x" else ("x", "w")
+
+    edges = sorted({r[cross] for r in rects} | {r[cross] + r[cross_size] + kerf for r in rects})
+    slot = {value: n for n, value in enumerate(edges)}
+    skyline = _MaxSegmentTree(len(edges) - 1, float("-inf"))
+
+    moved = False
+    order = sorted(rects, key=lambda r: (r[pos] + r[size], r[cross]), reverse=True) if toward_max else sorted(
+        rects, key=lambda r: (r[pos], r[cross])
+    )
+    for rect in order:
+        lo = slot[rect[cross]]
+        hi = slot[rect[cross] + rect[cross_size] + kerf] - 1
+        if toward_max:
+            landing = limit - margin - rect[size]
+            while landing + rect[size] > limit - margin:
+                landing = math.nextafter(landing, -math.inf)
+            nearest = -skyline.query(lo, hi)
+            if nearest < math.inf:
+                stop = nearest - kerf - rect[size]
+                while stop + rect[size] + kerf > nearest:
+                    stop = math.nextafter(stop, -math.inf)
+                landing = min(landing, stop)
+            if landing > rect[pos]:
+                rect[pos] = landing
+                moved = True
+            skyline.raise_to(lo, hi, -rect[pos])
+        else:
+            landing = max(margin, skyline.query(lo, hi))
+            if landing < rect[pos]:
+                rect[pos] = landing
+                moved = True
+            skyline.raise_to(lo, hi, rect[pos] + rect[size] + kerf)
+    return moved
+
+
+_COMPACT_CORNERS = {
+    "bottom-left": (False, False),
+    "bottom-right": (True, False),
+    "top-left": (False, True),
+    "top-right": (True, True),
+}
+
+
+def compact_sheet(layout, sheet_index, corner="bottom-left", max_passes=8):
+    """Slide every part on a sheet toward ``corner`` under kerf and margin rules.
+
+    Alternates vertical and horizontal gravity passes until nothing moves.
+    """
+    if corner not in _COMPACT_CORNERS:
+        raise ValueError(f"Unknown corner: {corner}")
+    toward_right, toward_top = _COMPACT_CORNERS[corner]
+
+    new_layout = deepcopy(layout)
+    sheet = new_layout["sheets"][sheet_index]
+    parts = sheet.get("parts", [])
+    if not parts:
+        return layout, False, "No parts to compact"
+
+    sheet_w, sheet_h = _sheet_dims(new_layout, sheet)
+    margin = float(new_layout["margin"])
+    kerf = float(new_layout["kerf"])
+
+    moved = False
+    for _ in range(max_passes):
+        moved_y = _gravity_pass(parts, "y", margin, kerf, sheet_h, toward_top)
+        moved_x = _gravity_pass(parts, "x", margin, kerf, sheet_w, toward_right)
+        moved = moved or moved_y or moved_x
+        if not (moved_y or moved_x):
+            break
+    if not moved:
+        return layout, True, "Sheet already compact"
+
+    for p in parts:
+        if not _in_bounds(p, sheet_w, sheet_h, margin):
+            return layout, False, f"{p['rid']} out of sheet bounds (margin respected)."
+    for i, j in _kerf_conflicts(parts, kerf):
+        return layout, False, f"{parts[i]['rid']} too close to {parts[j]['rid']} (kerf clearance violation)."
+
+    return new_layout, True, "Compacted"
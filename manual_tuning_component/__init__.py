@@ -7,13 +7,11 @@ _FRONTEND_DIR = Path(__file__).parent / "frontend"
 _component = components.declare_component("manual_tuning_canvas", path=str(_FRONTEND_DIR))
 
 
-def manual_tuning_canvas(layout, selected_sheet_idx, selected_part_id, grid_rows, part_labels=None, snap_enabled=False, snap_size=10.0, show_snap_grid=False, align_snap_enabled=True, align_snap_tolerance=4.0, kerf_prompt_enabled=True, kerf_prompt_threshold=12.0, measure_enabled=False, measure_clear_seq=0, key=None):
+def manual_tuning_canvas(sheet_sync, selected_part_id, guide_grid, snap_enabled=False, snap_size=10.0, show_snap_grid=False, align_snap_enabled=True, align_snap_tolerance=4.0, kerf_prompt_enabled=True, kerf_prompt_threshold=12.0, measure_enabled=False, measure_clear_seq=0, key=None):
     payload = {
-        "layout": layout,
-        "selected_sheet_idx": int(selected_sheet_idx),
+        "sheet_sync": sheet_sync,
         "selected_part_id": selected_part_id,
-        "grid_rows": grid_rows,
-        "part_labels": part_labels or {},
+        "guide_grid": guide_grid,
         "snap_enabled": bool(snap_enabled),
         "snap_size": float(snap_size),
         "show_snap_grid": bool(show_snap_grid),
@@ -24,4 +22,4 @@ def manual_tuning_canvas(layout, selected_sheet_idx, selected_part_id, grid_rows
         "measure_enabled": bool(measure_enabled),
         "measure_clear_seq": int(measure_clear_seq),
     }
-    return _component(data=json.dumps(payload), key=key, default=None)
+    return _component(data=json.dumps(payload, separators=(",", ":")), key=key, default=None)
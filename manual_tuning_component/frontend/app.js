@@ -1,9 +1,13 @@
 const canvas = document.getElementById('canvas');
       const ctx = canvas.getContext('2d');
+      const hint = document.getElementById('hint');
+      const DEFAULT_HINT = hint.textContent;
       let state = null;
       let drag = null;
       let measure = { start: null, end: null, clearSeq: 0 };
       let view = { zoom: 1.0, offsetX: 0.0, offsetY: 0.0, sheetW: null, sheetH: null };
+      let synced = { sheetIndex: null, version: null, meta: null, parts: new Map(), order: [] };
+      let resyncRequestedFor = null;
       const DRAG_THRESHOLD_PX = 6;
 const MEASURE_SNAP_PX = 10;
 const MIN_ZOOM = 1.0;
@@ -197,6 +201,72 @@ function findKerfSuggestion(part, x, y) {
 }
 
 
+// Mirrors manual_layout._in_bounds / _too_close so the canvas rejects the same drops
+// Python would; Python still re-validates every emitted move.
+function inBounds(x, y, w, h) {
+  return (
+    x >= state.margin
+    && y >= state.margin
+    && x + w <= state.sheetW - state.margin
+    && y + h <= state.sheetH - state.margin
+  );
+}
+
+function tooClose(a, b, clearance) {
+  return !(
+    a.x + a.w + clearance <= b.x
+    || b.x + b.w + clearance <= a.x
+    || a.y + a.h + clearance <= b.y
+    || b.y + b.h + clearance <= a.y
+  );
+}
+
+function buildCollisionIndex(excludeId) {
+  const others = state.parts.filter(p => p.id !== excludeId);
+  const cellCount = Math.max(1, Math.ceil(Math.sqrt(others.length)));
+  const cellSize = Math.max(1, Math.max(state.sheetW, state.sheetH) / cellCount);
+  const cells = new Map();
+  for (const other of others) {
+    const c1 = Math.floor((other.x - state.kerf) / cellSize);
+    const c2 = Math.floor((other.x + other.w + state.kerf) / cellSize);
+    const r1 = Math.floor((other.y - state.kerf) / cellSize);
+    const r2 = Math.floor((other.y + other.h + state.kerf) / cellSize);
+    for (let c = c1; c <= c2; c++) {
+      for (let r = r1; r <= r2; r++) {
+        const key = `${c},${r}`;
+        if (!cells.has(key)) cells.set(key, []);
+        cells.get(key).push(other);
+      }
+    }
+  }
+  return { cellSize, cells };
+}
+
+function checkPlacement(index, part, x, y) {
+  if (!inBounds(x, y, part.w, part.h)) {
+    return { ok: false, reason: 'Out of sheet bounds (margin respected).' };
+  }
+  const rect = { x, y, w: part.w, h: part.h };
+  const c1 = Math.floor(x / index.cellSize);
+  const c2 = Math.floor((x + part.w) / index.cellSize);
+  const r1 = Math.floor(y / index.cellSize);
+  const r2 = Math.floor((y + part.h) / index.cellSize);
+  for (let c = c1; c <= c2; c++) {
+    for (let r = r1; r <= r2; r++) {
+      for (const other of index.cells.get(`${c},${r}`) || []) {
+        if (tooClose(rect, other, state.kerf)) {
+          return { ok: false, reason: `Too close to ${other.rid} (kerf clearance violation).` };
+        }
+      }
+    }
+  }
+  return { ok: true, reason: 'OK' };
+}
+
+function setHint(text) {
+  hint.textContent = text || DEFAULT_HINT;
+}
+
 function distance(a, b) {
   const dx = a.x - b.x;
   const dy = a.y - b.y;
@@ -248,6 +318,30 @@ function getMeasureSnapPoint(world) {
   return best ? best.p : world;
 }
 
+function drawGuideGrid(grid) {
+  if (!grid || !grid.runs || grid.runs.length === 0) return;
+  const xs = grid.xs;
+  const ys = grid.ys;
+  const cols = xs.length - 1;
+  const runs = grid.runs;
+  let cell = 0;
+
+  // Runs are row-major [code, count, ...]; code 0 is legal. Each run is drawn as
+  // one rect per grid row it spans instead of one rect per cell.
+  for (let i = 0; i < runs.length; i += 2) {
+    const fill = runs[i] === 0 ? 'rgba(102, 187, 106, 0.32)' : 'rgba(239, 83, 80, 0.36)';
+    let remaining = runs[i + 1];
+    while (remaining > 0) {
+      const row = Math.floor(cell / cols);
+      const col = cell % cols;
+      const span = Math.min(remaining, cols - col);
+      drawRect(xs[col], ys[row], xs[col + span] - xs[col], ys[row + 1] - ys[row], fill, null);
+      cell += span;
+      remaining -= span;
+    }
+  }
+}
+
 function drawRect(x, y, w, h, fill, stroke, lineWidth=1) {
         const p1 = toPx(x, y);
         const p2 = toPx(x + w, y + h);
@@ -270,9 +364,7 @@ function drawRect(x, y, w, h, fill, stroke, lineWidth=1) {
         if (!state) return;
         ctx.clearRect(0, 0, canvas.width, canvas.height);
 
-        for (const cell of state.gridRows) {
-          drawRect(cell.x, cell.y, cell.x2 - cell.x, cell.y2 - cell.y, cell.is_legal ? 'rgba(102, 187, 106, 0.32)' : 'rgba(239, 83, 80, 0.36)', null);
-        }
+        drawGuideGrid(state.guideGrid);
 
         drawRect(0, 0, state.sheetW, state.sheetH, null, '#333', 2);
         drawRect(state.margin, state.margin, state.sheetW - 2*state.margin, state.sheetH - 2*state.margin, null, '#cc0000', 1);
@@ -281,7 +373,11 @@ function drawRect(x, y, w, h, fill, stroke, lineWidth=1) {
 
         for (const part of state.parts) {
           const isSelected = part.id === state.selectedPartId;
-          drawRect(part.x, part.y, part.w, part.h, isSelected ? '#f39c12' : '#4a90e2', '#222', isSelected ? 3 : 1);
+          let fill = isSelected ? '#f39c12' : '#4a90e2';
+          if (drag && drag.dragged && drag.placement && part.id === drag.partId) {
+            fill = drag.placement.ok ? '#66bb6a' : '#ef5350';
+          }
+          drawRect(part.x, part.y, part.w, part.h, fill, '#222', isSelected ? 3 : 1);
           const c = toPx(part.x + part.w/2, part.y + part.h/2);
           ctx.fillStyle = '#111';
           ctx.font = '12px Arial';
@@ -358,8 +454,12 @@ function pickPart(mx, my) {
           startMouseY: my,
           offsetX: p.x - part.x,
           offsetY: p.y - part.y,
+          originX: part.x,
+          originY: part.y,
           dragged: false,
           snappedByAlign: false,
+          index: null,
+          placement: null,
         };
       });
 
@@ -373,6 +473,7 @@ function pickPart(mx, my) {
         const dy = my - drag.startMouseY;
         if (!drag.dragged && (Math.abs(dx) > DRAG_THRESHOLD_PX || Math.abs(dy) > DRAG_THRESHOLD_PX)) {
           drag.dragged = true;
+          drag.index = buildCollisionIndex(drag.partId);
         }
 
         if (!drag.dragged) return;
@@ -395,6 +496,8 @@ function pickPart(mx, my) {
         const snapped = applySnap(moving, candidateX, candidateY);
         moving.x = snapped.x;
         moving.y = snapped.y;
+        drag.placement = checkPlacement(drag.index, moving, moving.x, moving.y);
+        setHint(drag.placement.ok ? 'Legal position.' : drag.placement.reason);
         render();
       });
 
@@ -405,12 +508,25 @@ function pickPart(mx, my) {
         if (drag.dragged) {
           if (!drag.snappedByAlign) {
             const suggestion = findKerfSuggestion(moved, moved.x, moved.y);
-            if (suggestion) {
+            if (suggestion && checkPlacement(drag.index, moved, suggestion.x, suggestion.y).ok) {
               emit({ type: 'suggest_snap', part_id: drag.partId, x: suggestion.x, y: suggestion.y, gap: suggestion.distance });
               drag = null;
               return;
             }
           }
+          const placement = checkPlacement(drag.index, moved, moved.x, moved.y);
+          if (!placement.ok) {
+            // Snap back locally and let Python land the part at the nearest legal spot.
+            const target = { x: moved.x, y: moved.y };
+            moved.x = drag.originX;
+            moved.y = drag.originY;
+            drag = null;
+            setHint(`Move rejected: ${placement.reason} Snapping to nearest legal position...`);
+            render();
+            emit({ type: 'snap_to_legal', part_id: moved.id, x: target.x, y: target.y });
+            return;
+          }
+          setHint(null);
           emit({ type: 'move', part_id: drag.partId, x: moved.x, y: moved.y });
         } else {
           emit({ type: 'select', part_id: drag.partId });
@@ -441,33 +557,70 @@ function pickPart(mx, my) {
         render();
       }, { passive: false });
 
+      function applySheetSync(sync) {
+        if (sync.mode === 'full') {
+          synced = {
+            sheetIndex: sync.sheet_index,
+            version: sync.version,
+            meta: sync.meta,
+            parts: new Map(sync.parts.map(part => [part.id, part])),
+            order: sync.parts.map(part => part.id),
+          };
+          return true;
+        }
+
+        if (synced.version === null || synced.sheetIndex !== sync.sheet_index) return false;
+        if (synced.version === sync.version) {
+          synced.meta = sync.meta;
+          return true;
+        }
+        if (synced.version !== sync.base_version) return false;
+
+        for (const id of sync.removed) synced.parts.delete(id);
+        for (const part of sync.upserts) synced.parts.set(part.id, part);
+        if (sync.order) synced.order = sync.order;
+        synced.version = sync.version;
+        synced.meta = sync.meta;
+        return true;
+      }
+
       function onRender(event) {
         const msg = event.data || {};
         if (msg.type !== "streamlit:render") return;
         const args = msg.args || {};
         const payload = JSON.parse(args.data);
-        const layout = payload.layout;
-        const sheet = layout.sheets[payload.selected_sheet_idx];
-        const partLabels = payload.part_labels || {};
+        const sync = payload.sheet_sync;
+
+        if (!applySheetSync(sync)) {
+          // Missed a delta (or the iframe was remounted): ask Python for the full sheet once.
+          if (resyncRequestedFor !== sync.version) {
+            resyncRequestedFor = sync.version;
+            emit({ type: 'resync', have_version: synced.version });
+          }
+          return;
+        }
+        resyncRequestedFor = null;
+        const meta = synced.meta;
 
         const maxW = 1200;
         const maxH = 560;
-        const scale = Math.min(maxW / layout.sheet_w, maxH / layout.sheet_h);
-        canvas.width = Math.max(600, Math.floor(layout.sheet_w * scale));
-        canvas.height = Math.max(260, Math.floor(layout.sheet_h * scale));
+        const scale = Math.min(maxW / meta.sheet_w, maxH / meta.sheet_h);
+        canvas.width = Math.max(600, Math.floor(meta.sheet_w * scale));
+        canvas.height = Math.max(260, Math.floor(meta.sheet_h * scale));
 
-        const sheetChanged = view.sheetW !== layout.sheet_w || view.sheetH !== layout.sheet_h;
+        const sheetChanged = view.sheetW !== meta.sheet_w || view.sheetH !== meta.sheet_h;
 
         state = {
-          sheetW: layout.sheet_w,
-          sheetH: layout.sheet_h,
-          margin: layout.margin,
+          sheetW: meta.sheet_w,
+          sheetH: meta.sheet_h,
+          margin: meta.margin,
           selectedPartId: payload.selected_part_id,
-          parts: JSON.parse(JSON.stringify(sheet.parts)).map(part => ({
-            ...part,
-            display_label: partLabels[part.id] || part.rid,
-          })),
-          gridRows: payload.grid_rows || [],
+          // Drags mutate these working copies; the synced map keeps the last server state.
+          parts: synced.order.map(id => {
+            const part = synced.parts.get(id);
+            return { ...part, display_label: part.label || part.rid };
+          }),
+          guideGrid: payload.guide_grid || null,
           snapEnabled: Boolean(payload.snap_enabled),
           snapSize: Number(payload.snap_size || 10),
           showSnapGrid: Boolean(payload.show_snap_grid),
@@ -475,14 +628,14 @@ function pickPart(mx, my) {
           alignSnapTolerance: Number(payload.align_snap_tolerance || 4),
           kerfPromptEnabled: Boolean(payload.kerf_prompt_enabled),
           kerfPromptThreshold: Number(payload.kerf_prompt_threshold || 12),
-          kerf: Number(layout.kerf || 0),
+          kerf: Number(meta.kerf || 0),
           measureEnabled: Boolean(payload.measure_enabled),
           measureClearSeq: Number(payload.measure_clear_seq || 0),
           scale,
         };
 
         if (sheetChanged) {
-          view = { zoom: 1.0, offsetX: 0.0, offsetY: 0.0, sheetW: layout.sheet_w, sheetH: layout.sheet_h };
+          view = { zoom: 1.0, offsetX: 0.0, offsetY: 0.0, sheetW: meta.sheet_w, sheetH: meta.sheet_h };
         }
 
         if (measure.clearSeq !== state.measureClearSeq) {
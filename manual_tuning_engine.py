@@ -1,6 +1,9 @@
+import heapq
+import math
 from copy import deepcopy
 
-from manual_layout import can_place
+from manual_layout import _in_bounds, _kerf_conflicts, _sheet_dims, _too_close, can_place
+from offcut_utils import _compute_free_rects
 
 
 def find_part(layout, sheet_index, part_id):
@@ -53,6 +56,292 @@ def move_part_to(layout, sheet_index, part_id, target_x, target_y):
     return new_layout, True, "Moved"
 
 
+def _group_parts(layout, sheet_index, part_ids):
+    wanted = set(part_ids)
+    group = [p for p in layout["sheets"][sheet_index]["parts"] if p["id"] in wanted]
+    if len(group) != len(wanted):
+        return None
+    return group
+
+
+def _apply_group_edit(layout, sheet_index, updates, success_msg):
+    # One copy and one sweep over the final sheet, however many parts moved.
+    new_layout = deepcopy(layout)
+    sheet = new_layout["sheets"][sheet_index]
+    sheet_w, sheet_h = _sheet_dims(new_layout, sheet)
+    margin = float(new_layout["margin"])
+    kerf = float(new_layout["kerf"])
+
+    parts = sheet["parts"]
+    for p in parts:
+        if p["id"] in updates:
+            p.update(updates[p["id"]])
+            if not _in_bounds(p, sheet_w, sheet_h, margin):
+                return layout, False, f"{p['rid']} out of sheet bounds (margin respected)."
+
+    for i, j in _kerf_conflicts(parts, kerf):
+        if parts[i]["id"] in updates or parts[j]["id"] in updates:
+            return layout, False, f"{parts[i]['rid']} too close to {parts[j]['rid']} (kerf clearance violation)."
+    return new_layout, True, success_msg
+
+
+def move_parts(layout, sheet_index, part_ids, dx, dy):
+    group = _group_parts(layout, sheet_index, part_ids)
+    if not group:
+        return layout, False, "Part not found"
+    updates = {p["id"]: {"x": float(p["x"] + dx), "y": float(p["y"] + dy)} for p in group}
+    return _apply_group_edit(layout, sheet_index, updates, f"Moved {len(group)} parts")
+
+
+def align_parts(layout, sheet_index, part_ids, edge):
+    group = _group_parts(layout, sheet_index, part_ids)
+    if not group:
+        return layout, False, "Part not found"
+
+    if edge == "left":
+        x = min(p["x"] for p in group)
+        updates = {p["id"]: {"x": float(x)} for p in group}
+    elif edge == "right":
+        x2 = max(p["x"] + p["w"] for p in group)
+        updates = {p["id"]: {"x": float(x2 - p["w"])} for p in group}
+    elif edge == "bottom":
+        y = min(p["y"] for p in group)
+        updates = {p["id"]: {"y": float(y)} for p in group}
+    elif edge == "top":
+        y2 = max(p["y"] + p["h"] for p in group)
+        updates = {p["id"]: {"y": float(y2 - p["h"])} for p in group}
+    else:
+        raise ValueError(f"Unknown align edge: {edge}")
+    return _apply_group_edit(layout, sheet_index, updates, f"Aligned {len(group)} parts ({edge})")
+
+
+def distribute_parts(layout, sheet_index, part_ids, axis="x", gap=None):
+    """Pack the group along ``axis`` from its first part, ``gap`` apart (kerf by default)."""
+    group = _group_parts(layout, sheet_index, part_ids)
+    if not group:
+        return layout, False, "Part not found"
+    if axis not in ("x", "y"):
+        raise ValueError(f"Unknown distribute axis: {axis}")
+
+    size_key = "w" if axis == "x" else "h"
+    spacing = float(layout["kerf"] if gap is None else gap)
+    ordered = sorted(group, key=lambda p: p[axis])
+    cursor = float(ordered[0][axis])
+    updates = {}
+    for p in ordered:
+        updates[p["id"]] = {axis: cursor}
+        cursor += float(p[size_key]) + spacing
+    return _apply_group_edit(layout, sheet_index, updates, f"Distributed {len(group)} parts")
+
+
+def rotate_parts_90(layout, sheet_index, part_ids):
+    """Rotate the group as one block about its bounding box's lower-left corner."""
+    group = _group_parts(layout, sheet_index, part_ids)
+    if not group:
+        return layout, False, "Part not found"
+
+    bx = min(p["x"] for p in group)
+    by = min(p["y"] for p in group)
+    bh = max(p["y"] + p["h"] for p in group) - by
+    updates = {}
+    for p in group:
+        updates[p["id"]] = {
+            "x": float(bx + bh - (p["y"] - by + p["h"])),
+            "y": float(by + (p["x"] - bx)),
+            "w": float(p["h"]),
+            "h": float(p["w"]),
+            "rotated": not p.get("rotated", False),
+        }
+    return _apply_group_edit(layout, sheet_index, updates, f"Rotated {len(group)} parts")
+
+
+def _lower_edge(limit, size, gap):
+    # Largest start with start + size + gap <= limit, exact under float rounding.
+    start = limit - gap - size
+    while start + size + gap > limit:
+        start = math.nextafter(start, -math.inf)
+    return start
+
+
+def nearest_legal_position(layout, sheet_index, part_id, x, y):
+    """Return the legal (x, y) closest to the requested position, or None if the part fits nowhere.
+
+    The part's free configuration space is the margin box minus one open
+    kerf-inflated rectangle per other part. The closest free point always lies
+    on a line through an obstacle or box edge (or the query itself), so
+    candidates are enumerated from those lines in increasing distance and the
+    first one clear of every obstacle wins.
+    """
+    part = find_part(layout, sheet_index, part_id)
+    if part is None:
+        return None
+    sheet = layout["sheets"][sheet_index]
+    sheet_w = float(layout["sheet_w"])
+    sheet_h = float(layout["sheet_h"])
+    margin = float(layout["margin"])
+    kerf = float(layout["kerf"])
+    w = float(part["w"])
+    h = float(part["h"])
+
+    x_min, y_min = margin, margin
+    x_max = _lower_edge(sheet_w - margin, w, 0.0)
+    y_max = _lower_edge(sheet_h - margin, h, 0.0)
+    if x_max < x_min or y_max < y_min:
+        return None
+
+    others = [p for p in sheet["parts"] if p["id"] != part_id]
+    qx, qy = float(x), float(y)
+    xs = {min(max(qx, x_min), x_max), x_min, x_max}
+    ys = {min(max(qy, y_min), y_max), y_min, y_max}
+    for o in others:
+        for value in (_lower_edge(o["x"], w, kerf), o["x"] + o["w"] + kerf):
+            if x_min <= value <= x_max:
+                xs.add(value)
+        for value in (_lower_edge(o["y"], h, kerf), o["y"] + o["h"] + kerf):
+            if y_min <= value <= y_max:
+                ys.add(value)
+    xs = sorted(xs, key=lambda v: abs(v - qx))
+    ys = sorted(ys, key=lambda v: abs(v - qy))
+
+    # Bucket obstacles by the cells their blocked regions cover.
+    cell = max(w, h, kerf, 1.0) * 2.0
+    buckets = {}
+    for o in others:
+        cx1 = int((o["x"] - kerf - w) // cell)
+        cx2 = int((o["x"] + o["w"] + kerf) // cell)
+        cy1 = int((o["y"] - kerf - h) // cell)
+        cy2 = int((o["y"] + o["h"] + kerf) // cell)
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                buckets.setdefault((cx, cy), []).append(o)
+
+    def is_free(cx, cy):
+        rect = {"x": cx, "y": cy, "w": w, "h": h}
+        for o in buckets.get((int(cx // cell), int(cy // cell)), ()):
+            if _too_close(rect, o, kerf):
+                return False
+        return True
+
+    heap = [((xs[0] - qx) ** 2 + (ys[0] - qy) ** 2, 0, 0)]
+    seen = {(0, 0)}
+    while heap:
+        _, i, j = heapq.heappop(heap)
+        if is_free(xs[i], ys[j]):
+            return xs[i], ys[j]
+        for ni, nj in ((i + 1, j), (i, j + 1)):
+            if ni < len(xs) and nj < len(ys) and (ni, nj) not in seen:
+                seen.add((ni, nj))
+                heapq.heappush(heap, ((xs[ni] - qx) ** 2 + (ys[nj] - qy) ** 2, ni, nj))
+    return None
+
+
+def snap_part_to_legal(layout, sheet_index, part_id, target_x, target_y):
+    """Move a part to ``(target_x, target_y)``, or to the nearest legal position if that is blocked."""
+    new_layout, ok, msg = move_part_to(layout, sheet_index, part_id, target_x, target_y)
+    if ok or find_part(layout, sheet_index, part_id) is None:
+        return new_layout, ok, msg
+
+    position = nearest_legal_position(layout, sheet_index, part_id, target_x, target_y)
+    if position is None:
+        return layout, False, f"No legal position for this part ({msg})"
+    new_layout, ok, _ = move_part_to(layout, sheet_index, part_id, *position)
+    if not ok:
+        return layout, False, msg
+    distance = math.hypot(position[0] - float(target_x), position[1] - float(target_y))
+    return new_layout, True, f"Snapped to nearest legal position ({distance:.1f} mm from drop)"
+
+
+def sheet_free_space_index(layout, sheet_index):
+    """Maximal free rectangles of a sheet in kerf-inflated space.
+
+    Every part and the usable area grow by one kerf on their high sides, so a
+    part of ``w x h`` fits a free rect exactly when ``w + kerf`` and ``h + kerf``
+    do, and its legal position is the rect's lower-left corner.
+    """
+    sheet = layout["sheets"][sheet_index]
+    sheet_w, sheet_h = _sheet_dims(layout, sheet)
+    margin = float(layout["margin"])
+    kerf = float(layout["kerf"])
+    usable = {
+        "x": margin,
+        "y": margin,
+        "w": max(0.0, sheet_w - 2.0 * margin + kerf),
+        "h": max(0.0, sheet_h - 2.0 * margin + kerf),
+    }
+    inflated = sorted(
+        ({"x": p["x"], "y": p["y"], "w": p["w"] + kerf, "h": p["h"] + kerf} for p in sheet.get("parts", [])),
+        key=lambda r: (r["y"], r["x"]),
+    )
+    return _compute_free_rects(usable, inflated)
+
+
+def transfer_part(layout, from_sheet_index, part_id, target_sheet_index=None, allow_rotate=True):
+    """Move a part onto another sheet's best-fitting hole in one atomic edit.
+
+    ``target_sheet_index=None`` searches every other sheet. Holes are ranked by
+    best short side fit; grain-locked parts ("(G)") are never rotated.
+    """
+    part = find_part(layout, from_sheet_index, part_id)
+    if part is None:
+        return layout, False, "Part not found"
+    if target_sheet_index is None:
+        targets = [idx for idx in range(len(layout["sheets"])) if idx != from_sheet_index]
+    elif target_sheet_index == from_sheet_index:
+        return layout, False, "Part is already on that sheet"
+    else:
+        targets = [target_sheet_index]
+
+    kerf = float(layout["kerf"])
+    orientations = [(float(part["w"]), float(part["h"]), False)]
+    if allow_rotate and not str(part.get("rid", "")).endswith("(G)") and part["w"] != part["h"]:
+        orientations.append((float(part["h"]), float(part["w"]), True))
+
+    candidates = []
+    for sheet_index in targets:
+        for free in sheet_free_space_index(layout, sheet_index):
+            for w, h, turned in orientations:
+                left_w = free["w"] - (w + kerf)
+                left_h = free["h"] - (h + kerf)
+                if left_w < 0 or left_h < 0:
+                    continue
+                fit = (min(left_w, left_h), max(left_w, left_h), sheet_index, free["y"], free["x"])
+                candidates.append((fit, sheet_index, free["x"], free["y"], w, h, turned))
+    candidates.sort(key=lambda c: c[0])
+
+    for _, sheet_index, x, y, w, h, turned in candidates:
+        target = layout["sheets"][sheet_index]
+        sheet_w, sheet_h = _sheet_dims(layout, target)
+        ok, _ = can_place(
+            {"x": x, "y": y, "w": w, "h": h},
+            target.get("parts", []),
+            part_id,
+            sheet_w,
+            sheet_h,
+            float(layout["margin"]),
+            kerf,
+        )
+        if not ok:
+            continue
+
+        new_layout = deepcopy(layout)
+        source_parts = new_layout["sheets"][from_sheet_index]["parts"]
+        moving = next(p for p in source_parts if p["id"] == part_id)
+        source_parts.remove(moving)
+        moving.update({"x": x, "y": y, "w": w, "h": h})
+        if turned:
+            moving["rotated"] = not moving.get("rotated", False)
+        new_layout["sheets"][sheet_index].setdefault("parts", []).append(moving)
+
+        msg = f"Transferred to Sheet {new_layout['sheets'][sheet_index].get('sheet_index', sheet_index) + 1}"
+        if turned:
+            msg += " (rotated 90°)"
+        if not source_parts:
+            msg += "; source sheet is now empty"
+        return new_layout, True, msg
+
+    return layout, False, "No hole large enough on the target sheet(s)"
+
+
 def compute_position_grid(layout, sheet_index, part_id, grid_step):
     part = find_part(layout, sheet_index, part_id)
     if part is None:
@@ -142,3 +431,115 @@ def compute_visual_guide_grid(layout, sheet_index, part_id, grid_step):
             x += step
         y += step
     return rows
+
+
+def encode_guide_grid(rows):
+    """Pack guide-grid rows into edge arrays plus a run-length encoded reason grid.
+
+    Cells are emitted row-major (bottom row first) as flat ``[code, count, ...]`` runs,
+    where ``code`` indexes ``legend`` and code 0 is always the legal state.
+    """
+    legend = ["Legal"]
+    if not rows:
+        return {"xs": [], "ys": [], "legend": legend, "runs": [], "legal_count": 0, "blocked_count": 0}
+
+    xs = sorted({r["x"] for r in rows} | {r["x2"] for r in rows})
+    ys = sorted({r["y"] for r in rows} | {r["y2"] for r in rows})
+    col_of = {x: i for i, x in enumerate(xs)}
+    row_of = {y: i for i, y in enumerate(ys)}
+    cols = len(xs) - 1
+
+    codes = [0] * (cols * (len(ys) - 1))
+    legend_codes = {"Legal": 0}
+    legal_count = 0
+    for r in rows:
+        if r["is_legal"]:
+            legal_count += 1
+            code = 0
+        else:
+            reason = r.get("reason") or "Blocked"
+            code = legend_codes.get(reason)
+            if code is None:
+                code = len(legend)
+                legend_codes[reason] = code
+                legend.append(reason)
+        codes[row_of[r["y"]] * cols + col_of[r["x"]]] = code
+
+    runs = []
+    for code in codes:
+        if runs and runs[-2] == code:
+            runs[-1] += 1
+        else:
+            runs.extend([code, 1])
+
+    return {
+        "xs": xs,
+        "ys": ys,
+        "legend": legend,
+        "runs": runs,
+        "legal_count": legal_count,
+        "blocked_count": len(rows) - legal_count,
+    }
+
+
+def build_canvas_sheet_sync(layout, sheet_index, part_labels=None, previous=None):
+    """Build the canvas payload for one sheet and the snapshot to diff the next render against.
+
+    The first render (or a sheet switch) sends the whole sheet; later renders send only
+    parts that changed since ``previous``. ``base_version``/``version`` let the frontend
+    detect a missed update and ask for a full resync.
+    """
+    labels = part_labels or {}
+    sheet = layout["sheets"][sheet_index]
+    sheet_w, sheet_h = _sheet_dims(layout, sheet)
+    meta = {
+        "sheet_w": sheet_w,
+        "sheet_h": sheet_h,
+        "margin": float(layout["margin"]),
+        "kerf": float(layout["kerf"]),
+    }
+
+    parts = {}
+    order = []
+    for p in sheet["parts"]:
+        parts[p["id"]] = {
+            "id": p["id"],
+            "rid": p.get("rid"),
+            "label": labels.get(p["id"], p.get("rid")),
+            "x": float(p["x"]),
+            "y": float(p["y"]),
+            "w": float(p["w"]),
+            "h": float(p["h"]),
+            "rotated": bool(p.get("rotated", False)),
+        }
+        order.append(p["id"])
+
+    if previous is None or previous.get("sheet_index") != sheet_index:
+        version = int(previous["version"]) + 1 if previous else 1
+        payload = {
+            "mode": "full",
+            "sheet_index": int(sheet_index),
+            "version": version,
+            "meta": meta,
+            "parts": [parts[pid] for pid in order],
+        }
+    else:
+        prev_parts = previous["parts"]
+        upserts = [parts[pid] for pid in order if prev_parts.get(pid) != parts[pid]]
+        removed = [pid for pid in prev_parts if pid not in parts]
+        order_changed = order != previous["order"]
+        changed = bool(upserts or removed or order_changed or meta != previous["meta"])
+        version = int(previous["version"]) + (1 if changed else 0)
+        payload = {
+            "mode": "delta",
+            "sheet_index": int(sheet_index),
+            "base_version": int(previous["version"]),
+            "version": version,
+            "meta": meta,
+            "upserts": upserts,
+            "removed": removed,
+            "order": order if order_changed else None,
+        }
+
+    snapshot = {"sheet_index": int(sheet_index), "version": version, "meta": meta, "parts": parts, "order": order}
+    return payload, snapshot
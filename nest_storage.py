@@ -9,6 +9,7 @@ from datetime import datetime
 
 import ezdxf
 
+from manual_layout import validate_layout
 from nesting_engine import run_selco_nesting, run_smart_nesting
 from panel_utils import normalize_panels
 
@@ -76,6 +77,7 @@ def parse_nest_payload(payload):
         "panels": normalize_panels(payload.get("panels", [])),
         "nest_name": str(payload.get("nest_name", "Untitled")),
         "manual_layout": manual_layout,
+        "layout_violations": validate_layout(manual_layout) if manual_layout else [],
         "machine_type": str(settings.get("machine_type", "Flat Bed")),
         "cix_preview": payload.get("cix_preview"),
     }
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import math
+from typing import Any
+
+import numpy as np
+
+AVAILABLE_STATUSES = ("IN_STOCK", "")
+
+
+def _safe_float(value: Any, default: float = 0.0) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return float(default)
+    return number if math.isfinite(number) else float(default)
+
+
+def _text(value: Any) -> str:
+    if value is None or (isinstance(value, float) and not math.isfinite(value)):
+        return ""
+    return str(value).strip()
+
+
+def _bucket_key(row: dict[str, Any]) -> tuple[str, str, float]:
+    return (_text(row.get("status")).upper(), _text(row.get("material")), _safe_float(row.get("thickness_mm"), -1.0))
+
+
+def offcut_label(row: dict[str, Any]) -> str:
+    return (
+        f"{_text(row.get('offcut_id'))} · {_text(row.get('material')) or 'Unknown'} · "
+        f"{row.get('bbox_w_mm', '')} x {row.get('bbox_h_mm', '')} mm · "
+        f"{_text(row.get('shape_type')) or 'RECT'}"
+    )
+
+
+class _Bucket:
+    """Rows sharing status, material and thickness, pre-sorted for size queries."""
+
+    def __init__(self, indices: list[int], widths: np.ndarray, heights: np.ndarray):
+        self.indices = np.asarray(indices, dtype=int)
+        w = widths[self.indices]
+        h = heights[self.indices]
+        self.by_w = np.argsort(w, kind="stable")
+        self.w_sorted = w[self.by_w]
+        self.h_by_w = h[self.by_w]
+        short, long = np.minimum(w, h), np.maximum(w, h)
+        self.by_short = np.argsort(short, kind="stable")
+        self.short_sorted = short[self.by_short]
+        self.long_by_short = long[self.by_short]
+
+    def fitting(self, min_w: float, min_h: float, allow_rotate: bool) -> np.ndarray:
+        if allow_rotate:
+            need_short, need_long = min(min_w, min_h), max(min_w, min_h)
+            start = np.searchsorted(self.short_sorted, need_short, side="left")
+            keep = self.long_by_short[start:] >= need_long
+            return self.indices[self.by_short[start:][keep]]
+        start = np.searchsorted(self.w_sorted, min_w, side="left")
+        keep = self.h_by_w[start:] >= min_h
+        return self.indices[self.by_w[start:][keep]]
+
+
+class StockIndex:
+    """In-memory index over ``offcut_inventory`` rows.
+
+    Rows are hashed by (status, material, thickness); each bucket keeps its
+    rows sorted by width and by short side, so a "fits W x H" query is a
+    binary search plus one vectorised height check per matching bucket.
+    """
+
+    def __init__(self, rows: list[dict[str, Any]]):
+        self.rows = list(rows)
+        self.widths = np.array([_safe_float(row.get("bbox_w_mm")) for row in self.rows], dtype=float)
+        self.heights = np.array([_safe_float(row.get("bbox_h_mm")) for row in self.rows], dtype=float)
+        self.areas = np.array(
+            [_safe_float(row.get("area_mm2"), w * h) for row, w, h in zip(self.rows, self.widths, self.heights)],
+            dtype=float,
+        )
+        self.by_id = {_text(row.get("offcut_id")): idx for idx, row in enumerate(self.rows)}
+
+        grouped: dict[tuple[str, str, float], list[int]] = {}
+        for idx, row in enumerate(self.rows):
+            grouped.setdefault(_bucket_key(row), []).append(idx)
+        self.buckets = {key: _Bucket(indices, self.widths, self.heights) for key, indices in grouped.items()}
+
+    def materials(self) -> list[str]:
+        return sorted({key[1] for key in self.buckets if key[1]})
+
+    def get(self, offcut_ids: list[str], statuses: tuple[str, ...] | None = None) -> list[dict[str, Any]]:
+        """Rows for the given ids, in the given order; unknown ids and other statuses are skipped."""
+        wanted_statuses = None if statuses is None else {status.upper() for status in statuses}
+        rows = [self.rows[self.by_id[key]] for key in (str(v).strip() for v in offcut_ids) if key in self.by_id]
+        return [row for row in rows if wanted_statuses is None or _bucket_key(row)[0] in wanted_statuses]
+
+    def query(
+        self,
+        *,
+        min_w: float = 0.0,
+        min_h: float = 0.0,
+        material: str | None = None,
+        thickness_mm: float | None = None,
+        statuses: tuple[str, ...] | None = AVAILABLE_STATUSES,
+        allow_rotate: bool = True,
+        page: int = 0,
+        page_size: int = 50,
+    ) -> dict[str, Any]:
+        """Offcuts whose bbox fits ``min_w`` x ``min_h``, smallest area first, one page at a time.
+
+        ``None`` filters match anything; a blank status counts as in stock by
+        default. Returns the page rows plus ``total``, ``page`` and ``pages``.
+        """
+        wanted_statuses = None if statuses is None else {status.upper() for status in statuses}
+        thickness = None if thickness_mm is None else _safe_float(thickness_mm, -1.0)
+        hits = [
+            bucket.fitting(float(min_w), float(min_h), allow_rotate)
+            for (status, bucket_material, bucket_thickness), bucket in self.buckets.items()
+            if (wanted_statuses is None or status in wanted_statuses)
+            and (material is None or bucket_material == material)
+            and (thickness is None or bucket_thickness == thickness)
+        ]
+        matched = np.concatenate(hits) if hits else np.array([], dtype=int)
+        matched = matched[np.lexsort((matched, self.areas[matched]))]
+
+        total = int(matched.size)
+        page_size = max(1, int(page_size))
+        pages = max(1, math.ceil(total / page_size))
+        page = min(max(0, int(page)), pages - 1)
+        window = matched[page * page_size:(page + 1) * page_size]
+        return {
+            "rows": [self.rows[idx] for idx in window.tolist()],
+            "total": total,
+            "page": page,
+            "pages": pages,
+        }
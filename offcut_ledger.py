@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+import json
+from typing import Any
+import uuid
+
+# event_type -> (statuses it may be applied to, resulting status); None keeps the current status.
+EVENT_TRANSITIONS: dict[str, tuple[frozenset[str], str | None]] = {
+    "CREATED": (frozenset({""}), "IN_STOCK"),
+    "RESERVED": (frozenset({"IN_STOCK"}), "RESERVED"),
+    "RELEASED": (frozenset({"RESERVED"}), "IN_STOCK"),
+    "CONSUMED": (frozenset({"IN_STOCK", "RESERVED"}), "USED"),
+    "SCRAPPED": (frozenset({"IN_STOCK", "RESERVED"}), "SCRAPPED"),
+    "EDITED": (frozenset({"IN_STOCK", "RESERVED", "USED", "SCRAPPED"}), None),
+}
+
+STATUSES = frozenset(target for _, target in EVENT_TRANSITIONS.values() if target)
+
+# Inventory columns an EDITED event may change through its payload.
+EDITABLE_FIELDS = ("material", "thickness_mm", "grade", "location", "notes")
+
+
+def _utc_stamp(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def event_key(event: dict[str, Any]) -> tuple[str, str]:
+    """Replay order: event time, then event id to break ties within a second."""
+    return (str(event.get("event_at_utc") or ""), str(event.get("event_id") or ""))
+
+
+def _payload(event: dict[str, Any]) -> dict[str, Any]:
+    raw = event.get("payload_json")
+    if isinstance(raw, dict):
+        return raw
+    try:
+        data = json.loads(raw or "{}")
+    except (TypeError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def apply_event(offcut: dict[str, Any] | None, event: dict[str, Any]) -> dict[str, Any] | None:
+    """State of one offcut after ``event``, or ``None`` if the event is not a valid transition.
+
+    An offcut with no state yet has status ``""``. Rows added straight to the
+    sheet without a CREATED event start from the inventory status their first
+    event recorded as ``prior_status`` in its payload, else ``IN_STOCK``.
+    """
+    event_type = str(event.get("event_type") or "").strip().upper()
+    if event_type not in EVENT_TRANSITIONS:
+        return None
+    allowed, target = EVENT_TRANSITIONS[event_type]
+    current = offcut or {"status": "", "fields": {}}
+    status = current["status"]
+    if status == "" and event_type != "CREATED":
+        prior = str(_payload(event).get("prior_status") or "").strip().upper()
+        status = prior if prior in STATUSES else "IN_STOCK"
+    if status not in allowed:
+        return None
+
+    fields = dict(current.get("fields", {}))
+    if event_type == "EDITED":
+        fields.update({key: value for key, value in _payload(event).items() if key in EDITABLE_FIELDS})
+    return {
+        "status": target or status,
+        "fields": fields,
+        "updated_at_utc": str(event.get("event_at_utc") or ""),
+    }
+
+
+def replay_events(offcuts: dict[str, dict[str, Any]], events: list[dict[str, Any]]) -> tuple[dict[str, dict[str, Any]], list[str]]:
+    """Apply ``events`` in replay order on top of ``offcuts``; returns the new states and rejected event ids."""
+    states = dict(offcuts)
+    rejected = []
+    for event in sorted(events, key=event_key):
+        offcut_id = str(event.get("offcut_id") or "").strip()
+        updated = apply_event(states.get(offcut_id), event) if offcut_id else None
+        if updated is None:
+            rejected.append(str(event.get("event_id") or ""))
+        else:
+            states[offcut_id] = updated
+    return states, rejected
+
+
+class TableEventLog:
+    """Event log over ``{tab: rows}`` tables, as returned by ``fetch_stock_tables``.
+
+    Stands in for the stock sheet in tests and offline tools; the snapshot is
+    kept as a single row in an ``offcut_snapshots`` table.
+    """
+
+    def __init__(self, tables: dict[str, list[dict[str, Any]]]):
+        self.tables = tables
+        self.tables.setdefault("offcut_events", [])
+        self.tables.setdefault("offcut_inventory", [])
+
+    def load_snapshot(self) -> dict[str, Any] | None:
+        rows = self.tables.get("offcut_snapshots") or []
+        if not rows:
+            return None
+        row = rows[-1]
+        return {"mark": [row["mark_at"], row["mark_id"]], "offcuts": json.loads(row["state_json"])}
+
+    def events_after(self, mark: list[str] | None) -> list[dict[str, Any]]:
+        events = self.tables["offcut_events"]
+        if mark is not None:
+            events = [event for event in events if event_key(event) > tuple(mark)]
+        return sorted(events, key=event_key)
+
+    def inventory_statuses(self, offcut_ids: list[str]) -> dict[str, str]:
+        wanted = set(offcut_ids)
+        return {
+            str(row.get("offcut_id") or "").strip(): str(row.get("status") or "")
+            for row in self.tables["offcut_inventory"]
+            if str(row.get("offcut_id") or "").strip() in wanted
+        }
+
+    def append_events(self, rows: list[dict[str, Any]]) -> None:
+        self.tables["offcut_events"].extend(rows)
+
+    def compact(self, snapshot: dict[str, Any]) -> None:
+        mark = tuple(snapshot["mark"])
+        self.tables["offcut_snapshots"] = [{
+            "mark_at": mark[0],
+            "mark_id": mark[1],
+            "state_json": json.dumps(snapshot["offcuts"], sort_keys=True),
+        }]
+        self.tables["offcut_events"] = [event for event in self.tables["offcut_events"] if event_key(event) > mark]
+
+    def write_stock_state(self, offcuts: dict[str, dict[str, Any]]) -> int:
+        changed = 0
+        for row in self.tables["offcut_inventory"]:
+            state = offcuts.get(str(row.get("offcut_id") or "").strip())
+            if state is None:
+                continue
+            updates = {"status": state["status"], **state["fields"]}
+            if any(row.get(key) != value for key, value in updates.items()):
+                row.update(updates)
+                changed += 1
+        return changed
+
+
+class StockLedger:
+    """Offcut status derived by replaying ``offcut_events`` from the latest snapshot.
+
+    ``log`` is an ``OffcutStore`` or a ``TableEventLog``. Loading reads the
+    snapshot plus the events after its mark, so cost follows recent activity
+    rather than full history. ``compact`` folds events older than
+    ``settle_s`` into a new snapshot and drops them from the log; the settle
+    window leaves time for events written on other machines to arrive before
+    their slot is folded.
+    """
+
+    def __init__(self, log: Any, *, snapshot_every: int = 500, settle_s: float = 86400.0):
+        self.log = log
+        self.snapshot_every = snapshot_every
+        self.settle_s = settle_s
+
+    def state(self) -> dict[str, Any]:
+        """Current offcut states, the events rejected on replay and how many events follow the snapshot."""
+        snapshot = self.log.load_snapshot() or {"mark": None, "offcuts": {}}
+        events = self.log.events_after(snapshot["mark"])
+        offcuts, rejected = replay_events(snapshot["offcuts"], events)
+        return {"offcuts": offcuts, "rejected": rejected, "pending": len(events), "mark": snapshot["mark"]}
+
+    def statuses(self) -> dict[str, str]:
+        return {offcut_id: state["status"] for offcut_id, state in self.state()["offcuts"].items()}
+
+    def new_events(
+        self,
+        offcut_ids: list[str],
+        event_type: str,
+        *,
+        job_id: str = "",
+        user: str = "app",
+        payload: dict[str, Any] | None = None,
+        at: datetime | None = None,
+    ) -> list[dict[str, Any]]:
+        """One ``event_type`` event row per offcut, checked against the current state but not written.
+
+        Offcuts with no snapshot or event state are checked against their
+        inventory status, which the event keeps as ``prior_status`` so replay
+        starts from the same place. Raises ``ValueError`` if the transition is
+        not allowed for any of the offcuts.
+        """
+        event_type = event_type.strip().upper()
+        moment = at or datetime.now(timezone.utc)
+        timestamp = _utc_stamp(moment)
+        stamp = moment.astimezone(timezone.utc).strftime("%Y%m%d%H%M%S%f")
+        offcuts = self.state()["offcuts"]
+        seeds = self.log.inventory_statuses([str(offcut_id) for offcut_id in offcut_ids if str(offcut_id) not in offcuts])
+        rows = []
+        for offcut_id in offcut_ids:
+            row_payload = dict(payload or {})
+            current = (offcuts.get(str(offcut_id)) or {}).get("status")
+            if current is None and event_type != "CREATED":
+                current = str(seeds.get(str(offcut_id)) or "").strip().upper()
+                row_payload["prior_status"] = current if current in STATUSES else "IN_STOCK"
+            row = {
+                "event_id": f"EV-{stamp}-{uuid.uuid4().hex[:8]}",
+                "offcut_id": str(offcut_id),
+                "event_type": event_type,
+                "event_at_utc": timestamp,
+                "job_id": job_id,
+                "user": user,
+                "payload_json": json.dumps(row_payload, sort_keys=True),
+            }
+            updated = apply_event(offcuts.get(str(offcut_id)), row)
+            if updated is None:
+                raise ValueError(f"Cannot apply {event_type} to offcut {offcut_id} (status {current or 'unknown'}).")
+            offcuts[str(offcut_id)] = updated
+            rows.append(row)
+        return rows
+
+    def record(self, offcut_ids: list[str], event_type: str, **kwargs: Any) -> list[dict[str, Any]]:
+        """Append the events from ``new_events`` to the log and return them."""
+        rows = self.new_events(offcut_ids, event_type, **kwargs)
+        self.log.append_events(rows)
+        return rows
+
+    def compact(self, now: datetime | None = None) -> dict[str, Any] | None:
+        """Fold settled events into a new snapshot; returns it, or ``None`` if nothing was old enough."""
+        cutoff = _utc_stamp((now or datetime.now(timezone.utc)) - timedelta(seconds=self.settle_s))
+        snapshot = self.log.load_snapshot() or {"mark": None, "offcuts": {}}
+        settled = [event for event in self.log.events_after(snapshot["mark"]) if event_key(event)[0] < cutoff]
+        if not settled:
+            return None
+        offcuts, _ = replay_events(snapshot["offcuts"], settled)
+        compacted = {"mark": list(event_key(settled[-1])), "offcuts": offcuts}
+        self.log.compact(compacted)
+        return compacted
+
+    def refresh(self, now: datetime | None = None) -> dict[str, Any]:
+        """Write replayed statuses back to the inventory, compacting once enough events have piled up."""
+        state = self.state()
+        if state["pending"] >= self.snapshot_every and self.compact(now) is not None:
+            state = self.state()
+        state["changed"] = self.log.write_stock_state(state["offcuts"])
+        return state
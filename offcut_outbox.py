@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable
+
+
+def _utc_from_epoch(seconds: float | None) -> str | None:
+    if seconds is None:
+        return None
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def _http_status(exc: BaseException) -> int | None:
+    """HTTP status behind ``exc`` or any exception it was raised from, if there is one."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+        if isinstance(status, int):
+            return status
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether a failed write may succeed if sent again; 4xx responses other than 408/429 will not."""
+    status = _http_status(exc)
+    return status is None or not 400 <= status < 500 or status in (408, 429)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether a failure looks like an outage or rate limit rather than a problem with the rows sent."""
+    status = _http_status(exc)
+    if status is not None:
+        return status in (408, 429) or status >= 500
+    return isinstance(exc, OSError) or isinstance(exc.__cause__, OSError)
+
+
+def coalesce_rows(payloads: list[dict[str, list[dict[str, Any]]]]) -> dict[str, list[dict[str, Any]]]:
+    """Merge several ``{worksheet: rows}`` pushes into one, keeping enqueue order within each tab."""
+    merged: dict[str, list[dict[str, Any]]] = {}
+    for payload in payloads:
+        for worksheet, rows in payload.items():
+            if rows:
+                merged.setdefault(worksheet, []).extend(rows)
+    return merged
+
+
+def overlay_rows(
+    tables: dict[str, list[dict[str, Any]]],
+    pending: dict[str, list[dict[str, Any]]],
+    keys: dict[str, str],
+) -> dict[str, list[dict[str, Any]]]:
+    """``tables`` with queued rows added, replacing any row that shares a key column value."""
+    merged = {}
+    for worksheet in set(tables) | set(pending):
+        key = keys.get(worksheet)
+        rows = list(tables.get(worksheet, []))
+        extra = pending.get(worksheet, [])
+        if key and extra:
+            queued = {str(row.get(key, "")) for row in extra}
+            rows = [row for row in rows if str(row.get(key, "")) not in queued]
+        merged[worksheet] = rows + list(extra)
+    return merged
+
+
+class StockOutbox:
+    """Durable SQLite queue of stock rows waiting to be appended to a spreadsheet.
+
+    Each entry is one push (``{worksheet: rows}``) for one spreadsheet.
+    Entries stay in the table until a write succeeds, so a push survives
+    Sheets errors and app restarts. Entries that will not go through are
+    parked: kept with their last error but no longer retried until requeued.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS stock_outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, spreadsheet TEXT NOT NULL, payload_json TEXT NOT NULL, "
+                "row_count INTEGER NOT NULL, enqueued_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_attempt_at REAL NOT NULL, last_error TEXT, parked_at REAL)"
+            )
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(stock_outbox)")}
+            if "parked_at" not in columns:
+                self._conn.execute("ALTER TABLE stock_outbox ADD COLUMN parked_at REAL")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON stock_outbox (next_attempt_at, id)")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, spreadsheet: str, rows_by_worksheet: dict[str, list[dict[str, Any]]], now: float | None = None) -> int:
+        """Queue one push and return its entry id."""
+        stamp = time.time() if now is None else now
+        payload = {worksheet: rows for worksheet, rows in rows_by_worksheet.items() if rows}
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO stock_outbox (spreadsheet, payload_json, row_count, enqueued_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (spreadsheet, json.dumps(payload), sum(len(rows) for rows in payload.values()), stamp, stamp),
+            )
+        return int(cursor.lastrowid)
+
+    def next_batch(self, now: float | None = None, max_entries: int = 50) -> tuple[str, list[int], dict[str, list[dict[str, Any]]]] | None:
+        """Due entries for the spreadsheet with the oldest due entry, coalesced into one push.
+
+        Returns ``(spreadsheet, entry_ids, rows_by_worksheet)`` or ``None``
+        when nothing is due.
+        """
+        stamp = time.time() if now is None else now
+        with self._lock:
+            first = self._conn.execute(
+                "SELECT spreadsheet FROM stock_outbox WHERE parked_at IS NULL AND next_attempt_at <= ? ORDER BY id LIMIT 1",
+                (stamp,),
+            ).fetchone()
+            if first is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT id, payload_json FROM stock_outbox "
+                "WHERE spreadsheet = ? AND parked_at IS NULL AND next_attempt_at <= ? "
+                f"ORDER BY id LIMIT {int(max_entries)}",
+                (first["spreadsheet"], stamp),
+            ).fetchall()
+        return (
+            first["spreadsheet"],
+            [row["id"] for row in rows],
+            coalesce_rows([json.loads(row["payload_json"]) for row in rows]),
+        )
+
+    def mark_sent(self, entry_ids: list[int]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM stock_outbox WHERE id = ?", [(entry_id,) for entry_id in entry_ids])
+
+    def mark_failed(self, entry_ids: list[int], error: str, retry_at: float) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE stock_outbox SET attempts = attempts + 1, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                [(error, retry_at, entry_id) for entry_id in entry_ids],
+            )
+
+    def park(self, entry_ids: list[int], error: str, now: float | None = None) -> None:
+        """Stop retrying ``entry_ids``, keeping their rows and ``error`` for someone to look at."""
+        stamp = time.time() if now is None else now
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE stock_outbox SET attempts = attempts + 1, last_error = ?, parked_at = ? WHERE id = ?",
+                [(error, stamp, entry_id) for entry_id in entry_ids],
+            )
+
+    def requeue_parked(self, now: float | None = None) -> int:
+        """Make every parked entry due again with a fresh attempt count; returns how many were requeued."""
+        stamp = time.time() if now is None else now
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE stock_outbox SET parked_at = NULL, attempts = 0, next_attempt_at = ? WHERE parked_at IS NOT NULL",
+                (stamp,),
+            )
+        return cursor.rowcount
+
+    def payloads(self, entry_ids: list[int]) -> list[tuple[int, dict[str, list[dict[str, Any]]]]]:
+        """``(entry_id, rows_by_worksheet)`` for each of ``entry_ids`` still queued, in enqueue order."""
+        placeholders = ", ".join("?" for _ in entry_ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, payload_json FROM stock_outbox WHERE id IN ({placeholders}) ORDER BY id", list(entry_ids)
+            ).fetchall()
+        return [(row["id"], json.loads(row["payload_json"])) for row in rows]
+
+    def parked(self) -> list[dict[str, Any]]:
+        """Parked entries, oldest first, without their rows."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, spreadsheet, row_count, attempts, last_error, parked_at FROM stock_outbox "
+                "WHERE parked_at IS NOT NULL ORDER BY id"
+            ).fetchall()
+        return [
+            {
+                "entry_id": row["id"],
+                "spreadsheet": row["spreadsheet"],
+                "rows": row["row_count"],
+                "attempts": row["attempts"],
+                "last_error": row["last_error"],
+                "parked_at_utc": _utc_from_epoch(row["parked_at"]),
+            }
+            for row in rows
+        ]
+
+    def attempts(self, entry_ids: list[int]) -> int:
+        """Failed writes so far for the most-retried of ``entry_ids``."""
+        placeholders = ", ".join("?" for _ in entry_ids)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT MAX(attempts) AS attempts FROM stock_outbox WHERE id IN ({placeholders})", list(entry_ids)
+            ).fetchone()
+        return int(row["attempts"] or 0)
+
+    def pending_rows(self, spreadsheet: str | None = None) -> dict[str, list[dict[str, Any]]]:
+        """Every queued row, parked ones included, coalesced; limited to one spreadsheet when given."""
+        sql, params = "SELECT payload_json FROM stock_outbox", []
+        if spreadsheet is not None:
+            sql += " WHERE spreadsheet = ?"
+            params.append(spreadsheet)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY id", params).fetchall()
+        return coalesce_rows([json.loads(row["payload_json"]) for row in rows])
+
+    def summary(self) -> dict[str, Any]:
+        """Counts for entries still being retried, plus the same for parked entries."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS entries, COALESCE(SUM(row_count), 0) AS row_total, MIN(enqueued_at) AS oldest, "
+                "MAX(attempts) AS max_attempts, MIN(next_attempt_at) AS next_attempt FROM stock_outbox "
+                "WHERE parked_at IS NULL"
+            ).fetchone()
+            error = self._conn.execute(
+                "SELECT last_error FROM stock_outbox WHERE parked_at IS NULL AND last_error IS NOT NULL "
+                "ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+            parked = self._conn.execute(
+                "SELECT COUNT(*) AS entries, COALESCE(SUM(row_count), 0) AS row_total FROM stock_outbox "
+                "WHERE parked_at IS NOT NULL"
+            ).fetchone()
+            parked_error = self._conn.execute(
+                "SELECT last_error FROM stock_outbox WHERE parked_at IS NOT NULL ORDER BY parked_at DESC, id DESC LIMIT 1"
+            ).fetchone()
+        return {
+            "pending_entries": row["entries"],
+            "pending_rows": row["row_total"],
+            "oldest_enqueued_at_utc": _utc_from_epoch(row["oldest"]),
+            "max_attempts": row["max_attempts"] or 0,
+            "next_attempt_at_utc": _utc_from_epoch(row["next_attempt"]),
+            "last_error": error["last_error"] if error else None,
+            "parked_entries": parked["entries"],
+            "parked_rows": parked["row_total"],
+            "parked_error": parked_error["last_error"] if parked_error else None,
+        }
+
+
+class OutboxWorker:
+    """Background thread that drains a ``StockOutbox`` through ``write(spreadsheet, rows_by_worksheet)``.
+
+    Each pass sends all due entries for a spreadsheet as one write. A failed
+    write leaves its entries queued and retries them after ``base_delay_s``,
+    doubling per attempt up to ``max_delay_s``. An entry is parked after
+    ``max_attempts`` failed writes, or at once when Sheets rejects it with a
+    non-retryable 4xx. When a coalesced write fails for any reason other than
+    an outage, its entries are sent one by one so a bad entry cannot hold
+    back the others. Delivery is at-least-once: a write that lands but
+    reports an error is sent again.
+    """
+
+    def __init__(
+        self,
+        outbox: StockOutbox,
+        write: Callable[[str, dict[str, list[dict[str, Any]]]], Any],
+        *,
+        interval_s: float = 5.0,
+        base_delay_s: float = 5.0,
+        max_delay_s: float = 300.0,
+        max_entries: int = 50,
+        max_attempts: int = 8,
+    ):
+        self.outbox = outbox
+        self.write = write
+        self.interval_s = interval_s
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self.max_entries = max_entries
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._status = {"last_sent_at_utc": None, "batches_sent": 0, "rows_sent": 0}
+        self._status_lock = threading.Lock()
+
+    def retry_delay(self, attempts: int) -> float:
+        """Seconds to wait after the ``attempts``-th failed write."""
+        return min(self.max_delay_s, self.base_delay_s * 2 ** max(0, attempts - 1))
+
+    def _failed(self, entry_ids: list[int], exc: Exception, stamp: float) -> None:
+        attempts = self.outbox.attempts(entry_ids) + 1
+        if attempts >= self.max_attempts or not is_retryable(exc):
+            self.outbox.park(entry_ids, str(exc), stamp)
+        else:
+            self.outbox.mark_failed(entry_ids, str(exc), stamp + self.retry_delay(attempts))
+
+    def _sent(self, entry_ids: list[int], rows_by_worksheet: dict[str, list[dict[str, Any]]]) -> None:
+        self.outbox.mark_sent(entry_ids)
+        with self._status_lock:
+            self._status.update(
+                last_sent_at_utc=_utc_from_epoch(time.time()),
+                batches_sent=self._status["batches_sent"] + 1,
+                rows_sent=self._status["rows_sent"] + sum(len(rows) for rows in rows_by_worksheet.values()),
+            )
+
+    def _send_each(self, spreadsheet: str, entry_ids: list[int], stamp: float) -> int:
+        """Send entries one at a time after their coalesced write failed; returns how many succeeded."""
+        sent = 0
+        for entry_id, rows_by_worksheet in self.outbox.payloads(entry_ids):
+            try:
+                self.write(spreadsheet, rows_by_worksheet)
+            except Exception as exc:
+                self._failed([entry_id], exc, stamp)
+                continue
+            self._sent([entry_id], rows_by_worksheet)
+            sent += 1
+        return sent
+
+    def drain(self, now: float | None = None) -> int:
+        """Send every due batch in the calling thread; returns how many writes succeeded."""
+        sent = 0
+        failed_spreadsheets = set()
+        while True:
+            stamp = time.time() if now is None else now
+            batch = self.outbox.next_batch(stamp, self.max_entries)
+            if batch is None or batch[0] in failed_spreadsheets:
+                return sent
+            spreadsheet, entry_ids, rows_by_worksheet = batch
+            try:
+                self.write(spreadsheet, rows_by_worksheet)
+            except Exception as exc:
+                if len(entry_ids) > 1 and not is_transient(exc):
+                    sent += self._send_each(spreadsheet, entry_ids, stamp)
+                else:
+                    self._failed(entry_ids, exc, stamp)
+                failed_spreadsheets.add(spreadsheet)
+                continue
+            self._sent(entry_ids, rows_by_worksheet)
+            sent += 1
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.drain()
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="offcut-stock-outbox", daemon=True)
+            self._thread.start()
+
+    def trigger(self) -> None:
+        """Ask the background thread to send queued rows now instead of waiting for the interval."""
+        self._wake.set()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self) -> dict[str, Any]:
+        with self._status_lock:
+            status = dict(self._status)
+        status.update(self.outbox.summary())
+        status["running"] = self._thread is not None and self._thread.is_alive()
+        return status
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+from typing import Any
+
+import numpy as np
+
+from offcut_utils import _largest_rect_in_union
+
+DEMAND_BIN_MM = 50.0
+# Job keys remembered per history file, so re-running a job does not count its panels twice.
+MAX_RECORDED_JOBS = 200
+
+_HISTORY_LOCK = threading.Lock()
+
+
+def _safe_float(value: Any, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float(default)
+
+
+def empty_demand_histogram(bin_mm: float = DEMAND_BIN_MM) -> dict[str, Any]:
+    """Panel demand binned by (short side, long side); ``counts`` maps ``"s,l"`` bin indices to quantities.
+
+    ``jobs`` holds the keys of the most recently recorded jobs.
+    """
+    return {"bin_mm": float(bin_mm), "total": 0, "counts": {}, "jobs": []}
+
+
+def panel_demand_fingerprint(panels: list[dict[str, Any]]) -> str:
+    """Order-independent key of a panel list's sizes and quantities."""
+    sizes = sorted(
+        (min(_safe_float(p.get("Width")), _safe_float(p.get("Length"))),
+         max(_safe_float(p.get("Width")), _safe_float(p.get("Length"))),
+         int(_safe_float(p.get("Qty"), 1)))
+        for p in panels
+    )
+    return hashlib.sha1(json.dumps(sizes).encode("utf-8")).hexdigest()
+
+
+def record_panel_demand(histogram: dict[str, Any], panels: list[dict[str, Any]], job_key: str | None = None) -> dict[str, Any]:
+    """Return ``histogram`` with the panels of one nest added.
+
+    Panel sides are sorted and rounded *up* to the next bin, so a bin-aligned
+    offcut only counts demand it can really hold. Only the new panels are
+    touched; earlier history stays as stored. A ``job_key`` already in the
+    recent jobs leaves the histogram unchanged.
+    """
+    jobs = list(histogram.get("jobs", []))
+    if job_key is not None:
+        if job_key in jobs:
+            return {**histogram, "jobs": jobs}
+        jobs = (jobs + [job_key])[-MAX_RECORDED_JOBS:]
+    bin_mm = _safe_float(histogram.get("bin_mm"), DEMAND_BIN_MM)
+    counts = dict(histogram.get("counts", {}))
+    total = int(histogram.get("total", 0))
+    for panel in panels:
+        width = _safe_float(panel.get("Width"))
+        length = _safe_float(panel.get("Length"))
+        qty = max(0, int(_safe_float(panel.get("Qty"), 1)))
+        if width <= 0 or length <= 0 or qty == 0:
+            continue
+        short_bin = math.ceil(min(width, length) / bin_mm - 1e-9)
+        long_bin = math.ceil(max(width, length) / bin_mm - 1e-9)
+        key = f"{short_bin},{long_bin}"
+        counts[key] = counts.get(key, 0) + qty
+        total += qty
+    return {"bin_mm": bin_mm, "total": total, "counts": counts, "jobs": jobs}
+
+
+def _dominance_table(histogram: dict[str, Any]) -> np.ndarray:
+    """2D prefix sums: ``table[s, l]`` is the demand with short bin <= s and long bin <= l."""
+    cells = [tuple(int(v) for v in key.split(",")) + (qty,) for key, qty in histogram.get("counts", {}).items()]
+    if not cells:
+        return np.zeros((1, 1))
+    short_bins, long_bins, quantities = (np.array(column) for column in zip(*cells))
+    table = np.zeros((short_bins.max() + 1, long_bins.max() + 1))
+    np.add.at(table, (short_bins, long_bins), quantities)
+    return table.cumsum(axis=0).cumsum(axis=1)
+
+
+def demand_fit_scores(histogram: dict[str, Any], widths: Any, heights: Any) -> np.ndarray:
+    """Share of recorded panel demand (0..100) whose bins fit inside each width x height.
+
+    Scores for the whole inventory come from one prefix-sum lookup per offcut.
+    With no recorded demand every score is 0.
+    """
+    widths = np.asarray(widths, dtype=float)
+    heights = np.asarray(heights, dtype=float)
+    total = int(histogram.get("total", 0))
+    if total <= 0 or widths.size == 0:
+        return np.zeros(widths.shape)
+
+    bin_mm = _safe_float(histogram.get("bin_mm"), DEMAND_BIN_MM)
+    table = _dominance_table(histogram)
+    short_idx = np.floor(np.minimum(widths, heights) / bin_mm + 1e-9).astype(int)
+    long_idx = np.floor(np.maximum(widths, heights) / bin_mm + 1e-9).astype(int)
+    short_idx = np.clip(short_idx, 0, table.shape[0] - 1)
+    long_idx = np.clip(long_idx, 0, table.shape[1] - 1)
+    return np.round(table[short_idx, long_idx] / total * 100.0, 1)
+
+
+def _polygon_rects(loops: list[list[list[float]]]) -> list[dict[str, float]]:
+    """Horizontal bands of an orthogonal polygon (even-odd over all loops) as rects."""
+    edges = [
+        (float(a[0]), min(float(a[1]), float(b[1])), max(float(a[1]), float(b[1])))
+        for loop in loops
+        for a, b in zip(loop, loop[1:] + loop[:1])
+        if float(a[0]) == float(b[0]) and float(a[1]) != float(b[1])
+    ]
+    ys = sorted({float(point[1]) for loop in loops for point in loop})
+    rects = []
+    for lo, hi in zip(ys, ys[1:]):
+        mid = (lo + hi) / 2.0
+        crossings = sorted(x for x, y0, y1 in edges if y0 < mid < y1)
+        for left, right in zip(crossings[0::2], crossings[1::2]):
+            if right > left:
+                rects.append({"x": left, "y": lo, "w": right - left, "h": hi - lo})
+    return rects
+
+
+def inscribed_rect_dims(vertices: list[list[float]], holes: list[list[list[float]]] | None = None) -> tuple[float, float]:
+    """Width and height of the largest axis-aligned rect inside an orthogonal polygon with holes."""
+    loops = [loop for loop in [vertices] + list(holes or []) if len(loop) >= 4]
+    best = _largest_rect_in_union(_polygon_rects(loops)) if loops else None
+    return (best["w"], best["h"]) if best else (0.0, 0.0)
+
+
+def _json_loops(value: Any) -> Any:
+    if isinstance(value, list):
+        return value
+    try:
+        return json.loads(value or "[]")
+    except (TypeError, ValueError):
+        return []
+
+
+def offcut_fit_dims(row: dict[str, Any], shape: dict[str, Any] | None = None) -> tuple[float, float]:
+    """Size a panel must fit within to be cut from an offcut.
+
+    Rectangles use their bbox. Other shapes use the largest rect inscribed in
+    their ``offcut_shapes`` outline, or a ``min_internal_width_mm`` square when
+    the outline is not at hand.
+    """
+    shape_type = str(row.get("shape_type") or "RECT").strip().upper()
+    if shape_type == "RECT":
+        return _safe_float(row.get("bbox_w_mm")), _safe_float(row.get("bbox_h_mm"))
+    if shape:
+        vertices = _json_loops(shape.get("vertices_json"))
+        if vertices:
+            return inscribed_rect_dims(vertices, _json_loops(shape.get("holes_json")))
+    side = _safe_float(row.get("min_internal_width_mm"))
+    return side, side
+
+
+def score_inventory_rows(
+    rows: list[dict[str, Any]],
+    histogram: dict[str, Any],
+    shape_rows: list[dict[str, Any]] | None = None,
+) -> list[dict[str, Any]]:
+    """Copies of ``offcut_inventory`` rows with ``usable_score`` recomputed from ``histogram``.
+
+    ``shape_rows`` (``offcut_shapes`` rows) let non-rectangular offcuts be
+    scored on their largest inscribed rect instead of a square fallback.
+    """
+    shapes = {str(shape.get("offcut_id")): shape for shape in shape_rows or []}
+    dims = [offcut_fit_dims(row, shapes.get(str(row.get("offcut_id")))) for row in rows]
+    scores = demand_fit_scores(histogram, [w for w, _ in dims], [h for _, h in dims])
+    return [{**row, "usable_score": float(score)} for row, score in zip(rows, scores.tolist())]
+
+
+def load_demand_histogram(path: str) -> dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+    except (OSError, ValueError):
+        return empty_demand_histogram()
+    if not isinstance(data, dict) or not isinstance(data.get("counts"), dict):
+        return empty_demand_histogram()
+    jobs = data.get("jobs")
+    return {
+        "bin_mm": _safe_float(data.get("bin_mm"), DEMAND_BIN_MM),
+        "total": int(_safe_float(data.get("total"), 0)),
+        "counts": {str(key): int(_safe_float(qty, 0)) for key, qty in data["counts"].items()},
+        "jobs": [str(key) for key in jobs] if isinstance(jobs, list) else [],
+    }
+
+
+def save_demand_histogram(histogram: dict[str, Any], path: str) -> None:
+    """Write the histogram as JSON through a private temp file, replacing ``path`` atomically."""
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=directory, prefix=f"{os.path.basename(path)}.", suffix=".tmp", delete=False
+    ) as handle:
+        json.dump(histogram, handle, sort_keys=True)
+    try:
+        os.replace(handle.name, path)
+    except OSError:
+        os.unlink(handle.name)
+        raise
+
+
+def update_demand_history(path: str, panels: list[dict[str, Any]], job_key: str | None = None) -> dict[str, Any]:
+    """Load, add one job's panels and save the history file as one step; returns the saved histogram.
+
+    Sessions of one app process share a lock, so concurrent nests cannot lose
+    each other's updates. ``job_key`` defaults to the panel-list fingerprint.
+    """
+    key = job_key if job_key is not None else panel_demand_fingerprint(panels)
+    with _HISTORY_LOCK:
+        history = load_demand_histogram(path)
+        if key in history["jobs"]:
+            return history
+        updated = record_panel_demand(history, panels, key)
+        save_demand_histogram(updated, path)
+    return updated
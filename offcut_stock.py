@@ -2,9 +2,14 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 import json
+import math
 import re
 from typing import Any
 
+from offcut_scoring import inscribed_rect_dims, score_inventory_rows
+
+STOCK_WORKSHEETS = ("offcut_inventory", "offcut_shapes", "offcut_events", "offcut_previews")
+
 
 def _safe_float(value: Any, default: float = 0.0) -> float:
     try:
@@ -52,16 +57,24 @@ def _vertices_bbox(vertices: list[list[float]]) -> tuple[float, float, float, fl
     return min_x, min_y, max_x - min_x, max_y - min_y
 
 
-def _svg_path_from_vertices(vertices: list[list[float]]) -> str:
+def _svg_path_from_vertices(vertices: list[list[float]], holes: list[list[list[float]]] | None = None) -> str:
     if not vertices:
         return ""
-    segments = [f"M{vertices[0][0]} {vertices[0][1]}"]
-    for point in vertices[1:]:
-        segments.append(f"L{point[0]} {point[1]}")
-    segments.append("Z")
+    segments = []
+    for loop in [vertices] + [hole for hole in holes or [] if hole]:
+        segments.append(f"M{loop[0][0]} {loop[0][1]}")
+        for point in loop[1:]:
+            segments.append(f"L{point[0]} {point[1]}")
+        segments.append("Z")
     return " ".join(segments)
 
 
+def _clean_vertices(raw_vertices: Any) -> list[list[float]]:
+    if not isinstance(raw_vertices, list):
+        return []
+    return [[round(_safe_float(v[0]), 2), round(_safe_float(v[1]), 2)] for v in raw_vertices if isinstance(v, (list, tuple)) and len(v) >= 2]
+
+
 def build_offcut_stock_rows(
     layout: dict[str, Any],
     sheet: dict[str, Any],
@@ -72,6 +85,7 @@ def build_offcut_stock_rows(
     location: str = "",
     sheet_origin_job: str = "",
     captured_at_utc: str | None = None,
+    demand_histogram: dict[str, Any] | None = None,
 ) -> dict[str, list[dict[str, Any]]]:
     timestamp = captured_at_utc or datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
     stamp = timestamp.replace("-", "").replace(":", "").replace("T", "").replace("Z", "")
@@ -89,17 +103,16 @@ def build_offcut_stock_rows(
         event_id = f"EV-{stamp}-S{sheet_idx + 1:02d}-{idx:03d}"
 
         shape_type = str(offcut.get("shape_type", "RECT") or "RECT").upper()
-        raw_vertices = offcut.get("vertices")
-        if isinstance(raw_vertices, list) and raw_vertices:
-            vertices = [[round(_safe_float(v[0]), 2), round(_safe_float(v[1]), 2)] for v in raw_vertices if isinstance(v, (list, tuple)) and len(v) >= 2]
-        else:
-            vertices = _rect_vertices(offcut)
+        vertices = _clean_vertices(offcut.get("vertices")) or _rect_vertices(offcut)
+        raw_holes = offcut.get("holes")
+        holes = [loop for loop in (_clean_vertices(h) for h in raw_holes) if loop] if isinstance(raw_holes, list) else []
 
         min_x, min_y, width, height = _vertices_bbox(vertices)
         width = round(width, 2)
         height = round(height, 2)
         area = round(_safe_float(offcut.get("area"), width * height), 2)
-        svg_path = _svg_path_from_vertices(vertices)
+        svg_path = _svg_path_from_vertices(vertices, holes)
+        fit_w, fit_h = (width, height) if shape_type == "RECT" else inscribed_rect_dims(vertices, holes)
 
         inventory_rows.append({
             "offcut_id": offcut_id,
@@ -114,7 +127,7 @@ def build_offcut_stock_rows(
             "area_mm2": area,
             "bbox_w_mm": width,
             "bbox_h_mm": height,
-            "min_internal_width_mm": min(width, height),
+            "min_internal_width_mm": round(min(fit_w, fit_h), 2),
             "usable_score": "",
             "location": location,
             "preview_ref": preview_ref,
@@ -129,7 +142,7 @@ def build_offcut_stock_rows(
             "bbox_x_mm": round(_safe_float(offcut.get("x"), min_x), 2),
             "bbox_y_mm": round(_safe_float(offcut.get("y"), min_y), 2),
             "vertices_json": json.dumps(vertices),
-            "holes_json": "[]",
+            "holes_json": json.dumps(holes),
             "version": 1,
         })
 
@@ -151,6 +164,9 @@ def build_offcut_stock_rows(
             "updated_at_utc": timestamp,
         })
 
+    if demand_histogram and demand_histogram.get("total"):
+        inventory_rows = score_inventory_rows(inventory_rows, demand_histogram, shape_rows)
+
     return {
         "offcut_inventory": inventory_rows,
         "offcut_shapes": shape_rows,
@@ -159,6 +175,110 @@ def build_offcut_stock_rows(
     }
 
 
+def build_nest_offcut_stock_rows(
+    layout: dict[str, Any],
+    sheet_offcuts: list[tuple[dict[str, Any], list[dict[str, Any]]]],
+    *,
+    material: str = "",
+    thickness_mm: Any = "",
+    location: str = "",
+    sheet_origin_job: str = "",
+    captured_at_utc: str | None = None,
+    demand_histogram: dict[str, Any] | None = None,
+) -> dict[str, list[dict[str, Any]]]:
+    """Stock rows for several sheets of one nest, stamped with a single capture time."""
+    timestamp = captured_at_utc or datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    merged: dict[str, list[dict[str, Any]]] = {
+        "offcut_inventory": [],
+        "offcut_shapes": [],
+        "offcut_events": [],
+        "offcut_previews": [],
+    }
+    for sheet, reusable_offcuts in sheet_offcuts:
+        rows = build_offcut_stock_rows(
+            layout,
+            sheet,
+            reusable_offcuts,
+            material=material,
+            thickness_mm=thickness_mm,
+            location=location,
+            sheet_origin_job=sheet_origin_job,
+            captured_at_utc=timestamp,
+            demand_histogram=demand_histogram,
+        )
+        for worksheet_name, worksheet_rows in rows.items():
+            merged[worksheet_name].extend(worksheet_rows)
+    return merged
+
+
+def _cell_data(value: Any) -> dict[str, Any]:
+    if value is None or value == "":
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and not math.isfinite(value):
+            return {}
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
+def _row_data(values: list[Any]) -> dict[str, Any]:
+    return {"values": [_cell_data(value) for value in values]}
+
+
+def append_stock_rows(spreadsheet: Any, rows_by_worksheet: dict[str, list[dict[str, Any]]]) -> dict[str, int]:
+    """Append stock rows to their tabs without reading existing rows back.
+
+    ``spreadsheet`` is a gspread ``Spreadsheet``. One metadata call fetches
+    each tab's id, column count and header row; one ``batch_update`` then
+    appends every tab's rows, writing or extending headers as needed. Rows are
+    laid out in header order, so columns a tab does not know yet are added at
+    its end.
+    """
+    written = {worksheet_name: len(rows) for worksheet_name, rows in rows_by_worksheet.items()}
+    pending = {worksheet_name: rows for worksheet_name, rows in rows_by_worksheet.items() if rows}
+    if not pending:
+        return written
+
+    metadata = spreadsheet.fetch_sheet_metadata(params={
+        "includeGridData": "true",
+        "ranges": [f"'{worksheet_name}'!1:1" for worksheet_name in pending],
+        "fields": "sheets(properties(sheetId,title,gridProperties(columnCount)),data(rowData(values(formattedValue))))",
+    })
+    tabs = {sheet["properties"]["title"]: sheet for sheet in metadata.get("sheets", [])}
+
+    requests = []
+    for worksheet_name, rows in pending.items():
+        tab = tabs.get(worksheet_name)
+        if tab is None:
+            raise ValueError(f"{worksheet_name}: worksheet tab not found")
+        sheet_id = tab["properties"]["sheetId"]
+        column_count = tab["properties"].get("gridProperties", {}).get("columnCount", 0)
+
+        row_data = (tab.get("data") or [{}])[0].get("rowData") or [{}]
+        header = [str(cell.get("formattedValue", "")) for cell in row_data[0].get("values", [])]
+        while header and not header[-1]:
+            header.pop()
+        columns = header + [key for key in dict.fromkeys(key for row in rows for key in row) if key not in header]
+
+        if len(columns) > column_count:
+            requests.append({"appendDimension": {"sheetId": sheet_id, "dimension": "COLUMNS", "length": len(columns) - column_count}})
+        body_rows = [_row_data([row.get(column, "") for column in columns]) for row in rows]
+        if not header:
+            body_rows.insert(0, _row_data(columns))
+        elif len(columns) > len(header):
+            requests.append({"updateCells": {
+                "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": len(header)},
+                "rows": [_row_data(columns[len(header):])],
+                "fields": "userEnteredValue",
+            }})
+        requests.append({"appendCells": {"sheetId": sheet_id, "rows": body_rows, "fields": "userEnteredValue"}})
+
+    spreadsheet.batch_update({"requests": requests})
+    return written
+
+
 def normalize_spreadsheet_reference(value: str) -> str:
     text = (value or "").strip()
     if not text:
@@ -0,0 +1,474 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable
+
+from offcut_ledger import EDITABLE_FIELDS
+from offcut_stock import STOCK_WORKSHEETS
+
+TEXT, REAL, INTEGER = "TEXT", "REAL", "INTEGER"
+
+STOCK_SCHEMA: dict[str, tuple[str, list[tuple[str, str]]]] = {
+    "offcut_inventory": ("offcut_id", [
+        ("offcut_id", TEXT),
+        ("status", TEXT),
+        ("material", TEXT),
+        ("thickness_mm", REAL),
+        ("grade", TEXT),
+        ("sheet_origin_job", TEXT),
+        ("sheet_origin_index", INTEGER),
+        ("captured_at_utc", TEXT),
+        ("shape_type", TEXT),
+        ("area_mm2", REAL),
+        ("bbox_w_mm", REAL),
+        ("bbox_h_mm", REAL),
+        ("min_internal_width_mm", REAL),
+        ("usable_score", REAL),
+        ("location", TEXT),
+        ("preview_ref", TEXT),
+        ("shape_ref", TEXT),
+        ("notes", TEXT),
+    ]),
+    "offcut_shapes": ("shape_ref", [
+        ("shape_ref", TEXT),
+        ("offcut_id", TEXT),
+        ("coord_unit", TEXT),
+        ("bbox_x_mm", REAL),
+        ("bbox_y_mm", REAL),
+        ("vertices_json", TEXT),
+        ("holes_json", TEXT),
+        ("version", INTEGER),
+    ]),
+    "offcut_events": ("event_id", [
+        ("event_id", TEXT),
+        ("offcut_id", TEXT),
+        ("event_type", TEXT),
+        ("event_at_utc", TEXT),
+        ("job_id", TEXT),
+        ("user", TEXT),
+        ("payload_json", TEXT),
+    ]),
+    "offcut_previews": ("preview_ref", [
+        ("preview_ref", TEXT),
+        ("offcut_id", TEXT),
+        ("svg_path_data", TEXT),
+        ("scale_hint", TEXT),
+        ("updated_at_utc", TEXT),
+    ]),
+}
+
+STOCK_INDEXES = [
+    ("idx_inventory_status", "offcut_inventory", "status"),
+    ("idx_inventory_material", "offcut_inventory", "material"),
+    ("idx_inventory_thickness", "offcut_inventory", "thickness_mm"),
+    ("idx_inventory_bbox", "offcut_inventory", "bbox_w_mm, bbox_h_mm"),
+    ("idx_shapes_offcut", "offcut_shapes", "offcut_id"),
+    ("idx_events_offcut", "offcut_events", "offcut_id"),
+    ("idx_events_order", "offcut_events", "event_at_utc, event_id"),
+    ("idx_previews_offcut", "offcut_previews", "offcut_id"),
+]
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def _coerce(value: Any, kind: str) -> Any:
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if kind == TEXT:
+        return str(value)
+    if isinstance(value, str) and not value.strip():
+        return None
+    try:
+        return int(float(value)) if kind == INTEGER else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def sheet_values_to_rows(values: list[list[Any]]) -> list[dict[str, Any]]:
+    """Rows of a worksheet value range, keyed by its header row; blank rows are dropped."""
+    if not values:
+        return []
+    header = [str(cell).strip() for cell in values[0]]
+    rows = []
+    for raw in values[1:]:
+        if not any(str(cell).strip() for cell in raw):
+            continue
+        padded = list(raw) + [""] * (len(header) - len(raw))
+        rows.append({name: padded[idx] for idx, name in enumerate(header) if name})
+    return rows
+
+
+def fetch_stock_tables(spreadsheet: Any) -> dict[str, list[dict[str, Any]]]:
+    """All four stock tabs of a gspread ``Spreadsheet`` in one ``values_batch_get`` call."""
+    response = spreadsheet.values_batch_get(
+        [f"'{name}'" for name in STOCK_WORKSHEETS],
+        params={"valueRenderOption": "UNFORMATTED_VALUE"},
+    )
+    ranges = response.get("valueRanges", [])
+    return {name: sheet_values_to_rows(value_range.get("values", [])) for name, value_range in zip(STOCK_WORKSHEETS, ranges)}
+
+
+class OffcutStore:
+    """SQLite copy of the offcut stock tabs.
+
+    Tables mirror the four Sheets tabs plus a ``synced_at`` column holding the
+    local time each row was last written, which lets a reconcile drop rows
+    deleted upstream without losing rows written locally mid-fetch. One
+    connection is shared across threads behind a lock. ``version`` goes up
+    on every write that changes rows so callers can tell when derived views
+    are stale.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self._lock = threading.Lock()
+        self.version = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            for table, (key, columns) in STOCK_SCHEMA.items():
+                column_sql = ", ".join(
+                    f'"{name}" {kind}{" PRIMARY KEY" if name == key else ""}' for name, kind in columns
+                )
+                self._conn.execute(f'CREATE TABLE IF NOT EXISTS {table} ({column_sql}, synced_at REAL NOT NULL)')
+            for name, table, columns in STOCK_INDEXES:
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS stock_snapshots "
+                "(key TEXT PRIMARY KEY, mark_at TEXT, mark_id TEXT, state_json TEXT, created_at_utc TEXT)"
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _upsert(
+        self,
+        table: str,
+        rows: list[dict[str, Any]],
+        stamp: float,
+        older_than: float | None = None,
+        keep: tuple[str, ...] = (),
+    ) -> int:
+        """Write ``rows``; with ``older_than``, only rows synced before then that actually differ are updated.
+
+        Columns in ``keep`` are only written when a row is inserted.
+        """
+        key, columns = STOCK_SCHEMA[table]
+        names = [name for name, _ in columns] + ["synced_at"]
+        placeholders = ", ".join("?" for _ in names)
+        column_sql = ", ".join(f'"{name}"' for name in names)
+        updates = ", ".join(f'"{name}" = excluded."{name}"' for name in names if name != key and name not in keep)
+        guard = ""
+        if older_than is not None:
+            differs = " OR ".join(
+                f'{table}."{name}" IS NOT excluded."{name}"' for name, _ in columns if name != key and name not in keep
+            )
+            guard = f" WHERE {table}.synced_at < {float(older_than)!r} AND ({differs})"
+        records = [
+            tuple(_coerce(row.get(name), kind) for name, kind in columns) + (stamp,)
+            for row in rows
+            if str(row.get(key, "") or "").strip()
+        ]
+        self._conn.executemany(
+            f'INSERT INTO {table} ({column_sql}) VALUES ({placeholders}) '
+            f'ON CONFLICT("{key}") DO UPDATE SET {updates}{guard}',
+            records,
+        )
+        return len(records)
+
+    def upsert_rows(self, rows_by_table: dict[str, list[dict[str, Any]]]) -> dict[str, int]:
+        """Insert or replace rows (keyed by each table's id column) in one transaction."""
+        stamp = time.time()
+        with self._lock, self._conn:
+            self.version += 1
+            return {
+                table: self._upsert(table, rows, stamp)
+                for table, rows in rows_by_table.items()
+                if table in STOCK_SCHEMA
+            }
+
+    def reconcile(self, snapshot: dict[str, list[dict[str, Any]]], fetched_at: float) -> dict[str, int]:
+        """Make the store match a Sheets snapshot fetched at ``fetched_at`` (epoch seconds).
+
+        Rows written locally after the fetch started win over the snapshot:
+        they are neither overwritten nor removed. Rows that match the snapshot
+        are left alone, so ``version`` only moves when the sync changed
+        something. On offcuts with events or snapshot state, ``status`` and any
+        field an EDITED event set are only written on insert: the ledger
+        derives them, while Sheets keeps the values the rows were pushed with.
+        """
+        stamp = time.time()
+        counts = {}
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            mark = self._snapshot_mark()
+            # Events go first so the inventory pass sees which offcuts have ledger state.
+            for table, rows in sorted(snapshot.items(), key=lambda item: item[0] != "offcut_events"):
+                if table not in STOCK_SCHEMA:
+                    continue
+                key, columns = STOCK_SCHEMA[table]
+                if table == "offcut_events" and mark is not None:
+                    # Events already folded into a snapshot stay compacted even though Sheets still lists them.
+                    rows = [row for row in rows if (str(row.get("event_at_utc") or ""), str(row.get("event_id") or "")) > mark]
+                if table == "offcut_inventory":
+                    derived = self._ledger_columns()
+                    groups: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+                    for row in rows:
+                        groups.setdefault(derived.get(str(row.get(key) or "").strip(), ()), []).append(row)
+                    # usable_score is recomputed locally from the demand history.
+                    counts[table] = sum(
+                        self._upsert(table, group, stamp, older_than=fetched_at, keep=("usable_score",) + keep)
+                        for keep, group in groups.items()
+                    )
+                else:
+                    counts[table] = self._upsert(table, rows, stamp, older_than=fetched_at)
+                keys = [_coerce(row.get(key), dict(columns)[key]) for row in rows]
+                self._conn.execute(
+                    f'DELETE FROM {table} WHERE synced_at < ? AND "{key}" NOT IN (SELECT value FROM json_each(?))',
+                    (fetched_at, json.dumps(keys)),
+                )
+            self._delete_events_through(mark)
+            if self._conn.total_changes != before:
+                self.version += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES ('last_synced_at_utc', ?)",
+                (_utc_now(),),
+            )
+        return counts
+
+    def last_synced_at(self) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = 'last_synced_at_utc'").fetchone()
+        return row["value"] if row else None
+
+    def query_inventory(
+        self,
+        *,
+        statuses: tuple[str, ...] | None = None,
+        material: str | None = None,
+        thickness_mm: float | None = None,
+        min_w: float | None = None,
+        min_h: float | None = None,
+        limit: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Inventory rows matching every given filter, best ``usable_score`` first.
+
+        ``statuses`` matches case-insensitively; a blank status counts as ``""``.
+        """
+        clauses, params = [], []
+        if statuses is not None:
+            clauses.append(f"UPPER(COALESCE(status, '')) IN ({', '.join('?' for _ in statuses)})")
+            params.extend(status.upper() for status in statuses)
+        if material is not None:
+            clauses.append("material = ?")
+            params.append(material)
+        if thickness_mm is not None:
+            clauses.append("thickness_mm = ?")
+            params.append(float(thickness_mm))
+        if min_w is not None:
+            clauses.append("bbox_w_mm >= ?")
+            params.append(float(min_w))
+        if min_h is not None:
+            clauses.append("bbox_h_mm >= ?")
+            params.append(float(min_h))
+        sql = "SELECT * FROM offcut_inventory"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY COALESCE(usable_score, -1) DESC, captured_at_utc, offcut_id"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return self._select(sql, params)
+
+    def inventory_statuses(self, offcut_ids: list[str]) -> dict[str, str]:
+        """``{offcut_id: status}`` for the given inventory rows; missing ids are left out."""
+        if not offcut_ids:
+            return {}
+        rows = self._select(
+            f"SELECT offcut_id, status FROM offcut_inventory WHERE offcut_id IN ({', '.join('?' for _ in offcut_ids)})",
+            list(offcut_ids),
+        )
+        return {row["offcut_id"]: row["status"] or "" for row in rows}
+
+    def shape_rows(self, offcut_ids: list[str] | None = None) -> list[dict[str, Any]]:
+        if offcut_ids is None:
+            return self._select("SELECT * FROM offcut_shapes ORDER BY offcut_id", [])
+        placeholders = ", ".join("?" for _ in offcut_ids)
+        return self._select(f"SELECT * FROM offcut_shapes WHERE offcut_id IN ({placeholders})", list(offcut_ids))
+
+    def _ledger_columns(self) -> dict[str, tuple[str, ...]]:
+        """Inventory columns the ledger writes for each offcut with events or snapshot state."""
+        derived: dict[str, set[str]] = {}
+        snapshot = self._conn.execute("SELECT state_json FROM stock_snapshots WHERE key = 'latest'").fetchone()
+        for offcut_id, state in (json.loads(snapshot["state_json"]) if snapshot else {}).items():
+            derived.setdefault(offcut_id, {"status"}).update(state.get("fields", {}))
+        for row in self._conn.execute("SELECT offcut_id, event_type, payload_json FROM offcut_events"):
+            columns = derived.setdefault(str(row["offcut_id"] or "").strip(), {"status"})
+            if str(row["event_type"] or "").strip().upper() == "EDITED":
+                try:
+                    payload = json.loads(row["payload_json"] or "{}")
+                except ValueError:
+                    continue
+                if isinstance(payload, dict):
+                    columns.update(name for name in payload if name in EDITABLE_FIELDS)
+        return {offcut_id: tuple(sorted(columns)) for offcut_id, columns in derived.items()}
+
+    def _snapshot_mark(self) -> tuple[str, str] | None:
+        row = self._conn.execute("SELECT mark_at, mark_id FROM stock_snapshots WHERE key = 'latest'").fetchone()
+        return (row["mark_at"], row["mark_id"]) if row else None
+
+    def _delete_events_through(self, mark: tuple[str, str] | None) -> None:
+        if mark is not None:
+            self._conn.execute(
+                "DELETE FROM offcut_events WHERE event_at_utc < ? OR (event_at_utc = ? AND event_id <= ?)",
+                (mark[0], mark[0], mark[1]),
+            )
+
+    def load_snapshot(self) -> dict[str, Any] | None:
+        """Latest stock snapshot as ``{"mark": [event_at_utc, event_id], "offcuts": {...}}``."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM stock_snapshots WHERE key = 'latest'").fetchone()
+        if row is None:
+            return None
+        return {"mark": [row["mark_at"], row["mark_id"]], "offcuts": json.loads(row["state_json"])}
+
+    def events_after(self, mark: list[str] | None) -> list[dict[str, Any]]:
+        """Events after ``mark`` in replay order; every event when ``mark`` is ``None``."""
+        if mark is None:
+            return self._select("SELECT * FROM offcut_events ORDER BY event_at_utc, event_id", [])
+        return self._select(
+            "SELECT * FROM offcut_events WHERE event_at_utc > ? OR (event_at_utc = ? AND event_id > ?) "
+            "ORDER BY event_at_utc, event_id",
+            [mark[0], mark[0], mark[1]],
+        )
+
+    def append_events(self, rows: list[dict[str, Any]]) -> None:
+        self.upsert_rows({"offcut_events": rows})
+
+    def compact(self, snapshot: dict[str, Any]) -> None:
+        """Replace the snapshot and drop the events it covers, in one transaction."""
+        mark = tuple(snapshot["mark"])
+        with self._lock, self._conn:
+            self.version += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stock_snapshots (key, mark_at, mark_id, state_json, created_at_utc) "
+                "VALUES ('latest', ?, ?, ?, ?)",
+                (mark[0], mark[1], json.dumps(snapshot["offcuts"], sort_keys=True), _utc_now()),
+            )
+            self._delete_events_through(mark)
+
+    def write_stock_state(self, offcuts: dict[str, dict[str, Any]]) -> int:
+        """Set inventory status (and edited fields) from replayed offcut states; returns rows changed."""
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            for offcut_id, state in offcuts.items():
+                updates = {"status": state["status"], **state["fields"]}
+                columns = dict(STOCK_SCHEMA["offcut_inventory"][1])
+                assignments = ", ".join(f'"{name}" = ?' for name in updates)
+                differs = " OR ".join(f'"{name}" IS NOT ?' for name in updates)
+                values = [_coerce(value, columns[name]) for name, value in updates.items()]
+                self._conn.execute(
+                    f"UPDATE offcut_inventory SET {assignments} WHERE offcut_id = ? AND ({differs})",
+                    values + [offcut_id] + values,
+                )
+            changed = self._conn.total_changes - before
+            if changed:
+                self.version += 1
+        return changed
+
+    def write_usable_scores(self, scores: dict[str, float]) -> int:
+        """Set ``usable_score`` per offcut id; returns rows changed."""
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "UPDATE offcut_inventory SET usable_score = ? WHERE offcut_id = ? AND usable_score IS NOT ?",
+                [(float(score), offcut_id, float(score)) for offcut_id, score in scores.items()],
+            )
+            changed = self._conn.total_changes - before
+            if changed:
+                self.version += 1
+        return changed
+
+    def _select(self, sql: str, params: list[Any]) -> list[dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{key: row[key] for key in row.keys() if key != "synced_at"} for row in rows]
+
+
+class StockReconciler:
+    """Background thread that pulls the Sheets stock tabs into an ``OffcutStore``.
+
+    ``fetch`` returns ``{tab: rows}``; failures are recorded on ``status()``
+    and the store keeps serving its last good copy. ``after_sync`` runs after
+    each successful reconcile, e.g. to re-derive statuses from events.
+    """
+
+    def __init__(
+        self,
+        store: OffcutStore,
+        fetch: Callable[[], dict[str, list[dict[str, Any]]]],
+        interval_s: float = 60.0,
+        after_sync: Callable[[], Any] | None = None,
+    ):
+        self.store = store
+        self.fetch = fetch
+        self.interval_s = interval_s
+        self.after_sync = after_sync
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._status = {"last_success_at_utc": store.last_synced_at(), "last_error": None, "last_attempt_at_utc": None}
+        self._status_lock = threading.Lock()
+
+    def sync_now(self) -> bool:
+        """Run one reconcile pass in the calling thread; returns whether it succeeded."""
+        fetched_at = time.time()
+        attempt = _utc_now()
+        try:
+            snapshot = self.fetch()
+            self.store.reconcile(snapshot, fetched_at)
+            if self.after_sync is not None:
+                self.after_sync()
+        except Exception as exc:
+            with self._status_lock:
+                self._status.update(last_attempt_at_utc=attempt, last_error=str(exc))
+            return False
+        with self._status_lock:
+            self._status.update(last_attempt_at_utc=attempt, last_success_at_utc=_utc_now(), last_error=None)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.sync_now()
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="offcut-stock-reconciler", daemon=True)
+            self._thread.start()
+
+    def trigger(self) -> None:
+        """Ask the background thread to sync now instead of waiting for the interval."""
+        self._wake.set()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self) -> dict[str, Any]:
+        with self._status_lock:
+            status = dict(self._status)
+        status["running"] = self._thread is not None and self._thread.is_alive()
+        return status
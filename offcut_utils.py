@@ -1,6 +1,12 @@
 from __future__ import annotations
 
-import itertools
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import multiprocessing
+
+import numpy as np
 
 
 def _safe_float(value, default=0.0):
@@ -57,33 +63,6 @@ def _subtract_rect(container, cut):
     return [p for p in pieces if p["w"] > 1e-6 and p["h"] > 1e-6]
 
 
-def _prune_contained(rects):
-    kept = []
-    for i, rect in enumerate(rects):
-        contained = False
-        for j, other in enumerate(rects):
-            if i == j:
-                continue
-            if _rect_contained(rect, other):
-                contained = True
-                break
-        if not contained:
-            kept.append(rect)
-    return kept
-
-
-
-
-def _overlap_area(a, b):
-    ix1 = max(a["x"], b["x"])
-    iy1 = max(a["y"], b["y"])
-    ix2 = min(a["x"] + a["w"], b["x"] + b["w"])
-    iy2 = min(a["y"] + a["h"], b["y"] + b["h"])
-    if ix2 <= ix1 or iy2 <= iy1:
-        return 0.0
-    return (ix2 - ix1) * (iy2 - iy1)
-
-
 def _usable_sheet_and_parts(layout, sheet):
     margin = _safe_float(layout.get("margin"), 0.0)
     sheet_w = _safe_float(sheet.get("sheet_w"), _safe_float(layout.get("sheet_w"), 0.0))
@@ -113,21 +92,125 @@ def _usable_sheet_and_parts(layout, sheet):
     return usable, parts
 
 
+def _grid_cells(rect, origin_x, origin_y, cell):
+    x1 = int((rect["x"] - origin_x) // cell)
+    y1 = int((rect["y"] - origin_y) // cell)
+    x2 = int((rect["x"] + rect["w"] - origin_x) // cell)
+    y2 = int((rect["y"] + rect["h"] - origin_y) // cell)
+    for cx in range(x1, x2 + 1):
+        for cy in range(y1, y2 + 1):
+            yield cx, cy
+
+
 def _compute_free_rects(usable, parts):
-    free_rects = [usable]
+    """Free space left in ``usable`` after subtracting ``parts``, as non-contained rects.
+
+    Free rects live in a uniform grid so each part only splits the rects it
+    actually hits, and each new piece is tested for containment only against
+    rects registered in the cell holding its centre. Rects the part misses can
+    never become contained, so they are never re-checked. Output order matches
+    splitting each free rect in place.
+    """
+    if usable["w"] <= 0 or usable["h"] <= 0:
+        return [usable]
+
+    origin_x, origin_y = usable["x"], usable["y"]
+    cell = max(usable["w"], usable["h"]) / max(4.0, min(64.0, float(len(parts)) ** 0.5 * 2.0))
+
+    rects = {0: usable}
+    order = {0: (0,)}
+    grid = {}
+    for key in _grid_cells(usable, origin_x, origin_y, cell):
+        grid.setdefault(key, set()).add(0)
+    next_id = 1
+
+    def _register(rect_id, rect):
+        for key in _grid_cells(rect, origin_x, origin_y, cell):
+            grid.setdefault(key, set()).add(rect_id)
+
+    def _unregister(rect_id, rect):
+        for key in _grid_cells(rect, origin_x, origin_y, cell):
+            grid[key].discard(rect_id)
+
     for part in parts:
-        next_rects = []
-        for free_rect in free_rects:
-            next_rects.extend(_subtract_rect(free_rect, part))
-        free_rects = _prune_contained(next_rects)
-    return free_rects
+        hit = set()
+        for key in _grid_cells(part, origin_x, origin_y, cell):
+            hit.update(rid for rid in grid.get(key, ()) if _intersects(rects[rid], part))
+        if not hit:
+            continue
 
+        pieces = []
+        for rid in sorted(hit, key=order.get):
+            container = rects.pop(rid)
+            base = order.pop(rid)
+            _unregister(rid, container)
+            for n, piece in enumerate(_subtract_rect(container, part)):
+                pieces.append((base + (n,), piece))
+
+        fresh = []
+        for key, piece in pieces:
+            rects[next_id] = piece
+            order[next_id] = key
+            _register(next_id, piece)
+            fresh.append(next_id)
+            next_id += 1
+
+        for rid in fresh:
+            piece = rects[rid]
+            centre = (
+                int((piece["x"] + piece["w"] / 2.0 - origin_x) // cell),
+                int((piece["y"] + piece["h"] / 2.0 - origin_y) // cell),
+            )
+            for other in grid.get(centre, ()):
+                if other != rid and _rect_contained(piece, rects[other]):
+                    # Identical pieces contain each other; keep the earliest one.
+                    if _rect_contained(rects[other], piece) and order[other] > order[rid]:
+                        continue
+                    _unregister(rid, piece)
+                    del rects[rid]
+                    del order[rid]
+                    break
 
-def calculate_sheet_offcuts(layout, sheet, min_width=120.0, min_height=120.0, min_area=25000.0):
+    return [rects[rid] for rid in sorted(rects, key=order.get)]
+
+
+FREE_SPACE_CACHE_SIZE = 64
+
+
+@lru_cache(maxsize=FREE_SPACE_CACHE_SIZE)
+def _cached_free_space(fingerprint):
+    usable_key, part_keys = fingerprint
+    usable = dict(zip(("x", "y", "w", "h"), usable_key))
+    parts = [dict(zip(("x", "y", "w", "h"), key)) for key in part_keys]
+    return {"usable": usable, "parts": parts, "free_rects": _compute_free_rects(usable, parts)}
+
+
+def analyze_sheet_free_space(layout, sheet):
+    """Free-space analysis of a sheet, shared across offcut views.
+
+    Results are cached by a fingerprint of the usable area and clipped part
+    rects with LRU eviction, so threshold changes re-filter cached geometry.
+    The returned dict and its rects are shared: treat them as read-only.
+    Derived data such as free-space components is stored on it lazily.
+    """
     usable, parts = _usable_sheet_and_parts(layout, sheet)
+    fingerprint = (
+        tuple(usable.get(key, 0.0) for key in ("x", "y", "w", "h")),
+        tuple((p["x"], p["y"], p["w"], p["h"]) for p in parts),
+    )
+    return _cached_free_space(fingerprint)
+
+
+def clear_free_space_cache():
+    _cached_free_space.cache_clear()
+
+
+def calculate_sheet_offcuts(layout, sheet, min_width=120.0, min_height=120.0, min_area=25000.0):
+    analysis = analyze_sheet_free_space(layout, sheet)
+    usable, parts = analysis["usable"], analysis["parts"]
     interior_area = usable["w"] * usable["h"]
 
-    free_rects = _compute_free_rects(usable, parts)
+    free_rects = analysis["free_rects"]
 
     used_area = sum(p["w"] * p["h"] for p in parts)
     waste_area = sum(r["w"] * r["h"] for r in free_rects)
@@ -154,54 +237,86 @@ def calculate_sheet_offcuts(layout, sheet, min_width=120.0, min_height=120.0, mi
     }
 
 
-def build_sheet_usage_heatmap(layout, sheet, cell_size=100.0):
+def _axis_overlaps(starts, sizes, cell_starts, cell_ends):
+    # (parts, cells) matrix of 1-D overlap lengths.
+    lo = np.maximum(starts[:, None], cell_starts[None, :])
+    hi = np.minimum((starts + sizes)[:, None], cell_ends[None, :])
+    return np.clip(hi - lo, 0.0, None)
+
+
+def build_sheet_usage_grid(layout, sheet, cell_size=100.0):
+    """Per-cell used area over the usable sheet as NumPy arrays.
+
+    Part/cell overlap is separable into x and y overlaps, so the whole
+    (rows, cols) used-area grid is one matrix product of the per-axis overlap
+    matrices. Returns ``None`` when the sheet has no usable area.
+    """
     usable, parts = _usable_sheet_and_parts(layout, sheet)
     if usable["w"] <= 0 or usable["h"] <= 0:
-        return []
+        return None
 
     size = max(10.0, _safe_float(cell_size, 100.0))
-    x_start = usable["x"]
-    y_start = usable["y"]
     x_end = usable["x"] + usable["w"]
     y_end = usable["y"] + usable["h"]
+    x_starts = usable["x"] + np.arange(int(np.ceil((usable["w"] - 1e-6) / size))) * size
+    y_starts = usable["y"] + np.arange(int(np.ceil((usable["h"] - 1e-6) / size))) * size
+    x_ends = np.minimum(x_starts + size, x_end)
+    y_ends = np.minimum(y_starts + size, y_end)
+
+    if parts:
+        px = np.array([p["x"] for p in parts], dtype=float)
+        py = np.array([p["y"] for p in parts], dtype=float)
+        pw = np.array([p["w"] for p in parts], dtype=float)
+        ph = np.array([p["h"] for p in parts], dtype=float)
+        used_area = _axis_overlaps(py, ph, y_starts, y_ends).T @ _axis_overlaps(px, pw, x_starts, x_ends)
+    else:
+        used_area = np.zeros((len(y_starts), len(x_starts)))
+
+    cell_area = np.outer(y_ends - y_starts, x_ends - x_starts)
+    usage_ratio = np.divide(used_area, cell_area, out=np.zeros_like(used_area), where=cell_area > 0)
+    return {
+        "x_starts": x_starts,
+        "x_ends": x_ends,
+        "y_starts": y_starts,
+        "y_ends": y_ends,
+        "used_area": used_area,
+        "cell_area": cell_area,
+        "usage_ratio": usage_ratio,
+    }
+
+
+def build_sheet_usage_heatmap(layout, sheet, cell_size=100.0):
+    grid = build_sheet_usage_grid(layout, sheet, cell_size=cell_size)
+    if grid is None:
+        return []
 
     cells = []
-    y = y_start
-    row_idx = 0
-    while y < y_end - 1e-6:
-        x = x_start
-        col_idx = 0
-        cell_h = min(size, y_end - y)
-        while x < x_end - 1e-6:
-            cell_w = min(size, x_end - x)
-            cell = {"x": x, "y": y, "w": cell_w, "h": cell_h}
-            cell_area = cell_w * cell_h
-            used_area = sum(_overlap_area(cell, part) for part in parts)
-            usage_ratio = (used_area / cell_area) if cell_area > 0 else 0.0
+    for row_idx, (y, y2) in enumerate(zip(grid["y_starts"].tolist(), grid["y_ends"].tolist())):
+        used_row = grid["used_area"][row_idx].tolist()
+        area_row = grid["cell_area"][row_idx].tolist()
+        ratio_row = grid["usage_ratio"][row_idx].tolist()
+        for col_idx, (x, x2) in enumerate(zip(grid["x_starts"].tolist(), grid["x_ends"].tolist())):
             cells.append({
                 "x": round(x, 2),
                 "y": round(y, 2),
-                "x2": round(x + cell_w, 2),
-                "y2": round(y + cell_h, 2),
+                "x2": round(x2, 2),
+                "y2": round(y2, 2),
                 "cell_col": col_idx,
                 "cell_row": row_idx,
-                "used_area": round(used_area, 2),
-                "cell_area": round(cell_area, 2),
-                "usage_ratio": round(usage_ratio, 4),
-                "usage_pct": round(usage_ratio * 100.0, 2),
+                "used_area": round(used_row[col_idx], 2),
+                "cell_area": round(area_row[col_idx], 2),
+                "usage_ratio": round(ratio_row[col_idx], 4),
+                "usage_pct": round(ratio_row[col_idx] * 100.0, 2),
             })
-            x += size
-            col_idx += 1
-        y += size
-        row_idx += 1
 
     return cells
 
 
 def build_sheet_offcut_preview(layout, sheet):
-    usable, parts = _usable_sheet_and_parts(layout, sheet)
+    analysis = analyze_sheet_free_space(layout, sheet)
+    usable, parts = analysis["usable"], analysis["parts"]
 
-    free_rects = _compute_free_rects(usable, parts)
+    free_rects = analysis["free_rects"]
 
     return {
         "usable": {
@@ -232,89 +347,278 @@ def build_sheet_offcut_preview(layout, sheet):
     }
 
 
-def _touches(a, b, tol=1e-6):
-    vertical_touch = abs((a["x"] + a["w"]) - b["x"]) <= tol or abs((b["x"] + b["w"]) - a["x"]) <= tol
-    vertical_overlap = min(a["y"] + a["h"], b["y"] + b["h"]) - max(a["y"], b["y"])
-
-    horizontal_touch = abs((a["y"] + a["h"]) - b["y"]) <= tol or abs((b["y"] + b["h"]) - a["y"]) <= tol
-    horizontal_overlap = min(a["x"] + a["w"], b["x"] + b["w"]) - max(a["x"], b["x"])
+def _touching_pairs(edges, tol):
+    """Index pairs whose opposite edges share a line and overlap by more than ``tol``.
+
+    ``edges`` are ``(coord, side, lo, hi, idx)`` with side 0 for a closing
+    edge and 1 for an opening one; sorting groups each edge line, then a sweep
+    over ``lo`` keeps only the edges still overlapping the current one.
+    """
+    edges.sort()
+    start = 0
+    while start < len(edges):
+        end = start + 1
+        while end < len(edges) and edges[end][0] - edges[end - 1][0] <= tol:
+            end += 1
+        active = ([], [])
+        for _, side, lo, hi, idx in sorted(edges[start:end], key=lambda e: e[2]):
+            for bucket in active:
+                bucket[:] = [item for item in bucket if item[0] > lo + tol]
+            if hi > lo + tol:
+                for _, other in active[1 - side]:
+                    yield idx, other
+                active[side].append((hi, idx))
+        start = end
+
+
+def _rect_adjacency(rects, tol=1e-6):
+    """Neighbour sets of rects that share an edge segment longer than ``tol``.
+
+    Built by sorting edges by coordinate and matching overlapping intervals,
+    so the cost is O(n log n) plus the number of touching pairs. The sheet's
+    graph is cached on its free-space analysis for component detection.
+    """
+    adjacency = [set() for _ in rects]
+    vertical = []
+    horizontal = []
+    for idx, r in enumerate(rects):
+        vertical.append((r["x"] + r["w"], 0, r["y"], r["y"] + r["h"], idx))
+        vertical.append((r["x"], 1, r["y"], r["y"] + r["h"], idx))
+        horizontal.append((r["y"] + r["h"], 0, r["x"], r["x"] + r["w"], idx))
+        horizontal.append((r["y"], 1, r["x"], r["x"] + r["w"], idx))
+    for edges in (vertical, horizontal):
+        for a, b in _touching_pairs(edges, tol):
+            if a != b:
+                adjacency[a].add(b)
+                adjacency[b].add(a)
+    return adjacency
+
+
+class _CoverageTree:
+    """Segment tree counting rect coverage over compressed cells.
+
+    ``covered[node]`` is the number of covered cells under the node, so
+    listing the covered runs of a range skips empty subtrees.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.count = [0] * (4 * size)
+        self.covered = [0] * (4 * size)
+
+    def add(self, lo, hi, delta, node=1, left=0, right=None):
+        if right is None:
+            right = self.size
+        if hi <= left or right <= lo:
+            return
+        if lo <= left and right <= hi:
+            self.count[node] += delta
+        else:
+            mid = (left + right) // 2
+            self.add(lo, hi, delta, 2 * node, left, mid)
+            self.add(lo, hi, delta, 2 * node + 1, mid, right)
+        if self.count[node] > 0:
+            self.covered[node] = right - left
+        elif right - left == 1:
+            self.covered[node] = 0
+        else:
+            self.covered[node] = self.covered[2 * node] + self.covered[2 * node + 1]
+
+    def runs(self, lo, hi):
+        out = []
+        self._collect(1, 0, self.size, lo, hi, out)
+        return out
+
+    def _collect(self, node, left, right, lo, hi, out):
+        if hi <= left or right <= lo or self.covered[node] == 0:
+            return
+        if self.covered[node] == right - left:
+            start, end = max(left, lo), min(right, hi)
+            if out and out[-1][1] == start:
+                out[-1][1] = end
+            else:
+                out.append([start, end])
+            return
+        mid = (left + right) // 2
+        self._collect(2 * node, left, mid, lo, hi, out)
+        self._collect(2 * node + 1, mid, right, lo, hi, out)
+
+
+def _run_difference(runs, minus):
+    """Parts of sorted, disjoint index runs not covered by ``minus``."""
+    out = []
+    j = 0
+    for lo, hi in runs:
+        start = lo
+        while j < len(minus) and minus[j][1] <= start:
+            j += 1
+        k = j
+        while k < len(minus) and minus[k][0] < hi:
+            if minus[k][0] > start:
+                out.append((start, minus[k][0]))
+            start = max(start, minus[k][1])
+            k += 1
+        if start < hi:
+            out.append((start, hi))
+    return out
+
+
+def _sweep_boundary(spans):
+    """Union boundary edges across the sweep axis for ``(a0, a1, b0, b1)`` spans.
+
+    Yields ``(a, b_lo, b_hi, entering)``: at each sweep stop the covered runs
+    of the updated ranges are compared before and after the updates, so every
+    maximal edge is found without rescanning untouched coverage.
+    """
+    bs = sorted({s[2] for s in spans} | {s[3] for s in spans})
+    b_index = {value: idx for idx, value in enumerate(bs)}
+    events = sorted(
+        [(s[0], 1, b_index[s[2]], b_index[s[3]]) for s in spans]
+        + [(s[1], -1, b_index[s[2]], b_index[s[3]]) for s in spans]
+    )
+    tree = _CoverageTree(len(bs) - 1)
 
-    return (vertical_touch and vertical_overlap > tol) or (horizontal_touch and horizontal_overlap > tol)
+    i = 0
+    while i < len(events):
+        a = events[i][0]
+        j = i
+        while j < len(events) and events[j][0] == a:
+            j += 1
+        ranges = []
+        for _, _, lo, hi in sorted(events[i:j], key=lambda e: e[2]):
+            if ranges and lo <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], hi)
+            else:
+                ranges.append([lo, hi])
 
+        before = [tree.runs(lo, hi) for lo, hi in ranges]
+        for _, delta, lo, hi in events[i:j]:
+            tree.add(lo, hi, delta)
+        for (lo, hi), runs_before in zip(ranges, before):
+            runs_after = tree.runs(lo, hi)
+            for run_lo, run_hi in _run_difference(runs_after, runs_before):
+                yield a, bs[run_lo], bs[run_hi], True
+            for run_lo, run_hi in _run_difference(runs_before, runs_after):
+                yield a, bs[run_lo], bs[run_hi], False
+        i = j
 
-def _polygon_from_rects(rects):
-    xs = sorted({r["x"] for r in rects} | {r["x"] + r["w"] for r in rects})
-    ys = sorted({r["y"] for r in rects} | {r["y"] + r["h"] for r in rects})
-    if len(xs) < 2 or len(ys) < 2:
-        return []
 
-    occupied = set()
-    for ix in range(len(xs) - 1):
-        cx = (xs[ix] + xs[ix + 1]) / 2.0
-        for iy in range(len(ys) - 1):
-            cy = (ys[iy] + ys[iy + 1]) / 2.0
-            if any((r["x"] <= cx <= r["x"] + r["w"]) and (r["y"] <= cy <= r["y"] + r["h"]) for r in rects):
-                occupied.add((ix, iy))
+def _signed_area(loop):
+    area = 0.0
+    for idx, current in enumerate(loop):
+        nxt = loop[(idx + 1) % len(loop)]
+        area += (current[0] * nxt[1]) - (nxt[0] * current[1])
+    return area / 2.0
 
-    if not occupied:
-        return []
 
-    edges = set()
+def _direction(a, b):
+    return ((b[0] > a[0]) - (b[0] < a[0]), (b[1] > a[1]) - (b[1] < a[1]))
 
-    def toggle_edge(p1, p2):
-        key = (p1, p2) if p1 <= p2 else (p2, p1)
-        if key in edges:
-            edges.remove(key)
-        else:
-            edges.add(key)
 
-    for ix, iy in occupied:
-        x1, x2 = xs[ix], xs[ix + 1]
-        y1, y2 = ys[iy], ys[iy + 1]
-        toggle_edge((x1, y1), (x2, y1))
-        toggle_edge((x2, y1), (x2, y2))
-        toggle_edge((x2, y2), (x1, y2))
-        toggle_edge((x1, y2), (x1, y1))
+def _union_boundary_loops(rects):
+    """Boundary of a rect union as ``(outer, holes)`` loop pairs.
 
-    if not edges:
+    Two sweeps (along x and along y) emit the maximal vertical and horizontal
+    boundary edges in O(R log R) plus output size. Edges are oriented with the
+    union on their left, so outer loops come out counter-clockwise and holes
+    clockwise; at a corner-only touch the walk turns left, which keeps the two
+    regions as separate loops. Each loop starts at its lowest, then leftmost
+    vertex.
+    """
+    rects = [r for r in rects if r["w"] > 0 and r["h"] > 0]
+    if not rects:
         return []
 
-    adjacency = {}
-    for p1, p2 in edges:
-        adjacency.setdefault(p1, []).append(p2)
-        adjacency.setdefault(p2, []).append(p1)
-
-    start = min(adjacency.keys(), key=lambda p: (p[1], p[0]))
-    polygon = [start]
-    prev = None
-    current = start
-    max_steps = len(edges) + 5
-    for _ in range(max_steps):
-        neighbors = adjacency.get(current, [])
-        nxt = neighbors[0] if len(neighbors) == 1 else (neighbors[1] if neighbors[0] == prev else neighbors[0])
-        if nxt == start:
-            break
-        polygon.append(nxt)
-        prev, current = current, nxt
-
-    rounded = [[round(p[0], 2), round(p[1], 2)] for p in polygon]
+    outgoing = {}
+    x_spans = [(r["x"], r["x"] + r["w"], r["y"], r["y"] + r["h"]) for r in rects]
+    for x, y_lo, y_hi, entering in _sweep_boundary(x_spans):
+        start, end = ((x, y_hi), (x, y_lo)) if entering else ((x, y_lo), (x, y_hi))
+        outgoing.setdefault(start, []).append(end)
+    y_spans = [(r["y"], r["y"] + r["h"], r["x"], r["x"] + r["w"]) for r in rects]
+    for y, x_lo, x_hi, entering in _sweep_boundary(y_spans):
+        start, end = ((x_lo, y), (x_hi, y)) if entering else ((x_hi, y), (x_lo, y))
+        outgoing.setdefault(start, []).append(end)
+
+    def take(point, heading):
+        candidates = outgoing[point]
+        left = (-heading[1], heading[0])
+        pick = next((idx for idx, end in enumerate(candidates) if _direction(point, end) == left), -1)
+        end = candidates.pop(pick)
+        if not candidates:
+            del outgoing[point]
+        return end
+
+    loops = []
+    for origin in sorted(outgoing, key=lambda p: (p[1], p[0])):
+        while origin in outgoing:
+            first = outgoing[origin].pop()
+            if not outgoing[origin]:
+                del outgoing[origin]
+            first_heading = _direction(origin, first)
+            loop = [origin]
+            prev, current = origin, first
+            while True:
+                heading = _direction(prev, current)
+                if current == origin and (first_heading == (-heading[1], heading[0]) or origin not in outgoing):
+                    break
+                loop.append(current)
+                prev, current = current, take(current, heading)
+            loops.append(loop)
+
+    outers = [loop for loop in loops if _signed_area(loop) > 0]
+    shapes = [(outer, []) for outer in outers]
+    for hole in (loop for loop in loops if _signed_area(loop) < 0):
+        # An edge midpoint of a hole is strictly inside every outer loop that encloses it.
+        probe_x = (hole[0][0] + hole[1][0]) / 2.0
+        probe_y = (hole[0][1] + hole[1][1]) / 2.0
+        containing = [
+            shape for shape in shapes
+            if _point_in_polygon(probe_x, probe_y, shape[0])
+        ]
+        if containing:
+            min(containing, key=lambda shape: _signed_area(shape[0]))[1].append(hole)
+    return shapes
+
+
+def _simplify_loop(loop):
+    """Round a loop to 0.01 mm, drop repeated and collinear points and start at the lowest-left vertex."""
+    rounded = []
+    for point in loop:
+        p = [round(point[0], 2), round(point[1], 2)]
+        if not rounded or rounded[-1] != p:
+            rounded.append(p)
+    if len(rounded) > 1 and rounded[0] == rounded[-1]:
+        rounded.pop()
+
+    changed = True
+    while changed and len(rounded) >= 3:
+        changed = False
+        for idx in range(len(rounded)):
+            prev_p = rounded[idx - 1]
+            curr_p = rounded[idx]
+            next_p = rounded[(idx + 1) % len(rounded)]
+            cross = ((curr_p[0] - prev_p[0]) * (next_p[1] - curr_p[1])) - ((curr_p[1] - prev_p[1]) * (next_p[0] - curr_p[0]))
+            if abs(cross) <= 1e-6:
+                rounded.pop(idx)
+                changed = True
+                break
     if len(rounded) < 3:
-        return rounded
+        return []
+
+    start = min(range(len(rounded)), key=lambda idx: (rounded[idx][1], rounded[idx][0]))
+    return rounded[start:] + rounded[:start]
 
-    simplified = []
-    n = len(rounded)
-    for i in range(n):
-        prev_p = rounded[i - 1]
-        curr_p = rounded[i]
-        next_p = rounded[(i + 1) % n]
 
-        prev_vec = (curr_p[0] - prev_p[0], curr_p[1] - prev_p[1])
-        next_vec = (next_p[0] - curr_p[0], next_p[1] - curr_p[1])
-        cross = (prev_vec[0] * next_vec[1]) - (prev_vec[1] * next_vec[0])
-        if abs(cross) > 1e-6:
-            simplified.append(curr_p)
+def _polygon_from_rects(rects):
+    """Outer outline of a rect union, starting at its lowest-left vertex.
 
-    return simplified
+    Only the loop through that vertex is returned; holes and any separate
+    loops are dropped.
+    """
+    shapes = _union_boundary_loops(rects)
+    if not shapes:
+        return []
+    return _simplify_loop(shapes[0][0])
 
 
 def _is_l_shape(vertices):
@@ -436,46 +740,37 @@ def _point_in_polygon(x, y, vertices):
 
 
 def _polygon_within_rect_union(vertices, rects):
+    """Whether an orthogonal polygon lies inside a rect union.
+
+    Rows of the shared compressed grid are scanned once; the polygon's inside
+    spans on each row come from the vertical edges crossing it.
+    """
     if len(vertices) < 3:
         return False
-    xs = sorted({p[0] for p in vertices} | {r['x'] for r in rects} | {r['x'] + r['w'] for r in rects})
-    ys = sorted({p[1] for p in vertices} | {r['y'] for r in rects} | {r['y'] + r['h'] for r in rects})
+    xs, ys, filled = _union_cells(rects, [p[0] for p in vertices], [p[1] for p in vertices])
     if len(xs) < 2 or len(ys) < 2:
         return False
+    x_index = {value: idx for idx, value in enumerate(xs)}
 
-    for ix in range(len(xs) - 1):
-        cx = (xs[ix] + xs[ix + 1]) / 2.0
-        for iy in range(len(ys) - 1):
-            cy = (ys[iy] + ys[iy + 1]) / 2.0
-            in_poly = _point_in_polygon(cx, cy, vertices)
-            if not in_poly:
-                continue
-            in_union = any(
-                (r['x'] <= cx <= r['x'] + r['w']) and (r['y'] <= cy <= r['y'] + r['h'])
-                for r in rects
-            )
-            if not in_union:
-                return False
+    vertical_edges = []
+    for idx, current in enumerate(vertices):
+        nxt = vertices[(idx + 1) % len(vertices)]
+        if current[0] == nxt[0] and current[1] != nxt[1]:
+            vertical_edges.append((current[0], min(current[1], nxt[1]), max(current[1], nxt[1])))
+
+    for iy in range(len(ys) - 1):
+        cy = (ys[iy] + ys[iy + 1]) / 2.0
+        crossings = sorted(x for x, lo, hi in vertical_edges if lo < cy < hi)
+        for left, right in zip(crossings[0::2], crossings[1::2]):
+            for ix in range(x_index[left], x_index[right]):
+                if (ix, iy) not in filled:
+                    return False
     return True
 
 
-def _is_connected_rect_group(rects):
-    if not rects:
-        return False
-    seen = {0}
-    stack = [0]
-    while stack:
-        current = stack.pop()
-        for idx in range(len(rects)):
-            if idx in seen:
-                continue
-            if _touches(rects[current], rects[idx]):
-                seen.add(idx)
-                stack.append(idx)
-    return len(seen) == len(rects)
-
-
-def _connected_rect_components(rects):
+def _connected_rect_components(rects, adjacency=None):
+    if adjacency is None:
+        adjacency = _rect_adjacency(rects)
     components = []
     visited = set()
     for start_idx in range(len(rects)):
@@ -487,138 +782,298 @@ def _connected_rect_components(rects):
         while stack:
             current = stack.pop()
             component_indices.append(current)
-            for idx in range(len(rects)):
-                if idx in visited:
-                    continue
-                if _touches(rects[current], rects[idx]):
+            for idx in sorted(adjacency[current]):
+                if idx not in visited:
                     visited.add(idx)
                     stack.append(idx)
         components.append(component_indices)
     return components
 
 
+def _union_cells(rects, extra_xs=(), extra_ys=()):
+    """Compressed grid of a rect union: sorted xs, ys and the set of filled (ix, iy) cells.
+
+    ``extra_xs``/``extra_ys`` add grid lines, e.g. the vertices of a polygon
+    tested against the union.
+    """
+    xs = sorted({r["x"] for r in rects} | {r["x"] + r["w"] for r in rects} | set(extra_xs))
+    ys = sorted({r["y"] for r in rects} | {r["y"] + r["h"] for r in rects} | set(extra_ys))
+    x_index = {value: idx for idx, value in enumerate(xs)}
+    y_index = {value: idx for idx, value in enumerate(ys)}
+    filled = set()
+    for r in rects:
+        for ix in range(x_index[r["x"]], x_index[r["x"] + r["w"]]):
+            for iy in range(y_index[r["y"]], y_index[r["y"] + r["h"]]):
+                filled.add((ix, iy))
+    return xs, ys, filled
+
+
 def _largest_rect_in_union(rects):
+    """Largest axis-aligned rect inside a rect union.
+
+    Runs the stack-based largest-rectangle-in-histogram pass once per row of
+    the compressed grid, with column heights and widths weighted by the real
+    cell sizes, so the cost is linear in the number of grid cells.
+    """
     if not rects:
         return None
 
-    xs = sorted({r['x'] for r in rects} | {r['x'] + r['w'] for r in rects})
-    ys = sorted({r['y'] for r in rects} | {r['y'] + r['h'] for r in rects})
+    xs, ys, filled = _union_cells(rects)
     if len(xs) < 2 or len(ys) < 2:
         return None
 
-    occupied = set()
-    for ix in range(len(xs) - 1):
-        cx = (xs[ix] + xs[ix + 1]) / 2.0
-        for iy in range(len(ys) - 1):
-            cy = (ys[iy] + ys[iy + 1]) / 2.0
-            if any((r['x'] <= cx <= r['x'] + r['w']) and (r['y'] <= cy <= r['y'] + r['h']) for r in rects):
-                occupied.add((ix, iy))
-
+    columns = len(xs) - 1
+    heights = [0.0] * columns
     best = None
     best_area = 0.0
-    for ix1 in range(len(xs) - 1):
-        for ix2 in range(ix1 + 1, len(xs)):
-            width = xs[ix2] - xs[ix1]
-            if width <= 0:
-                continue
-            for iy1 in range(len(ys) - 1):
-                for iy2 in range(iy1 + 1, len(ys)):
-                    height = ys[iy2] - ys[iy1]
-                    if height <= 0:
-                        continue
-                    all_filled = True
-                    for ix in range(ix1, ix2):
-                        for iy in range(iy1, iy2):
-                            if (ix, iy) not in occupied:
-                                all_filled = False
-                                break
-                        if not all_filled:
-                            break
-                    if not all_filled:
-                        continue
-                    area = width * height
-                    if area > best_area:
-                        best_area = area
-                        best = {'x': xs[ix1], 'y': ys[iy1], 'w': width, 'h': height}
+    for iy in range(len(ys) - 1):
+        row_h = ys[iy + 1] - ys[iy]
+        for ix in range(columns):
+            heights[ix] = heights[ix] + row_h if (ix, iy) in filled else 0.0
+
+        stack = []
+        for ix in range(columns + 1):
+            height = heights[ix] if ix < columns else 0.0
+            start = ix
+            while stack and stack[-1][1] >= height:
+                start, bar_h = stack.pop()
+                width = xs[ix] - xs[start]
+                area = width * bar_h
+                if area > best_area:
+                    best_area = area
+                    best = {"x": xs[start], "y": ys[iy + 1] - bar_h, "w": width, "h": bar_h}
+            if height > 0:
+                stack.append((start, height))
 
     return best
 
 
-def calculate_l_mix_offcuts(layout, sheet, min_width=120.0, min_height=120.0, min_area=25000.0):
-    usable, parts = _usable_sheet_and_parts(layout, sheet)
-    free_rects = _compute_free_rects(usable, parts)
+def _slab_partition(xs, ys, filled, horizontal=True):
+    """Partition a cell union into disjoint rects: maximal runs per slab, merged across slabs with equal extent."""
+    if horizontal:
+        lines, runs_axis = ys, xs
+        is_filled = lambda run_idx, line_idx: (run_idx, line_idx) in filled
+    else:
+        lines, runs_axis = xs, ys
+        is_filled = lambda run_idx, line_idx: (line_idx, run_idx) in filled
 
-    l_shapes = []
+    pieces = []
+    open_pieces = {}
+    for line_idx in range(len(lines) - 1):
+        runs = []
+        run_start = None
+        for run_idx in range(len(runs_axis) - 1):
+            if is_filled(run_idx, line_idx):
+                if run_start is None:
+                    run_start = run_idx
+            elif run_start is not None:
+                runs.append((run_start, run_idx))
+                run_start = None
+        if run_start is not None:
+            runs.append((run_start, len(runs_axis) - 1))
+
+        next_open = {}
+        for run in runs:
+            piece = open_pieces.get(run)
+            if piece is None:
+                piece = [run[0], run[1], line_idx, line_idx + 1]
+                pieces.append(piece)
+            else:
+                piece[3] = line_idx + 1
+            next_open[run] = piece
+        open_pieces = next_open
+
+    rects = []
+    for r1, r2, l1, l2 in pieces:
+        if horizontal:
+            rects.append({"x": xs[r1], "y": ys[l1], "w": xs[r2] - xs[r1], "h": ys[l2] - ys[l1]})
+        else:
+            rects.append({"x": xs[l1], "y": ys[r1], "w": xs[l2] - xs[l1], "h": ys[r2] - ys[r1]})
+    return rects
+
+
+def _l_arm_pairs(pieces):
+    """Yield arm pairs forming an L from partition pieces that share an edge."""
+    by_bottom = {}
+    by_left = {}
+    for piece in pieces:
+        by_bottom.setdefault(piece["y"], []).append(piece)
+        by_left.setdefault(piece["x"], []).append(piece)
+
+    for a in pieces:
+        for b in by_bottom.get(a["y"] + a["h"], ()):
+            lo = max(a["x"], b["x"])
+            hi = min(a["x"] + a["w"], b["x"] + b["w"])
+            if hi <= lo:
+                continue
+            if a["x"] + a["w"] != b["x"] + b["w"]:
+                yield (
+                    {"x": lo, "y": a["y"], "w": a["x"] + a["w"] - lo, "h": a["h"]},
+                    {"x": lo, "y": b["y"], "w": b["x"] + b["w"] - lo, "h": b["h"]},
+                )
+            if a["x"] != b["x"]:
+                yield (
+                    {"x": a["x"], "y": a["y"], "w": hi - a["x"], "h": a["h"]},
+                    {"x": b["x"], "y": b["y"], "w": hi - b["x"], "h": b["h"]},
+                )
+        for b in by_left.get(a["x"] + a["w"], ()):
+            lo = max(a["y"], b["y"])
+            hi = min(a["y"] + a["h"], b["y"] + b["h"])
+            if hi <= lo:
+                continue
+            if a["y"] + a["h"] != b["y"] + b["h"]:
+                yield (
+                    {"x": a["x"], "y": lo, "w": a["w"], "h": a["y"] + a["h"] - lo},
+                    {"x": b["x"], "y": lo, "w": b["w"], "h": b["y"] + b["h"] - lo},
+                )
+            if a["y"] != b["y"]:
+                yield (
+                    {"x": a["x"], "y": a["y"], "w": a["w"], "h": hi - a["y"]},
+                    {"x": b["x"], "y": b["y"], "w": b["w"], "h": hi - b["y"]},
+                )
+
+
+def _c_arm_triples(pieces):
+    """Yield arm triples forming a C from three stacked partition pieces.
+
+    The middle piece is the spine; the outer pieces are trimmed to the spine's
+    closed side and must both reach past its open side.
+    """
+    by_bottom = {}
+    by_top = {}
+    by_left = {}
+    by_right = {}
+    for piece in pieces:
+        by_bottom.setdefault(piece["y"], []).append(piece)
+        by_top.setdefault(piece["y"] + piece["h"], []).append(piece)
+        by_left.setdefault(piece["x"], []).append(piece)
+        by_right.setdefault(piece["x"] + piece["w"], []).append(piece)
+
+    for m in pieces:
+        m_right = m["x"] + m["w"]
+        for a in by_top.get(m["y"], ()):
+            for b in by_bottom.get(m["y"] + m["h"], ()):
+                a_right = a["x"] + a["w"]
+                b_right = b["x"] + b["w"]
+                lo = max(a["x"], m["x"], b["x"])
+                if lo < m_right < min(a_right, b_right):
+                    yield tuple(
+                        {"x": lo, "y": r["y"], "w": r["x"] + r["w"] - lo, "h": r["h"]} for r in (a, m, b)
+                    )
+                hi = min(a_right, m_right, b_right)
+                if max(a["x"], b["x"]) < m["x"] < hi:
+                    yield tuple({"x": r["x"], "y": r["y"], "w": hi - r["x"], "h": r["h"]} for r in (a, m, b))
+
+        m_top = m["y"] + m["h"]
+        for a in by_right.get(m["x"], ()):
+            for b in by_left.get(m["x"] + m["w"], ()):
+                a_top = a["y"] + a["h"]
+                b_top = b["y"] + b["h"]
+                lo = max(a["y"], m["y"], b["y"])
+                if lo < m_top < min(a_top, b_top):
+                    yield tuple(
+                        {"x": r["x"], "y": lo, "w": r["w"], "h": r["y"] + r["h"] - lo} for r in (a, m, b)
+                    )
+                hi = min(a_top, m_top, b_top)
+                if max(a["y"], b["y"]) < m["y"] < hi:
+                    yield tuple({"x": r["x"], "y": r["y"], "w": r["w"], "h": hi - r["y"]} for r in (a, m, b))
+
+
+def _is_c_shape(vertices):
+    # Eight corners with the two reflex corners adjacent (the inside of the spine).
+    if len(vertices) != 8:
+        return False
+    orientation = 1.0 if sum(
+        (vertices[i][0] * vertices[(i + 1) % 8][1]) - (vertices[(i + 1) % 8][0] * vertices[i][1]) for i in range(8)
+    ) > 0 else -1.0
+    reflex = []
+    for i in range(8):
+        prev_p, curr_p, next_p = vertices[i - 1], vertices[i], vertices[(i + 1) % 8]
+        cross = ((curr_p[0] - prev_p[0]) * (next_p[1] - curr_p[1])) - ((curr_p[1] - prev_p[1]) * (next_p[0] - curr_p[0]))
+        if cross * orientation < 0:
+            reflex.append(i)
+    return len(reflex) == 2 and (reflex[1] - reflex[0]) in (1, 7)
+
+
+def _shape_mix_offcuts(layout, sheet, shape_type, count_key, arm_groups, is_shape, min_width, min_height, min_area):
+    analysis = analyze_sheet_free_space(layout, sheet)
+    free_rects = analysis["free_rects"]
+    if "components" not in analysis:
+        if "adjacency" not in analysis:
+            analysis["adjacency"] = _rect_adjacency(free_rects)
+        analysis["components"] = _connected_rect_components(free_rects, analysis["adjacency"])
+
+    shapes = []
     rectangles = []
-    for component_indices in _connected_rect_components(free_rects):
+    for component_indices in analysis["components"]:
         component_rects = [free_rects[idx] for idx in component_indices]
         component_polygon = _normalize_polygon_vertices(_polygon_from_rects(component_rects), min_height)
         component_classification = _classify_orthogonal_polygon(component_polygon)
+        shape_limit = component_classification[count_key]
 
-        l_candidates = []
+        xs, ys, filled = _union_cells(component_rects)
+        slabs = _slab_partition(xs, ys, filled, horizontal=True)
+
+        candidates = []
         seen_signatures = set()
-        max_combo_size = min(5, len(component_rects))
-        for combo_size in range(2, max_combo_size + 1):
-            for local_indices in itertools.combinations(range(len(component_rects)), combo_size):
-                rect_group = [component_rects[idx] for idx in local_indices]
-                if not _is_connected_rect_group(rect_group):
-                    continue
-
-                raw_vertices = _polygon_from_rects(rect_group)
-                if len(raw_vertices) < 6:
-                    continue
-                vertices = _normalize_polygon_vertices(raw_vertices, min_height)
-                if not _is_l_shape(vertices):
-                    continue
-                if any(edge < min_height for edge in _edge_lengths(vertices)):
-                    continue
-
-                union_area = sum(rect["w"] * rect["h"] for rect in rect_group)
-                polygon_area = _polygon_area(vertices)
-                if polygon_area > (union_area + 1e-6):
-                    continue
-                if not _polygon_within_rect_union(vertices, rect_group):
-                    continue
-
-                xs = [v[0] for v in vertices]
-                ys = [v[1] for v in vertices]
-                min_x, max_x = min(xs), max(xs)
-                min_y, max_y = min(ys), max(ys)
-                width = max_x - min_x
-                height = max_y - min_y
-                area = union_area
-                if width < min_width or height < min_height or area < min_area:
-                    continue
-
-                signature = tuple(tuple(v) for v in vertices)
-                if signature in seen_signatures:
-                    continue
-                seen_signatures.add(signature)
-
-                l_candidates.append((area, set(local_indices), {
-                    "shape_type": "L",
-                    "x": round(min_x, 2),
-                    "y": round(min_y, 2),
-                    "width": round(width, 2),
-                    "height": round(height, 2),
-                    "area": round(area, 2),
-                    "vertices": vertices,
-                    "source_vertex_count": component_classification["vertex_count"],
-                }))
-
-        l_candidates.sort(key=lambda item: item[0], reverse=True)
-        used = set()
-        selected_l_count = 0
-        for _, candidate_indices, candidate in l_candidates:
-            if selected_l_count >= component_classification["l_shape_count"]:
+        if shape_limit > 0:
+            for pieces in (slabs, _slab_partition(xs, ys, filled, horizontal=False)):
+                for arms in arm_groups(pieces):
+                    raw_vertices = _polygon_from_rects(list(arms))
+                    if len(raw_vertices) < 6:
+                        continue
+                    vertices = _normalize_polygon_vertices(raw_vertices, min_height)
+                    if not is_shape(vertices):
+                        continue
+                    if any(edge < min_height for edge in _edge_lengths(vertices)):
+                        continue
+
+                    area = sum(arm["w"] * arm["h"] for arm in arms)
+                    if _polygon_area(vertices) > (area + 1e-6):
+                        continue
+                    if not _polygon_within_rect_union(vertices, component_rects):
+                        continue
+
+                    vx = [v[0] for v in vertices]
+                    vy = [v[1] for v in vertices]
+                    min_x, max_x = min(vx), max(vx)
+                    min_y, max_y = min(vy), max(vy)
+                    width = max_x - min_x
+                    height = max_y - min_y
+                    if width < min_width or height < min_height or area < min_area:
+                        continue
+
+                    signature = tuple(tuple(v) for v in vertices)
+                    if signature in seen_signatures:
+                        continue
+                    seen_signatures.add(signature)
+
+                    candidates.append((area, arms, {
+                        "shape_type": shape_type,
+                        "x": round(min_x, 2),
+                        "y": round(min_y, 2),
+                        "width": round(width, 2),
+                        "height": round(height, 2),
+                        "area": round(area, 2),
+                        "vertices": vertices,
+                        "source_vertex_count": component_classification["vertex_count"],
+                    }))
+
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        taken = []
+        selected = 0
+        for _, arms, candidate in candidates:
+            if selected >= shape_limit:
                 break
-            if used.intersection(candidate_indices):
+            if any(_intersects(arm, other) for arm in arms for other in taken):
                 continue
-            used.update(candidate_indices)
-            selected_l_count += 1
-            l_shapes.append(candidate)
+            taken.extend(arms)
+            selected += 1
+            shapes.append(candidate)
 
-        remaining_rects = [r for idx, r in enumerate(component_rects) if idx not in used]
+        remaining_rects = slabs
+        for arm in taken:
+            remaining_rects = [piece for rect in remaining_rects for piece in _subtract_rect(rect, arm)]
         if not remaining_rects:
             continue
 
@@ -646,6 +1101,220 @@ def calculate_l_mix_offcuts(layout, sheet, min_width=120.0, min_height=120.0, mi
                     "source_vertex_count": remaining_classification["vertex_count"],
                 })
 
-    result = l_shapes + rectangles
+    result = shapes + rectangles
+    result.sort(key=lambda r: r["area"], reverse=True)
+    return result
+
+
+def calculate_l_mix_offcuts(layout, sheet, min_width=120.0, min_height=120.0, min_area=25000.0):
+    """Split free space into L-shaped and rectangular offcuts.
+
+    Each free-space component is rasterised once onto its compressed grid and
+    partitioned into horizontal and vertical slabs. L candidates are pairs of
+    edge-sharing slabs trimmed to a common side, so the work is bounded by the
+    number of slab adjacencies rather than by rect combinations.
+    """
+    return _shape_mix_offcuts(
+        layout, sheet, "L", "l_shape_count", _l_arm_pairs, _is_l_shape, min_width, min_height, min_area
+    )
+
+
+def calculate_c_mix_offcuts(layout, sheet, min_width=120.0, min_height=120.0, min_area=25000.0):
+    """Split free space into C-shaped and rectangular offcuts.
+
+    Same pipeline as ``calculate_l_mix_offcuts``; C candidates are a spine slab
+    plus the two slabs touching its ends, so the search is bounded by slab
+    adjacency (at most quadratic in the slabs around each spine).
+    """
+    return _shape_mix_offcuts(
+        layout, sheet, "C", "c_shape_count", _c_arm_triples, _is_c_shape, min_width, min_height, min_area
+    )
+
+
+def _open_rect_union(rects, min_width, min_height):
+    """The part of a rect union covered by ``min_width`` x ``min_height`` rects lying inside it.
+
+    A morphological opening on the compressed grid: for each column span the
+    row runs free across the whole span are empty rects, and the union of those
+    at least ``min_width`` x ``min_height`` is the opened region. Kerf channels
+    and slivers narrower than the minimum drop out. Returns column-run rects.
+    """
+    xs, ys, filled = _union_cells(rects)
+    nx, ny = len(xs) - 1, len(ys) - 1
+    if nx <= 0 or ny <= 0:
+        return []
+    grid = np.zeros((nx, ny), dtype=bool)
+    for ix, iy in filled:
+        grid[ix, iy] = True
+
+    kept = np.zeros_like(grid)
+    for i in range(nx):
+        rows = grid[i].copy()
+        for j in range(i, nx):
+            if j > i:
+                rows &= grid[j]
+            if not rows.any():
+                break
+            if xs[j + 1] - xs[i] < min_width - 1e-9:
+                continue
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], rows.view(np.int8), [0]))))
+            for start, stop in zip(edges[0::2], edges[1::2]):
+                if ys[stop] - ys[start] >= min_height - 1e-9:
+                    kept[i:j + 1, start:stop] = True
+
+    opened = []
+    for ix in range(nx):
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], kept[ix].view(np.int8), [0]))))
+        for start, stop in zip(edges[0::2], edges[1::2]):
+            opened.append({"x": xs[ix], "y": ys[start], "w": xs[ix + 1] - xs[ix], "h": ys[stop] - ys[start]})
+    return opened
+
+
+def calculate_polygon_max_offcuts(layout, sheet, min_width=120.0, min_height=120.0, min_area=25000.0):
+    """Each usable free-space region as one orthogonal polygon, with islands of parts as holes.
+
+    Free space is first opened by the minimum offcut size (``_open_rect_union``),
+    so kerf channels between parts are not part of any offcut and a hole whose
+    surrounding band is thinner than the minimum opens into the outline. The
+    outline is the sweep-line union boundary of what remains; ``area`` is the
+    outline area minus its holes.
+    """
+    analysis = analyze_sheet_free_space(layout, sheet)
+    opened = _open_rect_union(analysis["free_rects"], min_width, min_height)
+    result = []
+    for outer, holes in _union_boundary_loops(opened):
+        vertices = _simplify_loop(outer)
+        if not vertices:
+            continue
+        hole_loops = [loop for loop in (_simplify_loop(hole) for hole in holes) if loop]
+
+        vx = [v[0] for v in vertices]
+        vy = [v[1] for v in vertices]
+        min_x, min_y = min(vx), min(vy)
+        width = max(vx) - min_x
+        height = max(vy) - min_y
+        area = _signed_area(outer) + sum(_signed_area(hole) for hole in holes)
+        if width < min_width or height < min_height or area < min_area:
+            continue
+
+        result.append({
+            "shape_type": "POLYGON",
+            "x": round(min_x, 2),
+            "y": round(min_y, 2),
+            "width": round(width, 2),
+            "height": round(height, 2),
+            "area": round(area, 2),
+            "vertices": vertices,
+            "holes": hole_loops,
+            "source_vertex_count": len(vertices),
+        })
+
     result.sort(key=lambda r: r["area"], reverse=True)
     return result
+
+
+def _shape_totals(candidates):
+    totals = {}
+    for candidate in candidates:
+        shape = str(candidate.get("shape_type", "RECT") or "RECT").upper()
+        bucket = totals.setdefault(shape, {"count": 0, "area": 0.0})
+        bucket["count"] += 1
+        bucket["area"] += _safe_float(candidate.get("area"), 0.0)
+    return totals
+
+
+def _analyze_sheet_offcuts(task):
+    layout, sheet, min_width, min_height, min_area, cell_size = task
+    offcuts = calculate_sheet_offcuts(layout, sheet, min_width=min_width, min_height=min_height, min_area=min_area)
+    l_mix = calculate_l_mix_offcuts(layout, sheet, min_width=min_width, min_height=min_height, min_area=min_area)
+    grid = build_sheet_usage_grid(layout, sheet, cell_size=cell_size)
+    return {
+        "sheet_index": int(sheet.get("sheet_index", 0)),
+        "offcut_id": sheet.get("offcut_id"),
+        "interior_area": offcuts["interior_area"],
+        "used_area": offcuts["used_area"],
+        "waste_area": offcuts["waste_area"],
+        "utilization_pct": offcuts["utilization_pct"],
+        "strategies": {
+            "Rectangles": offcuts["reusable_offcuts"],
+            "L-shape mix": l_mix,
+            "C-shape mix": calculate_c_mix_offcuts(
+                layout, sheet, min_width=min_width, min_height=min_height, min_area=min_area
+            ),
+            "Polygon-max": calculate_polygon_max_offcuts(
+                layout, sheet, min_width=min_width, min_height=min_height, min_area=min_area
+            ),
+        },
+        "usage_grid": grid,
+    }
+
+
+def _summary_row(result):
+    row = {
+        "sheet": f"Sheet {result['sheet_index'] + 1}",
+        "utilization_pct": result["utilization_pct"],
+        "used_area": result["used_area"],
+        "waste_area": result["waste_area"],
+    }
+    for strategy, candidates in result["strategies"].items():
+        prefix = strategy.lower().replace("-", "_").replace(" ", "_")
+        row[f"{prefix}_count"] = len(candidates)
+        row[f"{prefix}_area"] = round(sum(_safe_float(c.get("area"), 0.0) for c in candidates), 2)
+        for shape, bucket in sorted(_shape_totals(candidates).items()):
+            row[f"{prefix}_{shape.lower()}_count"] = bucket["count"]
+            row[f"{prefix}_{shape.lower()}_area"] = round(bucket["area"], 2)
+    return row
+
+
+NEST_POOL_MIN_SHEETS = 8
+
+
+def analyze_nest_offcuts(
+    layout,
+    min_width=120.0,
+    min_height=120.0,
+    min_area=25000.0,
+    cell_size=100.0,
+    max_workers=1,
+    min_pool_sheets=NEST_POOL_MIN_SHEETS,
+):
+    """Offcut and heatmap analysis for every sheet with parts, plus per-sheet and total summaries.
+
+    Runs in this process by default, which is what the app wants: no child
+    processes forked from the server, and the memoised free-space analysis is
+    shared with the per-sheet views. Batch callers can pass ``max_workers``
+    (``None`` for one per CPU) to use a ``spawn`` process pool once there are
+    at least ``min_pool_sheets`` sheets.
+    """
+    settings = {key: value for key, value in layout.items() if key != "sheets"}
+    sheets = [sheet for sheet in layout.get("sheets", []) if sheet.get("parts")]
+    tasks = [(settings, sheet, min_width, min_height, min_area, cell_size) for sheet in sheets]
+
+    workers = max_workers if max_workers is not None else min(len(tasks), os.cpu_count() or 1)
+    results = None
+    if workers > 1 and len(tasks) >= max(2, min_pool_sheets):
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                results = list(pool.map(_analyze_sheet_offcuts, tasks))
+        except (OSError, RuntimeError, pickle.PicklingError):
+            results = None
+    if results is None:
+        results = [_analyze_sheet_offcuts(task) for task in tasks]
+
+    summary = [_summary_row(result) for result in results]
+    columns = list(dict.fromkeys(key for row in summary for key in row))
+    summary = [{key: row.get(key, 0) for key in columns} for row in summary]
+    interior_area = sum(result["interior_area"] for result in results)
+    used_area = sum(result["used_area"] for result in results)
+    totals = {
+        "sheet_count": len(results),
+        "interior_area": round(interior_area, 2),
+        "used_area": round(used_area, 2),
+        "waste_area": round(sum(result["waste_area"] for result in results), 2),
+        "utilization_pct": round((used_area / interior_area * 100.0), 2) if interior_area > 0 else 0.0,
+    }
+    for key in columns:
+        if key.endswith(("_count", "_area")) and key not in totals:
+            totals[key] = round(sum(row[key] for row in summary), 2)
+
+    return {"sheets": results, "summary": summary, "totals": totals}
@@ -1,6 +1,18 @@
 import unittest
 
-from manual_layout import build_indexed_part_labels, can_place, move_part, rotate_part_90
+from offcut_utils import calculate_sheet_offcuts
+
+from manual_layout import (
+    build_indexed_part_labels,
+    build_part_label_index,
+    can_place,
+    compact_sheet,
+    move_part,
+    relocate_part_label,
+    rotate_part_90,
+    sheet_part_labels,
+    validate_layout,
+)
 
 
 class ManualLayoutTests(unittest.TestCase):
@@ -62,11 +74,125 @@ class ManualLayoutTests(unittest.TestCase):
         self.assertEqual(labels_sheet_1["S2-P1"], "Bed Side 3")
         self.assertEqual(labels_sheet_1["S2-P2"], "End Panel")
 
+    def test_part_label_index_matches_per_sheet_labels(self):
+        layout = {
+            "sheets": [
+                {"sheet_index": 0, "parts": [{"id": "S1-P1", "rid": "Bed Side"}, {"id": "S1-P2", "rid": "Shelf"}]},
+                {"sheet_index": 1, "parts": [{"id": "S2-P1", "rid": "Bed Side"}, {"id": "S2-P2", "rid": "End Panel"}]},
+            ]
+        }
+        index = build_part_label_index(layout)
+        for sheet_index in range(2):
+            self.assertEqual(sheet_part_labels(index, layout, sheet_index), build_indexed_part_labels(layout, sheet_index))
+
+    def test_relocate_part_label_renumbers_like_a_rebuild(self):
+        layout = {
+            "sheets": [
+                {"sheet_index": 0, "parts": [{"id": "S1-P1", "rid": "Bed Side"}]},
+                {"sheet_index": 1, "parts": [{"id": "S2-P1", "rid": "Bed Side"}, {"id": "S2-P2", "rid": "Shelf"}]},
+                {"sheet_index": 2, "parts": [{"id": "S3-P1", "rid": "Bed Side"}]},
+            ]
+        }
+        index = build_part_label_index(layout)
+
+        moved = layout["sheets"][2]["parts"].pop()
+        layout["sheets"][0]["parts"].append(moved)
+        relocate_part_label(index, "S3-P1", 0)
+
+        self.assertEqual(index["labels"], build_part_label_index(layout)["labels"])
+        self.assertEqual(sheet_part_labels(index, layout, 0), {"S1-P1": "Bed Side 1", "S3-P1": "Bed Side 2"})
+        self.assertEqual(sheet_part_labels(index, layout, 1)["S2-P1"], "Bed Side 3")
+
     def test_can_place_accepts_valid_gap(self):
         rect = {"x": 130.0, "y": 20.0, "w": 50.0, "h": 50.0}
         ok, _ = can_place(rect, self.layout["sheets"][0]["parts"], "A", 1000, 500, 10, 7)
         self.assertTrue(ok)
 
+    def _scattered_layout(self):
+        return {
+            "sheet_w": 1000.0,
+            "sheet_h": 600.0,
+            "margin": 10.0,
+            "kerf": 7.0,
+            "sheets": [
+                {
+                    "sheet_index": 0,
+                    "parts": [
+                        {"id": "A", "rid": "A", "x": 300.0, "y": 250.0, "w": 200.0, "h": 100.0, "rotated": False},
+                        {"id": "B", "rid": "B", "x": 700.0, "y": 400.0, "w": 150.0, "h": 150.0, "rotated": False},
+                        {"id": "C", "rid": "C", "x": 80.0, "y": 460.0, "w": 120.0, "h": 80.0, "rotated": False},
+                    ],
+                }
+            ],
+        }
+
+    def test_compact_sheet_packs_toward_bottom_left(self):
+        layout = self._scattered_layout()
+        updated, ok, msg = compact_sheet(layout, 0)
+        self.assertTrue(ok, msg)
+        parts = {p["id"]: p for p in updated["sheets"][0]["parts"]}
+        self.assertEqual((parts["C"]["x"], parts["C"]["y"]), (10.0, 10.0))
+        self.assertEqual((parts["A"]["x"], parts["A"]["y"]), (10.0 + 120.0 + 7.0, 10.0))
+        self.assertEqual((parts["B"]["x"], parts["B"]["y"]), (137.0 + 200.0 + 7.0, 10.0))
+        self.assertEqual(layout["sheets"][0]["parts"][0]["x"], 300.0)
+
+    def test_compact_sheet_toward_top_right_respects_margin_and_kerf(self):
+        layout = self._scattered_layout()
+        updated, ok, msg = compact_sheet(layout, 0, corner="top-right")
+        self.assertTrue(ok, msg)
+        parts = {p["id"]: p for p in updated["sheets"][0]["parts"]}
+        self.assertEqual(parts["B"]["x"] + parts["B"]["w"], 990.0)
+        self.assertEqual(parts["B"]["y"] + parts["B"]["h"], 590.0)
+        for part in parts.values():
+            others = [p for p in parts.values() if p["id"] != part["id"]]
+            ok, _ = can_place(part, others, part["id"], 1000.0, 600.0, 10.0, 7.0)
+            self.assertTrue(ok)
+
+    def test_compact_sheet_grows_largest_offcut(self):
+        layout = self._scattered_layout()
+        before = calculate_sheet_offcuts(layout, layout["sheets"][0])["reusable_offcuts"]
+        updated, ok, _ = compact_sheet(layout, 0)
+        self.assertTrue(ok)
+        after = calculate_sheet_offcuts(updated, updated["sheets"][0])["reusable_offcuts"]
+        self.assertGreater(after[0]["area"], before[0]["area"])
+
+    def test_compact_sheet_rejects_unknown_corner(self):
+        with self.assertRaises(ValueError):
+            compact_sheet(self.layout, 0, corner="middle")
+
+    def test_validate_layout_accepts_valid_layout(self):
+        self.assertEqual(validate_layout(self.layout), [])
+
+    def test_validate_layout_reports_every_violation_type(self):
+        parts = self.layout["sheets"][0]["parts"]
+        parts.extend(
+            [
+                {"id": "C", "rid": "C", "x": 250.0, "y": 40.0, "w": 100.0, "h": 50.0},
+                {"id": "D", "rid": "D", "x": 500.0, "y": 4.0, "w": 100.0, "h": 50.0},
+                {"id": "E", "rid": "E", "x": 950.0, "y": 100.0, "w": 100.0, "h": 50.0},
+                {"id": "F", "rid": "F", "x": 124.0, "y": 200.0, "w": 50.0, "h": 50.0},
+                {"id": "G", "rid": "G", "x": 20.0, "y": 200.0, "w": 100.0, "h": 50.0},
+            ]
+        )
+        found = {(v["type"], tuple(sorted(v["part_ids"]))) for v in validate_layout(self.layout)}
+        self.assertEqual(
+            found,
+            {
+                ("overlap", ("B", "C")),
+                ("margin", ("D",)),
+                ("out_of_sheet", ("E",)),
+                ("kerf", ("F", "G")),
+            },
+        )
+
+    def test_validate_layout_reports_sheet_index(self):
+        self.layout["sheets"].append(
+            {"sheet_index": 1, "parts": [{"id": "X", "rid": "X", "x": 0.0, "y": 0.0, "w": 10.0, "h": 10.0}]}
+        )
+        violations = validate_layout(self.layout)
+        self.assertEqual([v["sheet_index"] for v in violations], [1])
+        self.assertIn("Sheet 2", violations[0]["message"])
+
 
 if __name__ == "__main__":
     unittest.main()
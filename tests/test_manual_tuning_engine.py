@@ -1,6 +1,24 @@
 import unittest
 
-from manual_tuning_engine import can_place_part_at, compute_position_grid, compute_visual_guide_grid, legal_bounds, move_part_to
+import json
+
+from manual_tuning_engine import (
+    align_parts,
+    build_canvas_sheet_sync,
+    can_place_part_at,
+    compute_position_grid,
+    compute_visual_guide_grid,
+    distribute_parts,
+    encode_guide_grid,
+    legal_bounds,
+    move_part_to,
+    move_parts,
+    nearest_legal_position,
+    rotate_parts_90,
+    sheet_free_space_index,
+    snap_part_to_legal,
+    transfer_part,
+)
 
 
 class ManualTuningEngineTests(unittest.TestCase):
@@ -72,6 +90,199 @@ class ManualTuningEngineTests(unittest.TestCase):
         self.assertTrue(any(r["is_legal"] for r in rows))
         self.assertTrue(any(not r["is_legal"] for r in rows))
 
+    def test_encode_guide_grid_round_trips_cells(self):
+        rows = compute_visual_guide_grid(self.layout, 0, "A", 100.0)
+        grid = encode_guide_grid(rows)
+
+        cols = len(grid["xs"]) - 1
+        decoded = []
+        for code, count in zip(grid["runs"][0::2], grid["runs"][1::2]):
+            decoded.extend([code] * count)
+        self.assertEqual(len(decoded), len(rows))
+        for row in rows:
+            idx = grid["ys"].index(row["y"]) * cols + grid["xs"].index(row["x"])
+            self.assertEqual(decoded[idx] == 0, row["is_legal"])
+            self.assertEqual(grid["legend"][decoded[idx]], row["reason"])
+        self.assertEqual(grid["legal_count"], sum(1 for r in rows if r["is_legal"]))
+        self.assertEqual(grid["legal_count"] + grid["blocked_count"], len(rows))
+
+    def test_encode_guide_grid_is_much_smaller_than_rows(self):
+        rows = compute_visual_guide_grid(self.layout, 0, "A", 10.0)
+        grid = encode_guide_grid(rows)
+        self.assertLess(len(json.dumps(grid)) * 10, len(json.dumps(rows)))
+
+    def test_encode_guide_grid_empty(self):
+        grid = encode_guide_grid([])
+        self.assertEqual(grid["runs"], [])
+        self.assertEqual(grid["legal_count"], 0)
+
+    def test_canvas_sheet_sync_sends_full_sheet_first(self):
+        payload, snapshot = build_canvas_sheet_sync(self.layout, 0, part_labels={"A": "A 1"})
+        self.assertEqual(payload["mode"], "full")
+        self.assertEqual(payload["version"], 1)
+        self.assertEqual([p["id"] for p in payload["parts"]], ["A", "B"])
+        self.assertEqual(payload["parts"][0]["label"], "A 1")
+        self.assertEqual(payload["meta"]["kerf"], 7.0)
+        self.assertEqual(snapshot["version"], 1)
+
+    def test_canvas_sheet_sync_sends_only_changed_parts(self):
+        _, snapshot = build_canvas_sheet_sync(self.layout, 0)
+        updated, ok, _ = move_part_to(self.layout, 0, "A", 300.0, 100.0)
+        self.assertTrue(ok)
+
+        payload, next_snapshot = build_canvas_sheet_sync(updated, 0, previous=snapshot)
+
+        self.assertEqual(payload["mode"], "delta")
+        self.assertEqual(payload["base_version"], 1)
+        self.assertEqual(payload["version"], 2)
+        self.assertEqual([p["id"] for p in payload["upserts"]], ["A"])
+        self.assertEqual(payload["removed"], [])
+        self.assertIsNone(payload["order"])
+        self.assertNotIn("parts", payload)
+        self.assertEqual(next_snapshot["version"], 2)
+
+    def test_canvas_sheet_sync_unchanged_sheet_keeps_version(self):
+        _, snapshot = build_canvas_sheet_sync(self.layout, 0)
+        payload, _ = build_canvas_sheet_sync(self.layout, 0, previous=snapshot)
+        self.assertEqual(payload["version"], payload["base_version"])
+        self.assertEqual(payload["upserts"], [])
+
+    def test_canvas_sheet_sync_reports_removed_parts(self):
+        _, snapshot = build_canvas_sheet_sync(self.layout, 0)
+        self.layout["sheets"][0]["parts"].pop()
+        payload, _ = build_canvas_sheet_sync(self.layout, 0, previous=snapshot)
+        self.assertEqual(payload["removed"], ["B"])
+        self.assertEqual(payload["order"], ["A"])
+
+    def _parts_by_id(self, layout):
+        return {p["id"]: p for p in layout["sheets"][0]["parts"]}
+
+    def test_move_parts_moves_group_as_one_edit(self):
+        updated, ok, _ = move_parts(self.layout, 0, ["A", "B"], 0.0, 100.0)
+        self.assertTrue(ok)
+        parts = self._parts_by_id(updated)
+        self.assertEqual(parts["A"]["y"], 120.0)
+        self.assertEqual(parts["B"]["y"], 120.0)
+        self.assertEqual(self.layout["sheets"][0]["parts"][0]["y"], 20.0)
+
+    def test_move_parts_rejects_whole_group_on_conflict(self):
+        self.layout["sheets"][0]["parts"].append(
+            {"id": "C", "rid": "C", "x": 400.0, "y": 20.0, "w": 100.0, "h": 50.0, "rotated": False}
+        )
+        updated, ok, msg = move_parts(self.layout, 0, ["A", "B"], 150.0, 0.0)
+        self.assertFalse(ok)
+        self.assertIn("kerf", msg.lower())
+        self.assertIs(updated, self.layout)
+
+    def test_move_parts_rejects_margin_breach(self):
+        updated, ok, msg = move_parts(self.layout, 0, ["A", "B"], 0.0, -15.0)
+        self.assertFalse(ok)
+        self.assertIn("bounds", msg.lower())
+
+    def test_align_parts_top_edges(self):
+        self.layout["sheets"][0]["parts"][1].update({"y": 200.0, "h": 80.0})
+        updated, ok, _ = align_parts(self.layout, 0, ["A", "B"], "top")
+        self.assertTrue(ok)
+        parts = self._parts_by_id(updated)
+        self.assertEqual(parts["A"]["y"] + parts["A"]["h"], 280.0)
+        self.assertEqual(parts["B"]["y"] + parts["B"]["h"], 280.0)
+
+    def test_distribute_parts_uses_kerf_gap(self):
+        updated, ok, _ = distribute_parts(self.layout, 0, ["A", "B"], axis="x")
+        self.assertTrue(ok)
+        parts = self._parts_by_id(updated)
+        self.assertEqual(parts["B"]["x"], parts["A"]["x"] + parts["A"]["w"] + 7.0)
+
+    def test_rotate_parts_90_rotates_block(self):
+        updated, ok, _ = rotate_parts_90(self.layout, 0, ["A", "B"])
+        self.assertTrue(ok)
+        parts = self._parts_by_id(updated)
+        self.assertEqual((parts["A"]["w"], parts["A"]["h"]), (50.0, 100.0))
+        self.assertTrue(parts["A"]["rotated"])
+        self.assertEqual((parts["A"]["x"], parts["A"]["y"]), (20.0, 20.0))
+        self.assertEqual((parts["B"]["x"], parts["B"]["y"]), (20.0, 200.0))
+
+    def test_group_ops_report_missing_parts(self):
+        updated, ok, msg = move_parts(self.layout, 0, ["A", "Z"], 1.0, 0.0)
+        self.assertFalse(ok)
+        self.assertEqual(msg, "Part not found")
+
+    def test_nearest_legal_position_clears_kerf_by_shortest_move(self):
+        self.assertEqual(nearest_legal_position(self.layout, 0, "A", 150.0, 30.0), (150.0, 77.0))
+
+    def test_nearest_legal_position_clamps_out_of_bounds_drop(self):
+        self.assertEqual(nearest_legal_position(self.layout, 0, "A", 950.0, 20.0), (890.0, 20.0))
+
+    def test_nearest_legal_position_returns_none_when_no_room(self):
+        self.layout["sheets"][0]["parts"][1].update({"x": 10.0, "y": 10.0, "w": 980.0, "h": 480.0})
+        self.assertIsNone(nearest_legal_position(self.layout, 0, "A", 20.0, 20.0))
+
+    def test_snap_part_to_legal_moves_to_nearest_spot(self):
+        updated, ok, msg = snap_part_to_legal(self.layout, 0, "A", 150.0, 30.0)
+        self.assertTrue(ok)
+        self.assertIn("nearest legal", msg)
+        moved = updated["sheets"][0]["parts"][0]
+        self.assertEqual((moved["x"], moved["y"]), (150.0, 77.0))
+
+    def test_snap_part_to_legal_keeps_legal_drop(self):
+        updated, ok, msg = snap_part_to_legal(self.layout, 0, "A", 500.0, 200.0)
+        self.assertTrue(ok)
+        self.assertEqual(msg, "Moved")
+
+    def _two_sheet_layout(self):
+        self.layout["sheets"].append(
+            {
+                "sheet_index": 1,
+                "parts": [
+                    {"id": "C", "rid": "C(G)", "x": 10.0, "y": 10.0, "w": 60.0, "h": 300.0, "rotated": False},
+                ],
+            }
+        )
+        return self.layout
+
+    def test_sheet_free_space_index_fits_part_at_kerf_distance(self):
+        free = sheet_free_space_index(self.layout, 0)
+        right_of_b = [r for r in free if r["x"] == 307.0]
+        self.assertEqual(len(right_of_b), 1)
+        self.assertEqual(right_of_b[0]["w"], 1000.0 - 10.0 + 7.0 - 307.0)
+
+    def test_transfer_part_empties_source_sheet(self):
+        layout = self._two_sheet_layout()
+        updated, ok, msg = transfer_part(layout, 1, "C", 0)
+        self.assertTrue(ok, msg)
+        self.assertEqual(updated["sheets"][1]["parts"], [])
+        self.assertIn("now empty", msg)
+        moved = updated["sheets"][0]["parts"][-1]
+        self.assertEqual(moved["id"], "C")
+        self.assertFalse(moved["rotated"])
+        ok, _ = can_place_part_at(updated, 0, "C", moved["x"], moved["y"])
+        self.assertTrue(ok)
+        self.assertEqual(len(layout["sheets"][1]["parts"]), 1)
+
+    def test_transfer_part_rotates_flexible_part_to_fit(self):
+        layout = self._two_sheet_layout()
+        layout["sheets"][1]["parts"][0].update({"rid": "C", "w": 960.0, "h": 400.0})
+        layout["sheets"][0]["parts"][1].update({"w": 60.0, "h": 200.0})
+        updated, ok, msg = transfer_part(layout, 0, "B", 1)
+        self.assertTrue(ok, msg)
+        moved = updated["sheets"][1]["parts"][-1]
+        self.assertEqual((moved["w"], moved["h"]), (200.0, 60.0))
+        self.assertTrue(moved["rotated"])
+
+    def test_transfer_part_keeps_grain_locked_orientation(self):
+        layout = self._two_sheet_layout()
+        layout["sheets"][1]["parts"][0].update({"w": 960.0, "h": 400.0})
+        layout["sheets"][0]["parts"][1].update({"rid": "B(G)", "w": 60.0, "h": 200.0})
+        updated, ok, msg = transfer_part(layout, 0, "B", 1)
+        self.assertFalse(ok)
+        self.assertIs(updated, layout)
+
+    def test_transfer_part_any_sheet_skips_source(self):
+        layout = self._two_sheet_layout()
+        updated, ok, _ = transfer_part(layout, 0, "A")
+        self.assertTrue(ok)
+        self.assertEqual([p["id"] for p in updated["sheets"][1]["parts"]], ["C", "A"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -4,7 +4,10 @@ import zipfile
 
 import ezdxf
 
+from manual_layout import initialize_layout_from_packer
 from nest_storage import build_nest_payload, build_sheet_boring_points, create_cix_zip, parse_nest_payload, payload_to_dxf, dxf_to_payload, cix_to_payload, nest_file_to_payload
+from nesting_engine import run_smart_nesting
+from panel_utils import normalize_panels
 
 
 class NestStorageTests(unittest.TestCase):
@@ -25,6 +28,21 @@ class NestStorageTests(unittest.TestCase):
         self.assertEqual(len(parsed["panels"]), 2)
         self.assertIn("packed_sheets", payload)
         self.assertEqual(parsed["machine_type"], "Flat Bed")
+        self.assertEqual(parsed["layout_violations"], [])
+
+    def test_parse_flags_invalid_packed_sheets(self):
+        panels = [{"Label": "Panel", "Width": 600, "Length": 800, "Qty": 3, "Grain?": False, "Material": "Ply"}]
+        packer = run_smart_nesting(normalize_panels(panels), 2440, 1220, 10, 6)
+        manual_layout = initialize_layout_from_packer(packer, 10, 6, 2440, 1220)
+        payload = build_nest_payload("Kerf Job", 2440, 1220, 10, 6, panels, manual_layout=manual_layout)
+        parsed = parse_nest_payload(payload)
+        self.assertEqual(parsed["layout_violations"], [])
+
+        parts = payload["packed_sheets"][0]["parts"]
+        parts[1]["x"] = parts[0]["x"] + parts[0]["w"] + 2.0
+        parts[1]["y"] = parts[0]["y"]
+        parsed = parse_nest_payload(payload)
+        self.assertIn("kerf", [v["type"] for v in parsed["layout_violations"]])
 
     def test_selco_machine_type_round_trip(self):
         payload = build_nest_payload(
@@ -0,0 +1,80 @@
+import random
+import unittest
+
+from offcut_index import StockIndex, offcut_label
+
+
+def _row(offcut_id, w, h, material="MDF", thickness=18.0, status="IN_STOCK"):
+    return {
+        "offcut_id": offcut_id,
+        "status": status,
+        "material": material,
+        "thickness_mm": thickness,
+        "bbox_w_mm": w,
+        "bbox_h_mm": h,
+        "area_mm2": w * h,
+    }
+
+
+class StockIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.index = StockIndex([
+            _row("A", 600, 300),
+            _row("B", 300, 600),
+            _row("C", 1000, 800),
+            _row("D", 900, 900, material="Ply"),
+            _row("E", 1200, 1200, status="USED"),
+            _row("F", 400, 400, status=""),
+        ])
+
+    def test_query_filters_by_fit_material_and_status(self):
+        result = self.index.query(min_w=500, min_h=250, material="MDF")
+
+        self.assertEqual([row["offcut_id"] for row in result["rows"]], ["A", "B", "C"])
+        self.assertEqual(result["total"], 3)
+
+    def test_query_without_rotation_uses_bbox_orientation(self):
+        result = self.index.query(min_w=500, min_h=250, material="MDF", allow_rotate=False)
+
+        self.assertEqual([row["offcut_id"] for row in result["rows"]], ["A", "C"])
+
+    def test_blank_status_counts_as_in_stock(self):
+        ids = [row["offcut_id"] for row in self.index.query(page_size=10)["rows"]]
+
+        self.assertIn("F", ids)
+        self.assertNotIn("E", ids)
+        self.assertEqual(self.index.materials(), ["MDF", "Ply"])
+
+    def test_query_pages_smallest_area_first(self):
+        first = self.index.query(page=0, page_size=2)
+        last = self.index.query(page=9, page_size=2)
+
+        self.assertEqual([row["offcut_id"] for row in first["rows"]], ["F", "A"])
+        self.assertEqual((first["pages"], last["page"]), (3, 2))
+        self.assertEqual([row["offcut_id"] for row in last["rows"]], ["D"])
+
+    def test_get_keeps_order_and_drops_unavailable_ids(self):
+        rows = self.index.get(["C", "E", "missing", "A"], statuses=("IN_STOCK",))
+
+        self.assertEqual([row["offcut_id"] for row in rows], ["C", "A"])
+        self.assertEqual(len(self.index.get(["E"])), 1)
+        self.assertTrue(offcut_label(rows[0]).startswith("C · MDF · 1000 x 800 mm"))
+
+    def test_query_matches_linear_scan(self):
+        rng = random.Random(7)
+        rows = [
+            _row(f"R{i}", rng.randint(100, 2000), rng.randint(100, 2000), material=rng.choice(["MDF", "Ply"]),
+                 thickness=rng.choice([12.0, 18.0]), status=rng.choice(["IN_STOCK", "USED", ""]))
+            for i in range(300)
+        ]
+        index = StockIndex(rows)
+        for _ in range(50):
+            w, h = rng.randint(0, 1500), rng.randint(0, 1500)
+            expected = {
+                row["offcut_id"] for row in rows
+                if row["material"] == "MDF" and row["thickness_mm"] == 18.0 and row["status"] in ("IN_STOCK", "")
+                and min(row["bbox_w_mm"], row["bbox_h_mm"]) >= min(w, h)
+                and max(row["bbox_w_mm"], row["bbox_h_mm"]) >= max(w, h)
+            }
+            result = index.query(min_w=w, min_h=h, material="MDF", thickness_mm=18, page_size=1000)
+            self.assertEqual({row["offcut_id"] for row in result["rows"]}, expected)
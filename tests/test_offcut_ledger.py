@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta, timezone
+import time
+import unittest
+
+from offcut_ledger import StockLedger, TableEventLog, apply_event, replay_events
+from offcut_store import OffcutStore, StockReconciler
+
+T0 = datetime(2026, 4, 12, 14, 0, tzinfo=timezone.utc)
+
+
+def _event(event_id, offcut_id, event_type, minute, payload="{}"):
+    return {
+        "event_id": event_id,
+        "offcut_id": offcut_id,
+        "event_type": event_type,
+        "event_at_utc": (T0 + timedelta(minutes=minute)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "job_id": "",
+        "user": "app",
+        "payload_json": payload,
+    }
+
+
+def _tables(*extra_inventory):
+    return {
+        "offcut_inventory": [
+            {"offcut_id": "A", "status": "IN_STOCK", "material": "MDF"},
+            {"offcut_id": "B", "status": "IN_STOCK", "material": "MDF"},
+            *extra_inventory,
+        ],
+        "offcut_events": [
+            _event("EV-1", "A", "CREATED", 0),
+            _event("EV-2", "B", "CREATED", 0),
+            _event("EV-3", "A", "RESERVED", 5),
+            _event("EV-4", "B", "CONSUMED", 6),
+            _event("EV-5", "A", "RELEASED", 7),
+            _event("EV-6", "A", "EDITED", 8, '{"location": "Rack 2", "offcut_id": "Z"}'),
+        ],
+    }
+
+
+class ReplayTests(unittest.TestCase):
+    def test_replay_follows_event_time_not_row_order(self):
+        events = _tables()["offcut_events"]
+        states, rejected = replay_events({}, list(reversed(events)))
+
+        self.assertEqual(states["A"]["status"], "IN_STOCK")
+        self.assertEqual(states["A"]["fields"], {"location": "Rack 2"})
+        self.assertEqual(states["B"]["status"], "USED")
+        self.assertEqual(rejected, [])
+
+    def test_invalid_transitions_are_rejected(self):
+        used = {"status": "USED", "fields": {}}
+
+        self.assertIsNone(apply_event(used, _event("EV-9", "B", "RESERVED", 9)))
+        self.assertIsNone(apply_event(None, _event("EV-9", "B", "BOGUS", 9)))
+        self.assertEqual(apply_event(None, _event("EV-9", "C", "RESERVED", 9))["status"], "RESERVED")
+        self.assertIsNone(apply_event(None, _event("EV-9", "C", "RESERVED", 9, '{"prior_status": "USED"}')))
+
+
+class StockLedgerContract:
+    def make_log(self, *extra_inventory):
+        raise NotImplementedError
+
+    def inventory_statuses(self, log):
+        raise NotImplementedError
+
+    def test_refresh_writes_replayed_status_to_inventory(self):
+        log = self.make_log()
+        state = StockLedger(log).refresh()
+
+        self.assertEqual(self.inventory_statuses(log), {"A": "IN_STOCK", "B": "USED"})
+        self.assertEqual(state["changed"], 2)
+
+    def test_record_validates_against_current_state(self):
+        log = self.make_log()
+        ledger = StockLedger(log)
+        ledger.record(["A"], "reserved", at=T0 + timedelta(minutes=10))
+
+        with self.assertRaises(ValueError):
+            ledger.record(["A", "B"], "RESERVED", at=T0 + timedelta(minutes=11))
+        self.assertEqual(ledger.statuses(), {"A": "RESERVED", "B": "USED"})
+        self.assertEqual(ledger.state()["pending"], 7)
+
+    def test_event_less_rows_start_from_their_inventory_status(self):
+        log = self.make_log(
+            {"offcut_id": "C", "status": "USED", "material": "MDF"},
+            {"offcut_id": "D", "status": "scrapped", "material": "MDF"},
+            {"offcut_id": "E", "status": "", "material": "MDF"},
+        )
+        ledger = StockLedger(log)
+
+        for offcut_id in ("C", "D"):
+            with self.assertRaises(ValueError):
+                ledger.record([offcut_id], "RESERVED", at=T0 + timedelta(minutes=10))
+        ledger.record(["C"], "EDITED", payload={"location": "Skip"}, at=T0 + timedelta(minutes=11))
+        ledger.record(["E"], "RESERVED", at=T0 + timedelta(minutes=12))
+        ledger.refresh()
+
+        statuses = self.inventory_statuses(log)
+        self.assertEqual((statuses["C"], statuses["D"], statuses["E"]), ("USED", "scrapped", "RESERVED"))
+        self.assertEqual(StockLedger(log).statuses()["C"], "USED")
+
+    def test_compact_folds_settled_events_into_snapshot(self):
+        log = self.make_log()
+        ledger = StockLedger(log, settle_s=60.0)
+        before = ledger.statuses()
+
+        snapshot = ledger.compact(now=T0 + timedelta(minutes=8, seconds=30))
+
+        self.assertEqual(snapshot["mark"][1], "EV-5")
+        self.assertEqual([e["event_id"] for e in log.events_after(snapshot["mark"])], ["EV-6"])
+        self.assertEqual(ledger.statuses(), before)
+        self.assertEqual(ledger.state()["offcuts"]["A"]["fields"], {"location": "Rack 2"})
+        self.assertIsNone(ledger.compact(now=T0 + timedelta(minutes=8, seconds=30)))
+
+    def test_refresh_compacts_once_enough_events_pile_up(self):
+        log = self.make_log()
+        state = StockLedger(log, snapshot_every=6, settle_s=0.0).refresh(now=T0 + timedelta(hours=1))
+
+        self.assertEqual(state["pending"], 0)
+        self.assertEqual(state["mark"][1], "EV-6")
+        self.assertEqual(self.inventory_statuses(log), {"A": "IN_STOCK", "B": "USED"})
+
+
+class TableEventLogTests(StockLedgerContract, unittest.TestCase):
+    def make_log(self, *extra_inventory):
+        return TableEventLog(_tables(*extra_inventory))
+
+    def inventory_statuses(self, log):
+        return {row["offcut_id"]: row["status"] for row in log.tables["offcut_inventory"]}
+
+
+class OffcutStoreLedgerTests(StockLedgerContract, unittest.TestCase):
+    def make_log(self, *extra_inventory):
+        store = OffcutStore()
+        store.upsert_rows(_tables(*extra_inventory))
+        return store
+
+    def inventory_statuses(self, log):
+        return {row["offcut_id"]: row["status"] for row in log.query_inventory()}
+
+    def test_reconcile_keeps_compacted_events_out(self):
+        store = self.make_log()
+        StockLedger(store, settle_s=0.0).compact(now=T0 + timedelta(hours=1))
+        time.sleep(0.01)
+
+        store.reconcile(_tables(), time.time())
+
+        self.assertEqual(store.events_after(None), [])
+        self.assertEqual(StockLedger(store).statuses(), {"A": "IN_STOCK", "B": "USED"})
+
+    def test_sync_keeps_replayed_status_and_version(self):
+        store = OffcutStore()
+        remote = _tables()
+        reconciler = StockReconciler(store, lambda: remote, after_sync=lambda: StockLedger(store).refresh())
+        reconciler.sync_now()
+        ledger = StockLedger(store)
+        remote["offcut_events"] += ledger.record(["A"], "RESERVED", at=T0 + timedelta(minutes=10))
+        remote["offcut_events"] += ledger.record(["B"], "EDITED", payload={"location": "Skip"}, at=T0 + timedelta(minutes=11))
+        ledger.refresh()
+        time.sleep(0.01)
+        reconciler.sync_now()
+        version = store.version
+
+        for _ in range(2):
+            time.sleep(0.01)
+            self.assertTrue(store.reconcile(remote, time.time()))
+            self.assertEqual(self.inventory_statuses(store), {"A": "RESERVED", "B": "USED"})
+            reconciler.sync_now()
+        self.assertEqual(store.version, version)
+        self.assertEqual(store.query_inventory(statuses=("USED",))[0]["location"], "Skip")
+
+    def test_write_stock_state_only_bumps_version_on_change(self):
+        store = self.make_log()
+        ledger = StockLedger(store)
+        ledger.refresh()
+        version = store.version
+
+        self.assertEqual(ledger.refresh()["changed"], 0)
+        self.assertEqual(store.version, version)
@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from offcut_outbox import OutboxWorker, StockOutbox, coalesce_rows, overlay_rows
+
+
+class FlakyWriter:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+
+    def __call__(self, spreadsheet, rows_by_worksheet):
+        self.calls.append((spreadsheet, rows_by_worksheet))
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("quota exceeded")
+
+
+class HttpError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.response = type("Response", (), {"status_code": status})()
+
+
+class PoisonWriter:
+    """Rejects any write containing an inventory row with a blank offcut id."""
+
+    def __init__(self, error=HttpError(400)):
+        self.error = error
+        self.calls = []
+
+    def __call__(self, spreadsheet, rows_by_worksheet):
+        self.calls.append(rows_by_worksheet)
+        if any(not row["offcut_id"] for row in rows_by_worksheet.get("offcut_inventory", [])):
+            raise RuntimeError("offcut_inventory: bad row") from self.error
+
+
+def _push(prefix, count):
+    return {
+        "offcut_inventory": [{"offcut_id": f"{prefix}-{i}"} for i in range(count)],
+        "offcut_events": [{"event_id": f"EV-{prefix}-{i}"} for i in range(count)],
+    }
+
+
+class StockOutboxTests(unittest.TestCase):
+    def test_drain_coalesces_pushes_per_spreadsheet(self):
+        outbox = StockOutbox()
+        outbox.enqueue("sheet-a", _push("J1", 2), now=1.0)
+        outbox.enqueue("sheet-b", _push("J2", 1), now=2.0)
+        outbox.enqueue("sheet-a", _push("J3", 3), now=3.0)
+        writer = FlakyWriter()
+
+        sent = OutboxWorker(outbox, writer).drain(now=10.0)
+
+        self.assertEqual(sent, 2)
+        self.assertEqual([spreadsheet for spreadsheet, _ in writer.calls], ["sheet-a", "sheet-b"])
+        self.assertEqual(
+            [row["offcut_id"] for row in writer.calls[0][1]["offcut_inventory"]],
+            ["J1-0", "J1-1", "J3-0", "J3-1", "J3-2"],
+        )
+        self.assertEqual(outbox.summary()["pending_entries"], 0)
+
+    def test_failed_write_is_kept_and_retried_with_backoff(self):
+        outbox = StockOutbox()
+        outbox.enqueue("sheet-a", _push("J1", 1), now=0.0)
+        writer = FlakyWriter(failures=2)
+        worker = OutboxWorker(outbox, writer, base_delay_s=5.0, max_delay_s=8.0)
+
+        self.assertEqual(worker.drain(now=0.0), 0)
+        self.assertEqual(worker.drain(now=4.0), 0)
+        self.assertEqual(len(writer.calls), 1)
+        self.assertEqual(worker.drain(now=5.0), 0)
+        summary = outbox.summary()
+        self.assertEqual((summary["max_attempts"], summary["last_error"]), (2, "quota exceeded"))
+        self.assertEqual(summary["next_attempt_at_utc"], "1970-01-01T00:00:13Z")
+
+        self.assertEqual(worker.drain(now=13.0), 1)
+        self.assertEqual(outbox.summary()["pending_entries"], 0)
+        self.assertIsNone(worker.status()["last_error"])
+
+    def test_entry_is_parked_after_max_attempts(self):
+        outbox = StockOutbox()
+        outbox.enqueue("sheet-a", _push("J1", 1), now=0.0)
+        worker = OutboxWorker(outbox, FlakyWriter(failures=5), base_delay_s=1.0, max_delay_s=1.0, max_attempts=3)
+
+        for stamp in (0.0, 1.0, 2.0, 3.0):
+            self.assertEqual(worker.drain(now=stamp), 0)
+
+        summary = outbox.summary()
+        self.assertEqual((summary["pending_entries"], summary["parked_entries"]), (0, 1))
+        self.assertEqual((summary["parked_rows"], summary["parked_error"]), (2, "quota exceeded"))
+        self.assertEqual(outbox.parked()[0]["attempts"], 3)
+        self.assertEqual(len(outbox.pending_rows("sheet-a")["offcut_inventory"]), 1)
+
+        self.assertEqual(outbox.requeue_parked(now=4.0), 1)
+        self.assertEqual(worker.drain(now=4.0), 0)
+        self.assertEqual(outbox.summary()["max_attempts"], 1)
+
+    def test_poison_entry_is_parked_without_failing_the_rest(self):
+        outbox = StockOutbox()
+        outbox.enqueue("sheet-a", _push("J1", 1), now=1.0)
+        outbox.enqueue("sheet-a", {"offcut_inventory": [{"offcut_id": ""}]}, now=2.0)
+        outbox.enqueue("sheet-a", _push("J3", 1), now=3.0)
+        writer = PoisonWriter()
+
+        self.assertEqual(OutboxWorker(outbox, writer).drain(now=10.0), 2)
+
+        self.assertEqual(len(writer.calls), 4)
+        summary = outbox.summary()
+        self.assertEqual((summary["pending_entries"], summary["parked_entries"]), (0, 1))
+        self.assertEqual(outbox.parked()[0]["last_error"], "offcut_inventory: bad row")
+
+    def test_outage_fails_the_batch_without_splitting_it(self):
+        outbox = StockOutbox()
+        outbox.enqueue("sheet-a", {"offcut_inventory": [{"offcut_id": ""}]}, now=1.0)
+        outbox.enqueue("sheet-a", _push("J2", 1), now=2.0)
+        writer = PoisonWriter(HttpError(503))
+
+        self.assertEqual(OutboxWorker(outbox, writer).drain(now=10.0), 0)
+
+        self.assertEqual(len(writer.calls), 1)
+        summary = outbox.summary()
+        self.assertEqual((summary["pending_entries"], summary["parked_entries"]), (2, 0))
+
+    def test_old_database_gains_the_parked_column(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "stock.sqlite3")
+            conn = sqlite3.connect(path)
+            conn.execute(
+                "CREATE TABLE stock_outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, spreadsheet TEXT NOT NULL, "
+                "payload_json TEXT NOT NULL, row_count INTEGER NOT NULL, enqueued_at REAL NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, last_error TEXT)"
+            )
+            conn.commit()
+            conn.close()
+
+            outbox = StockOutbox(path)
+            outbox.enqueue("sheet-a", _push("J1", 1), now=0.0)
+            batch = outbox.next_batch(now=0.0)
+            outbox.close()
+
+        self.assertEqual(batch[0], "sheet-a")
+
+    def test_queue_survives_reopening_the_database(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "stock.sqlite3")
+            outbox = StockOutbox(path)
+            outbox.enqueue("sheet-a", _push("J1", 2))
+            outbox.close()
+
+            reopened = StockOutbox(path)
+            pending = reopened.pending_rows("sheet-a")
+            reopened.close()
+
+        self.assertEqual(len(pending["offcut_inventory"]), 2)
+
+    def test_overlay_replaces_fetched_rows_with_queued_ones(self):
+        fetched = {"offcut_inventory": [{"offcut_id": "A", "status": "IN_STOCK"}, {"offcut_id": "B", "status": "IN_STOCK"}]}
+        pending = coalesce_rows([{"offcut_inventory": [{"offcut_id": "B", "status": "RESERVED"}]}, {"offcut_events": []}])
+
+        merged = overlay_rows(fetched, pending, {"offcut_inventory": "offcut_id"})
+
+        self.assertEqual(merged["offcut_inventory"], [{"offcut_id": "A", "status": "IN_STOCK"}, {"offcut_id": "B", "status": "RESERVED"}])
+        self.assertNotIn("offcut_events", merged)
+
+    def test_worker_thread_sends_on_trigger(self):
+        outbox = StockOutbox()
+        writer = FlakyWriter()
+        worker = OutboxWorker(outbox, writer, interval_s=30.0)
+        worker.start()
+        try:
+            outbox.enqueue("sheet-a", _push("J1", 1))
+            worker.trigger()
+            deadline = time.time() + 2.0
+            while outbox.summary()["pending_entries"] and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            worker.stop()
+
+        self.assertEqual(len(writer.calls), 1)
+        self.assertEqual(worker.status()["rows_sent"], 2)
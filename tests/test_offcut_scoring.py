@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from offcut_scoring import (
+    demand_fit_scores,
+    empty_demand_histogram,
+    inscribed_rect_dims,
+    load_demand_histogram,
+    panel_demand_fingerprint,
+    record_panel_demand,
+    save_demand_histogram,
+    score_inventory_rows,
+    update_demand_history,
+)
+
+
+class OffcutScoringTests(unittest.TestCase):
+    def _history(self):
+        return record_panel_demand(empty_demand_histogram(), [
+            {"Width": 300.0, "Length": 600.0, "Qty": 2},
+            {"Width": 720.0, "Length": 560.0, "Qty": 1},
+            {"Width": 1200.0, "Length": 400.0, "Qty": 1},
+        ])
+
+    def test_record_panel_demand_bins_sorted_sides_upward(self):
+        history = record_panel_demand(empty_demand_histogram(), [
+            {"Width": 720.0, "Length": 560.0, "Qty": 3},
+            {"Width": 0.0, "Length": 560.0, "Qty": 5},
+        ])
+
+        self.assertEqual(history["total"], 3)
+        self.assertEqual(history["counts"], {"12,15": 3})
+
+    def test_record_panel_demand_is_incremental(self):
+        base = self._history()
+        grown = record_panel_demand(base, [{"Width": 300.0, "Length": 600.0, "Qty": 1}])
+
+        self.assertEqual(base["total"], 4)
+        self.assertEqual(grown["total"], 5)
+        self.assertEqual(grown["counts"]["6,12"], 3)
+
+    def test_demand_fit_scores_counts_panels_fitting_either_way_round(self):
+        scores = demand_fit_scores(self._history(), [600.0, 300.0, 800.0, 100.0], [300.0, 600.0, 1300.0, 100.0])
+
+        self.assertEqual(scores.tolist(), [50.0, 50.0, 100.0, 0.0])
+
+    def test_demand_fit_scores_without_history_are_zero(self):
+        self.assertEqual(demand_fit_scores(empty_demand_histogram(), [1000.0], [1000.0]).tolist(), [0.0])
+
+    def test_score_inventory_rows_fills_usable_score(self):
+        rows = [{"offcut_id": "A", "bbox_w_mm": 750.0, "bbox_h_mm": 600.0}, {"offcut_id": "B", "bbox_w_mm": "", "bbox_h_mm": 600.0}]
+
+        scored = score_inventory_rows(rows, self._history())
+
+        self.assertEqual([row["usable_score"] for row in scored], [75.0, 0.0])
+        self.assertNotIn("usable_score", rows[0])
+
+    def test_record_panel_demand_counts_each_job_once(self):
+        panels = [{"Width": 300.0, "Length": 600.0, "Qty": 2}]
+        first = record_panel_demand(empty_demand_histogram(), panels, "JOB-1")
+        again = record_panel_demand(first, panels, "JOB-1")
+
+        self.assertEqual(first["total"], 2)
+        self.assertEqual(again["total"], 2)
+        self.assertEqual(again["jobs"], ["JOB-1"])
+        self.assertEqual(
+            panel_demand_fingerprint(panels + [{"Width": 720.0, "Length": 560.0, "Qty": 1}]),
+            panel_demand_fingerprint([{"Width": 560.0, "Length": 720.0, "Qty": 1}] + panels),
+        )
+
+    def test_score_inventory_rows_uses_inscribed_rect_of_l_shapes(self):
+        # 800 x 800 L with 300 mm legs: the bbox holds every history panel, the shape only the 300 x 600s.
+        l_shape = [[0, 0], [800, 0], [800, 300], [300, 300], [300, 800], [0, 800]]
+        rows = [{"offcut_id": "L", "shape_type": "L", "bbox_w_mm": 800.0, "bbox_h_mm": 800.0, "min_internal_width_mm": 300.0}]
+        shapes = [{"offcut_id": "L", "vertices_json": json.dumps(l_shape), "holes_json": "[]"}]
+
+        self.assertEqual(inscribed_rect_dims(l_shape), (800.0, 300.0))
+        self.assertEqual(score_inventory_rows(rows, self._history(), shapes)[0]["usable_score"], 50.0)
+        self.assertEqual(score_inventory_rows(rows, self._history())[0]["usable_score"], 0.0)
+
+    def test_inscribed_rect_dims_avoids_holes(self):
+        outer = [[0, 0], [1000, 0], [1000, 1000], [0, 1000]]
+        hole = [[200, 100], [300, 100], [300, 900], [200, 900]]
+
+        self.assertEqual(inscribed_rect_dims(outer), (1000.0, 1000.0))
+        self.assertEqual(inscribed_rect_dims(outer, [hole]), (700.0, 1000.0))
+
+    def test_update_demand_history_keeps_concurrent_jobs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "demand.json")
+            threads = [
+                threading.Thread(target=update_demand_history, args=(path, [{"Width": 300.0, "Length": 600.0, "Qty": 1}], f"JOB-{idx}"))
+                for idx in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            update_demand_history(path, [{"Width": 300.0, "Length": 600.0, "Qty": 1}], "JOB-0")
+
+            self.assertEqual(load_demand_histogram(path)["total"], 8)
+            self.assertEqual(os.listdir(tmp), ["demand.json"])
+
+    def test_demand_histogram_round_trips_through_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "demand.json")
+            self.assertEqual(load_demand_histogram(path), empty_demand_histogram())
+            save_demand_histogram(self._history(), path)
+            self.assertEqual(load_demand_histogram(path), self._history())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
+import json
 import unittest
 
-from offcut_stock import build_offcut_stock_rows, extract_spreadsheet_id, normalize_spreadsheet_reference, parse_vertices_json
+from offcut_scoring import empty_demand_histogram, record_panel_demand
+from offcut_stock import append_stock_rows, build_nest_offcut_stock_rows, build_offcut_stock_rows, extract_spreadsheet_id, normalize_spreadsheet_reference, parse_vertices_json
 
 
 class OffcutStockTests(unittest.TestCase):
@@ -51,6 +53,47 @@ class OffcutStockTests(unittest.TestCase):
         self.assertEqual(rows["offcut_inventory"][0]["shape_type"], "L")
         self.assertIn("[200.0, 50.0]", rows["offcut_shapes"][0]["vertices_json"])
 
+    def test_build_offcut_stock_rows_writes_polygon_holes(self):
+        layout = {"sheet_w": 1000.0, "sheet_h": 500.0, "margin": 0.0}
+        sheet = {"sheet_index": 0}
+        reusable = [{
+            "shape_type": "POLYGON",
+            "x": 0.0,
+            "y": 0.0,
+            "width": 400.0,
+            "height": 400.0,
+            "area": 150000.0,
+            "vertices": [[0, 0], [400, 0], [400, 400], [0, 400]],
+            "holes": [[[100, 100], [100, 200], [200, 200], [200, 100]]],
+        }]
+
+        rows = build_offcut_stock_rows(layout, sheet, reusable, captured_at_utc="2026-04-12T14:33:09Z")
+
+        self.assertEqual(rows["offcut_inventory"][0]["shape_type"], "POLYGON")
+        self.assertEqual(
+            json.loads(rows["offcut_shapes"][0]["holes_json"]),
+            [[[100.0, 100.0], [100.0, 200.0], [200.0, 200.0], [200.0, 100.0]]],
+        )
+        self.assertEqual(rows["offcut_previews"][0]["svg_path_data"].count("M"), 2)
+
+    def test_build_offcut_stock_rows_scores_against_demand_history(self):
+        layout = {"sheet_w": 1000.0, "sheet_h": 500.0, "margin": 10.0}
+        sheet = {"sheet_index": 0}
+        reusable = [
+            {"x": 10.0, "y": 20.0, "width": 300.0, "height": 200.0, "area": 60000.0},
+            {"x": 400.0, "y": 20.0, "width": 100.0, "height": 100.0, "area": 10000.0},
+        ]
+        history = record_panel_demand(empty_demand_histogram(), [
+            {"Width": 150.0, "Length": 280.0, "Qty": 1},
+            {"Width": 400.0, "Length": 400.0, "Qty": 1},
+        ])
+
+        rows = build_offcut_stock_rows(layout, sheet, reusable, captured_at_utc="2026-04-12T14:33:09Z", demand_histogram=history)
+        unscored = build_offcut_stock_rows(layout, sheet, reusable, captured_at_utc="2026-04-12T14:33:09Z")
+
+        self.assertEqual([row["usable_score"] for row in rows["offcut_inventory"]], [50.0, 0.0])
+        self.assertEqual(unscored["offcut_inventory"][0]["usable_score"], "")
+
     def test_build_offcut_stock_rows_builds_expected_tabs(self):
         layout = {"sheet_w": 1000.0, "sheet_h": 500.0, "margin": 10.0}
         sheet = {"sheet_index": 1}
@@ -84,6 +127,123 @@ class OffcutStockTests(unittest.TestCase):
         self.assertEqual(shape["bbox_y_mm"], 20.0)
         self.assertIn("[[10.0, 20.0]", shape["vertices_json"])
 
+    def test_build_nest_offcut_stock_rows_merges_sheets_with_one_timestamp(self):
+        layout = {"sheet_w": 1000.0, "sheet_h": 500.0, "margin": 10.0}
+        rows = build_nest_offcut_stock_rows(
+            layout,
+            [
+                ({"sheet_index": 0}, [{"x": 10.0, "y": 10.0, "width": 200.0, "height": 150.0, "area": 30000.0}]),
+                ({"sheet_index": 3}, [{"x": 20.0, "y": 20.0, "width": 300.0, "height": 150.0, "area": 45000.0}]),
+            ],
+            material="Ply",
+            captured_at_utc="2026-01-02T03:04:05Z",
+        )
+
+        inventory = rows["offcut_inventory"]
+        self.assertEqual([r["offcut_id"] for r in inventory], ["OC-20260102030405-S01-001", "OC-20260102030405-S04-001"])
+        self.assertEqual({r["captured_at_utc"] for r in inventory}, {"2026-01-02T03:04:05Z"})
+        self.assertEqual(len(rows["offcut_shapes"]), 2)
+        self.assertEqual(len(rows["offcut_events"]), 2)
+        self.assertEqual(len(rows["offcut_previews"]), 2)
+
+
+class FakeSpreadsheet:
+    """Stand-in for a gspread Spreadsheet that counts API calls and request bytes."""
+
+    def __init__(self, tabs, column_count=26):
+        self.tabs = {
+            title: {"id": idx, "rows": [list(row) for row in rows], "column_count": column_count}
+            for idx, (title, rows) in enumerate(tabs.items())
+        }
+        self.calls = 0
+        self.bytes_sent = 0
+
+    def fetch_sheet_metadata(self, params=None):
+        self.calls += 1
+        wanted = {r.split("!")[0].strip("'") for r in params["ranges"]}
+        sheets = []
+        for title, tab in self.tabs.items():
+            sheet = {"properties": {"sheetId": tab["id"], "title": title, "gridProperties": {"columnCount": tab["column_count"]}}}
+            if title in wanted and tab["rows"]:
+                sheet["data"] = [{"rowData": [{"values": [{"formattedValue": str(v)} for v in tab["rows"][0]]}]}]
+            sheets.append(sheet)
+        return {"sheets": sheets}
+
+    def batch_update(self, body):
+        self.calls += 1
+        self.bytes_sent += len(json.dumps(body))
+        by_id = {tab["id"]: tab for tab in self.tabs.values()}
+        for request in body["requests"]:
+            kind, payload = next(iter(request.items()))
+            tab = by_id[payload.get("sheetId", payload.get("start", {}).get("sheetId"))]
+            if kind == "appendDimension":
+                tab["column_count"] += payload["length"]
+            elif kind == "updateCells":
+                column = payload["start"]["columnIndex"]
+                values = [self._value(cell) for cell in payload["rows"][0]["values"]]
+                tab["rows"][0][column:column + len(values)] = values
+            elif kind == "appendCells":
+                for row in payload["rows"]:
+                    if len(row["values"]) > tab["column_count"]:
+                        raise ValueError("row wider than grid")
+                    tab["rows"].append([self._value(cell) for cell in row["values"]])
+        return {}
+
+    @staticmethod
+    def _value(cell):
+        value = cell.get("userEnteredValue", {})
+        return next(iter(value.values()), "")
+
+
+class AppendStockRowsTests(unittest.TestCase):
+    def _rows(self, count):
+        reusable = [{"x": 10.0 * i, "y": 0.0, "width": 300.0, "height": 200.0, "area": 60000.0} for i in range(count)]
+        return build_offcut_stock_rows({"sheet_w": 1000.0, "sheet_h": 500.0}, {"sheet_index": 0}, reusable, captured_at_utc="2026-04-12T14:33:09Z")
+
+    def test_append_stock_rows_writes_headers_into_empty_tabs_in_two_calls(self):
+        spreadsheet = FakeSpreadsheet({name: [] for name in ("offcut_inventory", "offcut_shapes", "offcut_events", "offcut_previews")})
+        rows = self._rows(2)
+
+        written = append_stock_rows(spreadsheet, rows)
+
+        self.assertEqual(spreadsheet.calls, 2)
+        self.assertEqual(written, {name: 2 for name in rows})
+        inventory = spreadsheet.tabs["offcut_inventory"]["rows"]
+        self.assertEqual(inventory[0], list(rows["offcut_inventory"][0].keys()))
+        self.assertEqual(inventory[1][0], rows["offcut_inventory"][0]["offcut_id"])
+        self.assertEqual(len(inventory), 3)
+
+    def test_append_stock_rows_cost_does_not_grow_with_stock_history(self):
+        spreadsheet = FakeSpreadsheet({name: [] for name in ("offcut_inventory", "offcut_shapes", "offcut_events", "offcut_previews")})
+        append_stock_rows(spreadsheet, self._rows(3))
+        push_bytes = []
+        for _ in range(20):
+            before = spreadsheet.bytes_sent
+            append_stock_rows(spreadsheet, self._rows(3))
+            push_bytes.append(spreadsheet.bytes_sent - before)
+
+        self.assertEqual(spreadsheet.calls, 42)
+        self.assertEqual(len(spreadsheet.tabs["offcut_shapes"]["rows"]), 1 + 21 * 3)
+        self.assertEqual(push_bytes[-1], push_bytes[0])
+
+    def test_append_stock_rows_follows_existing_header_order_and_extends_it(self):
+        spreadsheet = FakeSpreadsheet({"offcut_events": [["offcut_id", "event_id", "legacy"]]}, column_count=3)
+
+        append_stock_rows(spreadsheet, {"offcut_events": [{"event_id": "EV-1", "offcut_id": "OC-1", "event_type": "CREATED"}]})
+
+        tab = spreadsheet.tabs["offcut_events"]
+        self.assertEqual(tab["rows"][0], ["offcut_id", "event_id", "legacy", "event_type"])
+        self.assertEqual(tab["rows"][1], ["OC-1", "EV-1", "", "CREATED"])
+        self.assertEqual(tab["column_count"], 4)
+
+    def test_append_stock_rows_rejects_missing_tab_and_skips_empty_pushes(self):
+        spreadsheet = FakeSpreadsheet({"offcut_inventory": []})
+
+        self.assertEqual(append_stock_rows(spreadsheet, {"offcut_inventory": []}), {"offcut_inventory": 0})
+        self.assertEqual(spreadsheet.calls, 0)
+        with self.assertRaises(ValueError):
+            append_stock_rows(spreadsheet, {"offcut_shapes": [{"shape_ref": "SH-1"}]})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,160 @@
+import time
+import unittest
+
+from offcut_stock import build_offcut_stock_rows
+from offcut_store import OffcutStore, StockReconciler, fetch_stock_tables, sheet_values_to_rows
+
+
+class FakeValuesSpreadsheet:
+    def __init__(self, tabs):
+        self.tabs = tabs
+        self.calls = 0
+
+    def values_batch_get(self, ranges, params=None):
+        self.calls += 1
+        return {"valueRanges": [{"range": r, "values": self.tabs.get(r.strip("'"), [])} for r in ranges]}
+
+
+class OffcutStoreTests(unittest.TestCase):
+    def _rows(self, count, sheet_index=0):
+        reusable = [
+            {"x": 0.0, "y": 0.0, "width": 300.0 + 100.0 * i, "height": 200.0, "area": (300.0 + 100.0 * i) * 200.0}
+            for i in range(count)
+        ]
+        return build_offcut_stock_rows(
+            {"sheet_w": 1000.0, "sheet_h": 500.0},
+            {"sheet_index": sheet_index},
+            reusable,
+            material="MDF",
+            thickness_mm=18,
+            captured_at_utc="2026-04-12T14:33:09Z",
+        )
+
+    def test_query_inventory_filters_on_indexed_columns(self):
+        store = OffcutStore()
+        store.upsert_rows(self._rows(3))
+        store.upsert_rows({"offcut_inventory": [{"offcut_id": "OC-X", "status": "USED", "material": "MDF", "thickness_mm": "18", "bbox_w_mm": 900, "bbox_h_mm": 900}]})
+
+        in_stock = store.query_inventory(statuses=("IN_STOCK",), material="MDF", thickness_mm=18, min_w=400.0)
+
+        self.assertEqual([row["bbox_w_mm"] for row in in_stock], [400.0, 500.0])
+        self.assertEqual(len(store.query_inventory()), 4)
+        self.assertEqual(store.query_inventory(statuses=("USED",))[0]["thickness_mm"], 18.0)
+
+    def test_upsert_rows_replaces_rows_by_key(self):
+        store = OffcutStore()
+        rows = self._rows(1)
+        store.upsert_rows(rows)
+        rows["offcut_inventory"][0]["status"] = "RESERVED"
+        store.upsert_rows(rows)
+
+        self.assertEqual([row["status"] for row in store.query_inventory()], ["RESERVED"])
+        self.assertEqual(len(store.shape_rows([rows["offcut_inventory"][0]["offcut_id"]])), 1)
+
+    def test_version_increases_on_every_write(self):
+        store = OffcutStore()
+        start = store.version
+        store.upsert_rows(self._rows(1))
+        store.reconcile({"offcut_inventory": []}, time.time())
+
+        self.assertEqual(store.version, start + 2)
+
+    def test_reconcile_keeps_version_when_snapshot_is_unchanged(self):
+        store = OffcutStore()
+        remote = self._rows(2)
+        store.reconcile(remote, time.time())
+        synced = store.version
+        store.reconcile(remote, time.time())
+
+        self.assertEqual(store.version, synced)
+        self.assertEqual(len(store.query_inventory()), 2)
+
+        remote["offcut_inventory"][0]["location"] = "Rack B"
+        store.reconcile(remote, time.time())
+
+        self.assertEqual(store.version, synced + 1)
+        self.assertIn("Rack B", [row["location"] for row in store.query_inventory()])
+
+    def test_usable_scores_are_kept_through_reconcile(self):
+        store = OffcutStore()
+        remote = self._rows(2)
+        store.reconcile(remote, time.time())
+        first, second = [row["offcut_id"] for row in remote["offcut_inventory"]]
+
+        self.assertEqual(store.write_usable_scores({first: 10.0, second: 80.0}), 2)
+        version = store.version
+        self.assertEqual(store.write_usable_scores({first: 10.0, second: 80.0}), 0)
+        time.sleep(0.01)
+        store.reconcile(remote, time.time())
+
+        self.assertEqual(store.version, version)
+        self.assertEqual([row["offcut_id"] for row in store.query_inventory()], [second, first])
+        self.assertEqual(store.query_inventory()[0]["usable_score"], 80.0)
+
+    def test_reconcile_mirrors_snapshot_but_keeps_later_local_writes(self):
+        store = OffcutStore()
+        store.upsert_rows(self._rows(2))
+        fetched_at = time.time()
+        local = self._rows(1, sheet_index=5)
+        store.upsert_rows(local)
+
+        remote = self._rows(1)
+        store.reconcile({"offcut_inventory": remote["offcut_inventory"]}, fetched_at)
+
+        ids = sorted(row["offcut_id"] for row in store.query_inventory())
+        self.assertEqual(ids, sorted([remote["offcut_inventory"][0]["offcut_id"], local["offcut_inventory"][0]["offcut_id"]]))
+        self.assertIsNotNone(store.last_synced_at())
+
+    def test_fetch_stock_tables_reads_every_tab_in_one_call(self):
+        spreadsheet = FakeValuesSpreadsheet({
+            "offcut_inventory": [["offcut_id", "status", "bbox_w_mm"], ["OC-1", "IN_STOCK", 600], [], ["OC-2"]],
+        })
+
+        tables = fetch_stock_tables(spreadsheet)
+
+        self.assertEqual(spreadsheet.calls, 1)
+        self.assertEqual(tables["offcut_inventory"], [
+            {"offcut_id": "OC-1", "status": "IN_STOCK", "bbox_w_mm": 600},
+            {"offcut_id": "OC-2", "status": "", "bbox_w_mm": ""},
+        ])
+        self.assertEqual(tables["offcut_shapes"], [])
+        self.assertEqual(sheet_values_to_rows([]), [])
+
+    def test_reconciler_keeps_last_good_copy_when_sheets_fail(self):
+        store = OffcutStore()
+        spreadsheet = FakeValuesSpreadsheet({"offcut_inventory": [["offcut_id", "status"], ["OC-1", "IN_STOCK"]]})
+        healthy = [True]
+
+        def fetch():
+            if not healthy[0]:
+                raise ConnectionError("Sheets offline")
+            return fetch_stock_tables(spreadsheet)
+
+        reconciler = StockReconciler(store, fetch, interval_s=0.01)
+        self.assertTrue(reconciler.sync_now())
+        healthy[0] = False
+        self.assertFalse(reconciler.sync_now())
+
+        self.assertEqual([row["offcut_id"] for row in store.query_inventory()], ["OC-1"])
+        self.assertEqual(reconciler.status()["last_error"], "Sheets offline")
+
+    def test_reconciler_thread_syncs_in_background(self):
+        store = OffcutStore()
+        spreadsheet = FakeValuesSpreadsheet({"offcut_inventory": [["offcut_id"], ["OC-1"]]})
+        reconciler = StockReconciler(store, lambda: fetch_stock_tables(spreadsheet), interval_s=0.01)
+
+        reconciler.start()
+        try:
+            deadline = time.time() + 2.0
+            while spreadsheet.calls < 2 and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            reconciler.stop()
+
+        self.assertGreaterEqual(spreadsheet.calls, 2)
+        self.assertFalse(reconciler.status()["running"])
+        self.assertEqual(len(store.query_inventory()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
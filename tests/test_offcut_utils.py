@@ -1,16 +1,38 @@
 import unittest
 from unittest.mock import patch
 
+from manual_layout import initialize_layout_from_packer
+from nesting_engine import run_smart_nesting
+
 from offcut_utils import (
     _classify_orthogonal_polygon,
+    _compute_free_rects,
+    _connected_rect_components,
+    _is_c_shape,
+    _largest_rect_in_union,
+    _point_in_polygon,
+    _polygon_from_rects,
+    _polygon_within_rect_union,
+    _rect_adjacency,
+    _rect_contained,
+    _union_boundary_loops,
     build_sheet_offcut_preview,
+    build_sheet_usage_grid,
+    analyze_nest_offcuts,
+    analyze_sheet_free_space,
     build_sheet_usage_heatmap,
+    calculate_c_mix_offcuts,
     calculate_l_mix_offcuts,
+    calculate_polygon_max_offcuts,
     calculate_sheet_offcuts,
+    clear_free_space_cache,
 )
 
 
 class OffcutUtilsTests(unittest.TestCase):
+    def setUp(self):
+        clear_free_space_cache()
+
     def test_classify_orthogonal_polygon_counts_follow_vertex_rules(self):
         self.assertEqual(
             _classify_orthogonal_polygon([[0, 0], [10, 0], [10, 10], [0, 10]]),
@@ -276,6 +298,77 @@ class OffcutUtilsTests(unittest.TestCase):
         self.assertTrue(all(shape.get("source_vertex_count") == 6 for shape in l_shapes))
 
 
+    def test_calculate_l_mix_offcuts_trims_wider_slab_to_form_l(self):
+        layout = {"sheet_w": 300.0, "sheet_h": 200.0, "margin": 0.0}
+        sheet = {
+            "sheet_index": 0,
+            "parts": [
+                {"x": 0.0, "y": 100.0, "w": 100.0, "h": 100.0},
+                {"x": 200.0, "y": 100.0, "w": 100.0, "h": 100.0},
+            ],
+        }
+
+        result = calculate_l_mix_offcuts(layout, sheet, min_width=20.0, min_height=20.0, min_area=100.0)
+
+        l_shapes = [r for r in result if r.get("shape_type") == "L"]
+        rectangles = [r for r in result if r.get("shape_type") == "RECT"]
+        self.assertEqual(len(l_shapes), 1)
+        self.assertEqual(l_shapes[0]["area"], 30000.0)
+        self.assertEqual(len(rectangles), 1)
+        self.assertEqual(rectangles[0]["area"], 10000.0)
+
+    def test_largest_rect_in_union_spans_touching_rects(self):
+        rects = [
+            {"x": 0.0, "y": 0.0, "w": 100.0, "h": 40.0},
+            {"x": 0.0, "y": 40.0, "w": 40.0, "h": 60.0},
+            {"x": 100.0, "y": 0.0, "w": 50.0, "h": 30.0},
+        ]
+        self.assertEqual(_largest_rect_in_union(rects), {"x": 0.0, "y": 0.0, "w": 150.0, "h": 30.0})
+
+    def test_largest_rect_in_union_on_fragmented_grid(self):
+        rects = [
+            {"x": float(col * 10), "y": float(row * 10), "w": 10.0, "h": 10.0}
+            for row in range(40)
+            for col in range(40)
+            if (row, col) != (20, 5)
+        ]
+        best = _largest_rect_in_union(rects)
+        self.assertEqual(best["w"] * best["h"], 400.0 * 340.0)
+
+    def test_compute_free_rects_keeps_only_maximal_rects(self):
+        usable = {"x": 0.0, "y": 0.0, "w": 1000.0, "h": 600.0}
+        parts = [
+            {"x": float(x), "y": float(y), "w": 80.0, "h": 60.0}
+            for y in range(40, 560, 130)
+            for x in range(30 + (y % 3) * 20, 900, 170)
+        ]
+        free_rects = _compute_free_rects(usable, parts)
+
+        for i, rect in enumerate(free_rects):
+            for j, other in enumerate(free_rects):
+                if i != j:
+                    self.assertFalse(_rect_contained(rect, other))
+            for part in parts:
+                self.assertFalse(
+                    rect["x"] < part["x"] + part["w"]
+                    and part["x"] < rect["x"] + rect["w"]
+                    and rect["y"] < part["y"] + part["h"]
+                    and part["y"] < rect["y"] + rect["h"]
+                )
+
+    def test_compute_free_rects_splits_only_hit_rects(self):
+        usable = {"x": 0.0, "y": 0.0, "w": 100.0, "h": 100.0}
+        free_rects = _compute_free_rects(usable, [{"x": 40.0, "y": 40.0, "w": 20.0, "h": 20.0}])
+        self.assertEqual(
+            free_rects,
+            [
+                {"x": 0.0, "y": 60.0, "w": 100.0, "h": 40.0},
+                {"x": 0.0, "y": 0.0, "w": 100.0, "h": 40.0},
+                {"x": 0.0, "y": 40.0, "w": 40.0, "h": 20.0},
+                {"x": 60.0, "y": 40.0, "w": 40.0, "h": 20.0},
+            ],
+        )
+
     def test_build_sheet_usage_heatmap_empty_sheet_cells_are_zero(self):
         layout = {
             "sheet_w": 200.0,
@@ -308,6 +401,249 @@ class OffcutUtilsTests(unittest.TestCase):
         self.assertEqual(left["usage_pct"], 50.0)
         self.assertEqual(right["usage_pct"], 0.0)
 
+    def test_build_sheet_usage_grid_returns_exact_overlap_arrays(self):
+        layout = {"sheet_w": 230.0, "sheet_h": 100.0, "margin": 0.0}
+        sheet = {
+            "parts": [
+                {"x": 0.0, "y": 0.0, "w": 50.0, "h": 100.0},
+                {"x": 90.0, "y": 25.0, "w": 30.0, "h": 50.0},
+            ]
+        }
+
+        grid = build_sheet_usage_grid(layout, sheet, cell_size=100.0)
+
+        self.assertEqual(grid["used_area"].shape, (1, 3))
+        self.assertEqual(grid["x_ends"].tolist(), [100.0, 200.0, 230.0])
+        self.assertEqual(grid["used_area"].tolist(), [[5500.0, 1000.0, 0.0]])
+        self.assertEqual(grid["cell_area"].tolist(), [[10000.0, 10000.0, 3000.0]])
+        self.assertAlmostEqual(float(grid["usage_ratio"][0, 0]), 0.55)
+
+    def test_build_sheet_usage_grid_handles_no_usable_area(self):
+        layout = {"sheet_w": 20.0, "sheet_h": 20.0, "margin": 10.0}
+        self.assertIsNone(build_sheet_usage_grid(layout, {"parts": []}))
+
+    def test_free_space_analysis_is_shared_across_views_and_thresholds(self):
+        layout = {"sheet_w": 1000.0, "sheet_h": 500.0, "margin": 10.0}
+        sheet = {"parts": [{"x": 10.0, "y": 10.0, "w": 300.0, "h": 200.0}]}
+
+        with patch("offcut_utils._compute_free_rects", wraps=_compute_free_rects) as compute:
+            calculate_sheet_offcuts(layout, sheet, min_width=120.0)
+            calculate_sheet_offcuts(layout, sheet, min_width=300.0)
+            calculate_l_mix_offcuts(layout, sheet)
+            build_sheet_offcut_preview(layout, sheet)
+            self.assertEqual(compute.call_count, 1)
+
+            moved = {"parts": [{"x": 20.0, "y": 10.0, "w": 300.0, "h": 200.0}]}
+            calculate_sheet_offcuts(layout, moved)
+            self.assertEqual(compute.call_count, 2)
+
+        self.assertIs(analyze_sheet_free_space(layout, sheet), analyze_sheet_free_space(dict(layout), dict(sheet)))
+
+    def test_calculate_c_mix_offcuts_detects_c_around_a_notch(self):
+        layout = {"sheet_w": 300.0, "sheet_h": 300.0, "margin": 0.0}
+        sheet = {"parts": [{"x": 100.0, "y": 100.0, "w": 200.0, "h": 100.0}]}
+
+        result = calculate_c_mix_offcuts(layout, sheet, min_width=20.0, min_height=20.0, min_area=100.0)
+
+        self.assertEqual([r["shape_type"] for r in result], ["C"])
+        self.assertEqual(result[0]["area"], 70000.0)
+        self.assertEqual(result[0]["source_vertex_count"], 8)
+        self.assertEqual(len(result[0]["vertices"]), 8)
+
+    def test_calculate_c_mix_offcuts_finds_u_opening_upward(self):
+        layout = {"sheet_w": 300.0, "sheet_h": 300.0, "margin": 0.0}
+        sheet = {"parts": [{"x": 100.0, "y": 150.0, "w": 100.0, "h": 150.0}]}
+
+        result = calculate_c_mix_offcuts(layout, sheet, min_width=20.0, min_height=20.0, min_area=100.0)
+
+        self.assertEqual([r["shape_type"] for r in result], ["C"])
+        self.assertEqual(result[0]["area"], 75000.0)
+
+    def test_is_c_shape_rejects_t_shape(self):
+        t_shape = [[0, 0], [30, 0], [30, 10], [20, 10], [20, 30], [10, 30], [10, 10], [0, 10]]
+        c_shape = [[0, 0], [30, 0], [30, 10], [10, 10], [10, 20], [30, 20], [30, 30], [0, 30]]
+        self.assertFalse(_is_c_shape(t_shape))
+        self.assertTrue(_is_c_shape(c_shape))
+
+    def test_polygon_from_rects_traces_outer_loop_around_a_hole(self):
+        ring = [
+            {"x": 0.0, "y": 0.0, "w": 300.0, "h": 100.0},
+            {"x": 0.0, "y": 200.0, "w": 300.0, "h": 100.0},
+            {"x": 0.0, "y": 100.0, "w": 100.0, "h": 100.0},
+            {"x": 200.0, "y": 100.0, "w": 100.0, "h": 100.0},
+            {"x": 100.0, "y": 300.0, "w": 50.0, "h": 50.0},
+        ]
+
+        self.assertEqual(
+            _polygon_from_rects(ring),
+            [[0.0, 0.0], [300.0, 0.0], [300.0, 300.0], [150.0, 300.0], [150.0, 350.0], [100.0, 350.0], [100.0, 300.0], [0.0, 300.0]],
+        )
+
+    def test_polygon_within_rect_union_rejects_polygon_over_a_hole(self):
+        ring = [
+            {"x": 0.0, "y": 0.0, "w": 300.0, "h": 100.0},
+            {"x": 0.0, "y": 200.0, "w": 300.0, "h": 100.0},
+            {"x": 0.0, "y": 100.0, "w": 100.0, "h": 100.0},
+            {"x": 200.0, "y": 100.0, "w": 100.0, "h": 100.0},
+        ]
+        l_shape = [[0.0, 0.0], [300.0, 0.0], [300.0, 100.0], [100.0, 100.0], [100.0, 300.0], [0.0, 300.0]]
+
+        self.assertTrue(_polygon_within_rect_union(l_shape, ring))
+        self.assertFalse(_polygon_within_rect_union([[0.0, 0.0], [300.0, 0.0], [300.0, 300.0], [0.0, 300.0]], ring))
+
+    def test_rect_adjacency_needs_a_shared_edge_segment(self):
+        rects = [
+            {"x": 0.0, "y": 0.0, "w": 100.0, "h": 100.0},
+            {"x": 100.0, "y": 50.0, "w": 100.0, "h": 100.0},
+            {"x": 200.0, "y": 150.0, "w": 50.0, "h": 50.0},
+            {"x": 0.0, "y": 100.0, "w": 50.0, "h": 20.0},
+            {"x": 20.0, "y": 20.0, "w": 10.0, "h": 10.0},
+        ]
+
+        adjacency = _rect_adjacency(rects)
+
+        self.assertEqual(adjacency, [{1, 3}, {0}, set(), {0}, set()])
+        self.assertEqual(
+            sorted(sorted(group) for group in _connected_rect_components(rects, adjacency)),
+            [[0, 1, 3], [2], [4]],
+        )
+
+    def test_free_space_adjacency_is_built_once_per_sheet(self):
+        layout = {"sheet_w": 1000.0, "sheet_h": 500.0, "margin": 0.0, "kerf": 0.0}
+        sheet = {"sheet_index": 0, "parts": [{"x": 300.0, "y": 0.0, "w": 200.0, "h": 300.0}]}
+
+        with patch("offcut_utils._rect_adjacency", wraps=_rect_adjacency) as adjacency:
+            calculate_l_mix_offcuts(layout, sheet)
+            calculate_c_mix_offcuts(layout, sheet)
+
+        free_rects = analyze_sheet_free_space(layout, sheet)["free_rects"]
+        sheet_builds = [call for call in adjacency.call_args_list if call.args[0] is free_rects]
+        self.assertEqual(len(sheet_builds), 1)
+
+    def test_union_boundary_loops_returns_ring_with_hole(self):
+        ring = [
+            {"x": 0.0, "y": 0.0, "w": 10.0, "h": 2.0},
+            {"x": 0.0, "y": 8.0, "w": 10.0, "h": 2.0},
+            {"x": 0.0, "y": 0.0, "w": 2.0, "h": 10.0},
+            {"x": 8.0, "y": 0.0, "w": 2.0, "h": 10.0},
+        ]
+
+        shapes = _union_boundary_loops(ring)
+
+        self.assertEqual(shapes, [(
+            [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0)],
+            [[(2.0, 2.0), (2.0, 8.0), (8.0, 8.0), (8.0, 2.0)]],
+        )])
+
+    def test_union_boundary_loops_splits_corner_touching_rects(self):
+        shapes = _union_boundary_loops([
+            {"x": 0.0, "y": 0.0, "w": 1.0, "h": 1.0},
+            {"x": 1.0, "y": 1.0, "w": 1.0, "h": 1.0},
+        ])
+
+        self.assertEqual([outer for outer, _ in shapes], [
+            [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)],
+            [(1.0, 1.0), (2.0, 1.0), (2.0, 2.0), (1.0, 2.0)],
+        ])
+
+    def test_calculate_polygon_max_offcuts_cuts_enclosed_part_as_hole(self):
+        layout = {"sheet_w": 1000.0, "sheet_h": 800.0, "margin": 0.0, "kerf": 0.0}
+        sheet = {"sheet_index": 0, "parts": [
+            {"x": 400.0, "y": 300.0, "w": 200.0, "h": 200.0},
+            {"x": 0.0, "y": 0.0, "w": 300.0, "h": 200.0},
+        ]}
+
+        candidates = calculate_polygon_max_offcuts(layout, sheet)
+
+        self.assertEqual(len(candidates), 1)
+        polygon = candidates[0]
+        self.assertEqual(polygon["shape_type"], "POLYGON")
+        self.assertEqual(polygon["vertices"], [[300.0, 0.0], [1000.0, 0.0], [1000.0, 800.0], [0.0, 800.0], [0.0, 200.0], [300.0, 200.0]])
+        self.assertEqual(polygon["holes"], [[[400.0, 300.0], [400.0, 500.0], [600.0, 500.0], [600.0, 300.0]]])
+        self.assertEqual(polygon["area"], 800000.0 - 60000.0 - 40000.0)
+
+    def test_calculate_polygon_max_offcuts_opens_hole_with_thin_band(self):
+        layout = {"sheet_w": 1000.0, "sheet_h": 800.0, "margin": 0.0, "kerf": 0.0}
+        sheet = {"sheet_index": 0, "parts": [{"x": 60.0, "y": 300.0, "w": 200.0, "h": 200.0}]}
+
+        polygon = calculate_polygon_max_offcuts(layout, sheet)[0]
+
+        self.assertEqual(polygon["holes"], [])
+        self.assertEqual(polygon["area"], 800000.0 - 260.0 * 200.0)
+
+    def test_calculate_polygon_max_offcuts_drops_kerf_channels_of_a_packed_nest(self):
+        panels = [
+            {"Label": "A", "Width": 560, "Length": 700, "Qty": 3, "Grain?": False, "Material": "MDF"},
+            {"Label": "B", "Width": 300, "Length": 400, "Qty": 6, "Grain?": False, "Material": "MDF"},
+            {"Label": "C", "Width": 250, "Length": 350, "Qty": 2, "Grain?": False, "Material": "MDF"},
+        ]
+        layout = initialize_layout_from_packer(run_smart_nesting(panels, 2440, 1220, 0, 6), 0, 6, 2440, 1220)
+        sheet = layout["sheets"][0]
+        waste_area = calculate_sheet_offcuts(layout, sheet)["waste_area"]
+
+        candidates = calculate_polygon_max_offcuts(layout, sheet)
+
+        self.assertEqual(len(sheet["parts"]), 11)
+        self.assertEqual(len(candidates), 1)
+        polygon = candidates[0]
+        self.assertEqual(polygon["holes"], [])
+        self.assertLess(len(polygon["vertices"]), 12)
+        self.assertLess(polygon["area"], waste_area)
+        # The 6 mm channel between the first two parts is not offcut.
+        self.assertFalse(_point_in_polygon(563.0, 300.0, polygon["vertices"]))
+        free_rects = analyze_sheet_free_space(layout, sheet)["free_rects"]
+        self.assertTrue(_polygon_within_rect_union(polygon["vertices"], free_rects))
+
+    def test_calculate_polygon_max_offcuts_filters_small_regions(self):
+        layout = {"sheet_w": 1000.0, "sheet_h": 500.0, "margin": 0.0, "kerf": 0.0}
+        sheet = {"sheet_index": 0, "parts": [
+            {"x": 0.0, "y": 0.0, "w": 900.0, "h": 500.0},
+        ]}
+
+        self.assertEqual(calculate_polygon_max_offcuts(layout, sheet), [])
+        self.assertEqual(len(calculate_polygon_max_offcuts(layout, sheet, min_width=50.0, min_area=1000.0)), 1)
+
+    def _nest_layout(self):
+        return {
+            "sheet_w": 1000.0,
+            "sheet_h": 500.0,
+            "margin": 0.0,
+            "kerf": 0.0,
+            "sheets": [
+                {"sheet_index": 0, "parts": [{"x": 0.0, "y": 0.0, "w": 500.0, "h": 500.0}]},
+                {"sheet_index": 1, "parts": []},
+                {"sheet_index": 2, "parts": [{"x": 500.0, "y": 250.0, "w": 500.0, "h": 250.0}]},
+            ],
+        }
+
+    def test_analyze_nest_offcuts_summarises_every_sheet_with_parts(self):
+        result = analyze_nest_offcuts(self._nest_layout(), max_workers=1)
+
+        self.assertEqual([r["sheet"] for r in result["summary"]], ["Sheet 1", "Sheet 3"])
+        self.assertEqual(result["summary"][0]["utilization_pct"], 50.0)
+        self.assertEqual(result["summary"][0]["rectangles_area"], 250000.0)
+        self.assertEqual(result["summary"][1]["l_shape_mix_l_count"], 1)
+        self.assertEqual(result["summary"][0]["l_shape_mix_l_count"], 0)
+
+        totals = result["totals"]
+        self.assertEqual(totals["sheet_count"], 2)
+        self.assertEqual(totals["utilization_pct"], 37.5)
+        self.assertEqual(totals["rectangles_area"], 250000.0 + 375000.0)
+        self.assertEqual(result["sheets"][1]["usage_grid"]["used_area"].sum(), 125000.0)
+
+    def test_analyze_nest_offcuts_pool_matches_serial(self):
+        serial = analyze_nest_offcuts(self._nest_layout(), max_workers=1)
+        pooled = analyze_nest_offcuts(self._nest_layout(), max_workers=2, min_pool_sheets=2)
+        self.assertEqual(pooled["summary"], serial["summary"])
+        self.assertEqual(pooled["totals"], serial["totals"])
+
+    def test_analyze_nest_offcuts_stays_in_process_by_default(self):
+        with patch("offcut_utils.ProcessPoolExecutor") as pool:
+            analyze_nest_offcuts(self._nest_layout())
+            analyze_nest_offcuts(self._nest_layout(), max_workers=4)
+
+        pool.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()